@@ -1,37 +1,85 @@
 import pandas as pd
 import os
+from csv_input import read_csv_auto
+from trigram_index import TrigramIndex
+from run_metrics import RunMetrics
 
-def match_filenames(input_csv, master_csv):
-    # Read the input CSV containing filenames without extensions
-    input_df = pd.read_csv(input_csv, encoding='ISO-8859-1')
+def strip_extension(filenames):
+    """Vectorized os.path.splitext(name)[0]: drop the last extension, but keep names like '.hidden' whole."""
+    head = filenames.str.rpartition('.')[0]
+    # No dot, or only dots before the last one: there is no extension
+    return head.where(head.str.strip('.') != '', filenames)
+
+def near_match_key(stems):
+    """Normalize stems for near matching: accents folded, lower case, punctuation and whitespace removed."""
+    folded = stems.fillna('').astype(str).str.normalize('NFKD')
+    return folded.str.lower().str.replace(r'[\W_]+', '', regex=True)
+
+def find_near_matches(unmatched, master_df, k=3, min_score=0.5, master_stems=None):
+    """
+    Top-k master filenames for each unmatched filename by trigram similarity of their
+    normalized stems (see near_match_key), from an inverted trigram index over the master.
+    master_stems (strip_extension of the master filenames) is computed when not given.
+    Returns a DataFrame with Filename, Rank, Candidate Filename, Bates/Control # and Score.
+    """
+    if master_stems is None:
+        master_stems = strip_extension(master_df['Filename'])
+    index = TrigramIndex(near_match_key(master_stems))
+    hits = index.search(near_match_key(pd.Series(unmatched, dtype=object)), k=k, min_score=min_score)
+    return pd.DataFrame({
+        'Filename': pd.Series(unmatched, dtype=object).to_numpy()[hits['query'].to_numpy()],
+        'Rank': hits['rank'].to_numpy(),
+        'Candidate Filename': master_df['Filename'].to_numpy(dtype=object)[hits['key'].to_numpy()],
+        'Bates/Control #': master_df['Bates/Control #'].to_numpy(dtype=object)[hits['key'].to_numpy()],
+        'Score': hits['score'].round(3).to_numpy(),
+    })
+
+def match_filenames(input_csv, master_csv, near_match=False, k=3, min_score=0.5, metrics_json=None):
+    """
+    Match extension-less filenames from input_csv to the master's Filename and write
+    "<Bates> (<Filename>)" lines for the matches and a CSV of the unmatched filenames.
+    With near_match, the unmatched filenames also get their top-k closest master filenames
+    (case, whitespace and punctuation ignored) with similarity scores in near_matches.csv.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("add bates from filename")
+
+    # Read the input CSV containing filenames without extensions (as text, so names
+    # such as 12345 are compared as written)
+    with metrics.stage("read input") as stage:
+        input_df = read_csv_auto(input_csv, dtype={'Filename': str})
+        stage["rows"] = len(input_df)
 
     # Check if the required column exists in the input CSV
     if 'Filename' not in input_df.columns:
         raise ValueError("Input CSV does not contain the 'Filename' column.")
 
     # Read the master CSV containing filenames with extensions and Bates numbers
-    master_df = pd.read_csv(master_csv, encoding='ISO-8859-1')
+    with metrics.stage("read master") as stage:
+        master_df = read_csv_auto(master_csv, dtype={'Filename': str})
+        stage["rows"] = len(master_df)
 
     # Check if the required columns exist in the master CSV
     if 'Filename' not in master_df.columns or 'Bates/Control #' not in master_df.columns:
         raise ValueError("Master CSV must contain 'Filename' and 'Bates/Control #' columns.")
 
-    # Create a dictionary mapping filenames without extensions to their full names and Bates numbers
-    master_dict = {
-        os.path.splitext(row['Filename'])[0]: (row['Filename'], row['Bates/Control #'])
-        for _, row in master_df.iterrows()
-    }
-
-    # Prepare the output matches and unmatched filenames
-    matches = []
-    unmatched = []
+    # Map filenames without extensions to their full names and Bates numbers
+    # (the last row wins when two files share a stem)
+    with metrics.stage("match", rows=len(input_df)):
+        master_df = master_df[master_df['Filename'].notna()].reset_index(drop=True)
+        master_stems = strip_extension(master_df['Filename'])
+        master_lookup = pd.DataFrame({
+            'Filename': master_df['Filename'].to_numpy(dtype=object),
+            'Bates/Control #': master_df['Bates/Control #'].to_numpy(dtype=object),
+        }, index=master_stems.to_numpy(dtype=object))
+        master_lookup = master_lookup[~master_lookup.index.duplicated(keep='last')]
 
-    for filename in input_df['Filename']:
-        if filename in master_dict:
-            full_filename, bates_number = master_dict[filename]
-            matches.append(f"{bates_number} ({full_filename})")
-        else:
-            unmatched.append(filename)
+        # Look every input filename up at once, keeping the input order
+        filenames = input_df['Filename']
+        found = filenames.isin(master_lookup.index)
+        hits = master_lookup.loc[filenames[found].to_numpy(dtype=object)]
+        matches = (hits['Bates/Control #'].astype(str) + ' (' + hits['Filename'].astype(str) + ')').tolist()
+        unmatched = filenames[~found].tolist()
 
     # Determine the output directory (same as master CSV)
     output_dir = os.path.dirname(master_csv)
@@ -40,21 +88,33 @@ def match_filenames(input_csv, master_csv):
     output_txt = os.path.join(output_dir, "output_matches.txt")
     unmatched_csv = os.path.join(output_dir, "unmatched_filenames.csv")
 
-    # Write the matches to the output text file
-    with open(output_txt, 'w') as f:
-        for match in matches:
-            f.write(match + '\n')
+    with metrics.stage("write", rows=len(input_df)):
+        # Write the matches to the output text file
+        with open(output_txt, 'w') as f:
+            for match in matches:
+                f.write(match + '\n')
 
-    # Write the unmatched filenames to a new CSV file
-    unmatched_df = pd.DataFrame(unmatched, columns=['Filename'])
-    unmatched_df.to_csv(unmatched_csv, index=False)
+        # Write the unmatched filenames to a new CSV file
+        unmatched_df = pd.DataFrame(unmatched, columns=['Filename'])
+        unmatched_df.to_csv(unmatched_csv, index=False)
 
     print(f"Output written to {output_txt}")
     print(f"Unmatched filenames written to {unmatched_csv}")
 
+    # Optional near-match stage for the filenames without an exact match
+    if near_match and unmatched:
+        near_csv = os.path.join(output_dir, "near_matches.csv")
+        with metrics.stage("near match", rows=len(unmatched)):
+            near_df = find_near_matches(unmatched, master_df, k, min_score, master_stems)
+            near_df.to_csv(near_csv, index=False)
+        print(f"Near matches for {near_df['Filename'].nunique()} of {len(unmatched)} unmatched filenames "
+              f"written to {near_csv}")
+    metrics.finish(metrics_json)
+
 if __name__ == "__main__":
     # Replace with your file paths
     input_csv_path = r"C:\Users\Willi\Downloads\New input.csv"
     master_csv_path = r"C:\Users\Willi\Downloads\master csv.csv"
 
-    match_filenames(input_csv_path, master_csv_path)
+    # Set near_match=True to also list the closest master filenames for the unmatched ones
+    match_filenames(input_csv_path, master_csv_path, near_match=False)
@@ -1,49 +1,62 @@
 import pandas as pd
 import os
 from tqdm import tqdm
-
-def add_civ_nrt_to_master(master_csv, civ_csv, nrt_csv):
-    # Read the master CSV
-    master_df = pd.read_csv(master_csv, encoding='utf-8-sig', low_memory=False)
-
-    # Check for required column in the master CSV
-    if 'MD5 Hash' not in master_df.columns:
-        raise ValueError("Master CSV must contain the 'MD5 Hash' column.")
-
-    # Read the CIV and NRT CSV files
-    civ_df = pd.read_csv(civ_csv, encoding='utf-8-sig', low_memory=False)
-    nrt_df = pd.read_csv(nrt_csv, encoding='utf-8-sig', low_memory=False)
-
-    # Check for required columns in the CIV and NRT CSVs
-    for df, name in [(civ_df, 'CIV CSV'), (nrt_df, 'NRT CSV')]:
-        if 'Bates/Control #' not in df.columns or 'MD5 Hash' not in df.columns:
-            raise ValueError(f"{name} must contain 'Bates/Control #' and 'MD5 Hash' columns.")
-
-    # Create dictionaries to map MD5 Hash to Bates/Control # for CIV and NRT
-    civ_md5_to_bates = civ_df.set_index('MD5 Hash')['Bates/Control #'].to_dict()
-    nrt_md5_to_bates = nrt_df.set_index('MD5 Hash')['Bates/Control #'].to_dict()
-
-    # Initialize the new columns in the master DataFrame
-    master_df['CIV Number'] = ''
-    master_df['NRT Number'] = ''
-
-    # Prepare a list for unmatched MD5 hashes
-    unmatched = []
-
-    # Add a progress bar
-    tqdm.pandas(desc="Matching MD5 Hashes")
-
-    # Populate the new columns
-    for index, row in tqdm(master_df.iterrows(), total=len(master_df), desc="Processing rows", unit="row"):
-        md5 = row['MD5 Hash']
-        civ_value = civ_md5_to_bates.get(md5, '')
-        nrt_value = nrt_md5_to_bates.get(md5, '')
-        master_df.at[index, 'CIV Number'] = civ_value
-        master_df.at[index, 'NRT Number'] = nrt_value
-
-        # If no match was found in either CSV, add to unmatched
-        if not civ_value and not nrt_value:
-            unmatched.append(row.to_dict())
+import md5_index
+from csv_cache import read_csv_cached
+from run_metrics import RunMetrics
+
+def build_md5_map(df, name):
+    """
+    Build an MD5 Hash -> Bates/Control # lookup Series from a reference DataFrame.
+    Later rows win on duplicate hashes, matching the old dict-based behaviour.
+    """
+    if 'Bates/Control #' not in df.columns or 'MD5 Hash' not in df.columns:
+        raise ValueError(f"{name} must contain 'Bates/Control #' and 'MD5 Hash' columns.")
+    df = df.dropna(subset=['MD5 Hash'])
+    df = df.drop_duplicates(subset='MD5 Hash', keep='last')
+    return df.set_index('MD5 Hash')['Bates/Control #']
+
+def load_civ_nrt_maps(civ_csv, nrt_csv):
+    """Read the CIV and NRT CSV files and return their MD5 -> Bates lookups."""
+    # Only the two lookup columns are loaded (from the columnar cache after the first run)
+    lookup_columns = lambda c: c in ('Bates/Control #', 'MD5 Hash')
+    civ_df = read_csv_cached(civ_csv, usecols=lookup_columns, encoding='utf-8-sig', low_memory=False)
+    nrt_df = read_csv_cached(nrt_csv, usecols=lookup_columns, encoding='utf-8-sig', low_memory=False)
+    return build_md5_map(civ_df, 'CIV CSV'), build_md5_map(nrt_df, 'NRT CSV')
+
+def apply_civ_nrt(master_df, civ_map, nrt_map):
+    """
+    Fill the CIV Number and NRT Number columns of master_df with bulk column maps.
+    Returns the updated frame and the rows that matched neither lookup.
+    """
+    master_df['CIV Number'] = master_df['MD5 Hash'].map(civ_map).fillna('')
+    master_df['NRT Number'] = master_df['MD5 Hash'].map(nrt_map).fillna('')
+
+    # If no match was found in either CSV, add to unmatched
+    unmatched_mask = (master_df['CIV Number'] == '') & (master_df['NRT Number'] == '')
+    return master_df, master_df[unmatched_mask]
+
+def add_civ_nrt_to_master(master_csv, civ_csv=None, nrt_csv=None, chunksize=None,
+                          index_path=None, civ_production='CIV', nrt_production='NRT', metrics_json=None):
+    """
+    Add CIV and NRT Bates numbers to the master CSV by MD5 Hash.
+    When chunksize is given the master is streamed in chunks of that many rows and
+    each chunk is appended to the outputs, so memory stays flat for any master size.
+    The master is read as text, whole or in chunks, so values are written back exactly as
+    they were read and both ways give the same output.
+    When index_path is given the lookups come from the civ/nrt productions of the
+    shared MD5 index (see md5_index.py) instead of the CIV and NRT CSVs.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("add drt and civ bates numbers")
+
+    if index_path is None:
+        if civ_csv is None or nrt_csv is None:
+            raise ValueError("Provide the CIV and NRT CSVs or an MD5 index path.")
+        # Read the CIV and NRT CSV files and build the lookups
+        with metrics.stage("index build") as stage:
+            civ_map, nrt_map = load_civ_nrt_maps(civ_csv, nrt_csv)
+            stage["rows"] = len(civ_map) + len(nrt_map)
 
     # Determine the output directory (same as master CSV)
     output_dir = os.path.dirname(master_csv)
@@ -52,14 +65,39 @@ def add_civ_nrt_to_master(master_csv, civ_csv, nrt_csv):
     output_master_csv = os.path.join(output_dir, "updated_master_with_civ_nrt.csv")
     unmatched_report_csv = os.path.join(output_dir, "unmatched_md5_report.csv")
 
-    # Save the updated master DataFrame to a new CSV
-    master_df.to_csv(output_master_csv, index=False, encoding='utf-8-sig')
-    print(f"Updated master CSV written to {output_master_csv}")
+    # Read the master CSV as text, either whole or as a stream of chunks
+    read_kwargs = dict(encoding='utf-8-sig', dtype=str, keep_default_na=False)
+    if chunksize:
+        chunks = pd.read_csv(master_csv, chunksize=chunksize, **read_kwargs)
+    else:
+        # A one-chunk generator, so the whole-file read is timed like a streamed chunk
+        chunks = (pd.read_csv(master_csv, **read_kwargs) for _ in range(1))
+
+    first = True
+    for chunk in metrics.iterate("read", tqdm(chunks, desc="Matching MD5 Hashes", unit="chunk")):
+        # Check for required column in the master CSV
+        if first and 'MD5 Hash' not in chunk.columns:
+            raise ValueError("Master CSV must contain the 'MD5 Hash' column.")
+
+        with metrics.stage("match", rows=len(chunk)):
+            if index_path is not None:
+                # Fetch only the hashes in this chunk so memory stays bounded
+                civ_map = md5_index.lookup_bates(index_path, civ_production, chunk['MD5 Hash'])
+                nrt_map = md5_index.lookup_bates(index_path, nrt_production, chunk['MD5 Hash'])
+
+            chunk, unmatched = apply_civ_nrt(chunk, civ_map, nrt_map)
+
+        # Write the first chunk with a header, then append the rest
+        with metrics.stage("write", rows=len(chunk)):
+            mode = 'w' if first else 'a'
+            encoding = 'utf-8-sig' if first else 'utf-8'
+            chunk.to_csv(output_master_csv, index=False, mode=mode, header=first, encoding=encoding)
+            unmatched.to_csv(unmatched_report_csv, index=False, mode=mode, header=first, encoding=encoding)
+        first = False
 
-    # Save the unmatched entries to a separate CSV
-    unmatched_df = pd.DataFrame(unmatched)
-    unmatched_df.to_csv(unmatched_report_csv, index=False, encoding='utf-8-sig')
+    print(f"Updated master CSV written to {output_master_csv}")
     print(f"Unmatched MD5 report written to {unmatched_report_csv}")
+    metrics.finish(metrics_json)
 
 if __name__ == "__main__":
     # File paths (replace with actual paths)
@@ -67,5 +105,12 @@ if __name__ == "__main__":
     civ_csv_path = r"C:\Users\Willi\Downloads\Civmec Report\civmec_md5.csv"
     nrt_csv_path = r"C:\Users\Willi\Downloads\Civmec Report\NRT_MD5_hashes.csv"
 
+    # Rows per chunk when streaming the master (set to None to load it all at once)
+    chunk_size = 500_000
+
     # Call the function
-    add_civ_nrt_to_master(master_csv_path, civ_csv_path, nrt_csv_path)
+    add_civ_nrt_to_master(master_csv_path, civ_csv_path, nrt_csv_path, chunksize=chunk_size)
+
+    # Or, once both lists have been loaded into the shared index:
+    # add_civ_nrt_to_master(master_csv_path, chunksize=chunk_size,
+    #                       index_path=r"C:\Users\Willi\Downloads\Civmec Report\md5_index.db")
@@ -1,45 +1,79 @@
 import pandas as pd
 import os
-from tqdm import tqdm
+import md5_index
+from csv_cache import read_csv_cached
+from column_splice import splice_column
+from run_metrics import RunMetrics
 
-def add_md5_to_master(master_csv, bates_csv):
-    # Read the master CSV
-    master_df = pd.read_csv(master_csv, encoding='utf-8-sig', low_memory=False)
+def md5_for_document_ids(document_ids, bates_csv=None, index_path=None, production=None):
+    """
+    Look up the MD5 Hash for each Document id; ids without a match get ''.
+    The Bates -> MD5 lookup comes either from bates_csv or, when index_path is
+    given, from the named production in the shared MD5 index (see md5_index.py).
+    """
+    if (bates_csv is None) == (index_path is None):
+        raise ValueError("Provide either a Bates CSV or an MD5 index path.")
 
-    # Check for required column in the master CSV
-    if 'Document id' not in master_df.columns:
-        raise ValueError("Master CSV must contain the 'Document id' column.")
+    if index_path is not None:
+        # Query the index for just the Document ids present in the master
+        bates_to_md5 = md5_index.lookup_md5(index_path, production, document_ids).to_dict()
+    else:
+        # Read the two lookup columns of the Bates CSV (cached as Parquet after the first run)
+        bates_df = read_csv_cached(bates_csv, usecols=lambda c: c in ('Bates/Control #', 'MD5 Hash'),
+                                   encoding='utf-8-sig', low_memory=False)
 
-    # Read the Bates CSV
-    bates_df = pd.read_csv(bates_csv, encoding='utf-8-sig', low_memory=False)
+        # Check for required columns in the Bates CSV
+        if 'Bates/Control #' not in bates_df.columns or 'MD5 Hash' not in bates_df.columns:
+            raise ValueError("Bates CSV must contain 'Bates/Control #' and 'MD5 Hash' columns.")
 
-    # Check for required columns in the Bates CSV
-    if 'Bates/Control #' not in bates_df.columns or 'MD5 Hash' not in bates_df.columns:
-        raise ValueError("Bates CSV must contain 'Bates/Control #' and 'MD5 Hash' columns.")
+        # Create a dictionary to map Bates/Control # to MD5 Hash
+        bates_to_md5 = bates_df.set_index('Bates/Control #')['MD5 Hash'].to_dict()
 
-    # Create a dictionary to map Bates/Control # to MD5 Hash
-    bates_to_md5 = bates_df.set_index('Bates/Control #')['MD5 Hash'].to_dict()
+    # Map every Document id in one pass
+    return document_ids.map(bates_to_md5).fillna('')
 
-    # Initialize the MD5 Hash column in the master DataFrame
-    master_df['MD5 Hash'] = ''
+def add_md5_to_master(master_csv, bates_csv=None, index_path=None, production=None, passthrough=False,
+                      metrics_json=None):
+    """
+    Add an MD5 Hash column to the master CSV by Document id.
+    See md5_for_document_ids for where the lookup comes from.
+    With passthrough=True only the Document id column is parsed and every other byte of
+    the master is copied unchanged, with the MD5 Hash field appended (see column_splice.py).
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("add md5 from doc id")
 
-    # Add a progress bar
-    tqdm.pandas(desc="Matching MD5 Hashes")
+    # Define the output file path (same directory as master CSV)
+    output_csv = os.path.join(os.path.dirname(master_csv), "updated_master_with_md5.csv")
 
-    # Populate the MD5 Hash column in the master DataFrame
-    master_df['MD5 Hash'] = master_df['Document id'].progress_apply(
-        lambda doc_id: bates_to_md5.get(doc_id, '')
-    )
+    if passthrough:
+        with metrics.stage("splice") as stage:
+            md5 = splice_column(master_csv, output_csv, 'Document id', 'MD5 Hash',
+                                lambda ids: md5_for_document_ids(ids, bates_csv, index_path, production),
+                                encoding='utf-8-sig')
+            stage["rows"] = len(md5)
+        print(f"Updated master CSV written to {output_csv}")
+        metrics.finish(metrics_json)
+        return
+
+    # Read the master CSV
+    with metrics.stage("read") as stage:
+        master_df = pd.read_csv(master_csv, encoding='utf-8-sig', low_memory=False)
+        stage["rows"] = len(master_df)
 
-    # Determine the output directory (same as master CSV)
-    output_dir = os.path.dirname(master_csv)
+    # Check for required column in the master CSV
+    if 'Document id' not in master_df.columns:
+        raise ValueError("Master CSV must contain the 'Document id' column.")
 
-    # Define the output file path
-    output_csv = os.path.join(output_dir, "updated_master_with_md5.csv")
+    # Populate the MD5 Hash column in the master DataFrame
+    with metrics.stage("match", rows=len(master_df)):
+        master_df['MD5 Hash'] = md5_for_document_ids(master_df['Document id'], bates_csv, index_path, production)
 
     # Save the updated master DataFrame to a new CSV
-    master_df.to_csv(output_csv, index=False, encoding='utf-8-sig')
+    with metrics.stage("write", rows=len(master_df)):
+        master_df.to_csv(output_csv, index=False, encoding='utf-8-sig')
     print(f"Updated master CSV written to {output_csv}")
+    metrics.finish(metrics_json)
 
 if __name__ == "__main__":
     # File paths (replace with actual paths)
@@ -48,3 +82,7 @@ if __name__ == "__main__":
 
     # Call the function
     add_md5_to_master(master_csv_path, bates_csv_path)
+
+    # Or, once md5_list.csv has been loaded into the shared index:
+    # add_md5_to_master(master_csv_path, index_path=r"C:\Users\Willi\Downloads\Civmec Report\md5_index.db",
+    #                   production="md5_list")
@@ -1,10 +1,22 @@
 import pandas as pd
+import numpy as np
 import os
+from bates_codec import make_bates
+from run_metrics import RunMetrics
 
-def process_csv(input_csv, output_csv, prefix, box, folder_num, include_suffix):
-    # Read CSV into a DataFrame.
-    df = pd.read_csv(input_csv, encoding="utf-8")
-    
+# Filename prefixes numbered first within each folder, in this order. The first one marks
+# the family parent; files with the later prefixes are its attachments.
+PRIORITY_PREFIXES = ("FE", "Civmec")
+
+def priority_codes(filenames, priority_prefixes=PRIORITY_PREFIXES):
+    """Index of the first prefix each filename starts with, or len(priority_prefixes) for none."""
+    codes = pd.Series(len(priority_prefixes), index=filenames.index)
+    for rank, name_prefix in reversed(list(enumerate(priority_prefixes))):
+        codes[filenames.str.startswith(name_prefix, na=False)] = rank
+    return codes
+
+def number_rows(df, prefix, box, folder_num, include_suffix, priority_prefixes=PRIORITY_PREFIXES):
+    """Fill Other Bates, Parent ID and Begin Family for the ZIP rows of df in place."""
     # Ensure that the "Other Bates" column exists and is treated as text.
     if "Other Bates" not in df.columns:
         df["Other Bates"] = ""
@@ -22,121 +34,120 @@ def process_csv(input_csv, output_csv, prefix, box, folder_num, include_suffix):
     # Split "File Path" into two parts:
     #   - zip_group: the part before the "//" (the ZIP file name)
     #   - inside_path: the part after the "//"
-    df_inner["zip_group"] = df_inner["File Path"].str.split("//").str[0]
-    df_inner["inside_path"] = df_inner["File Path"].str.split("//").str[1]
+    zip_parts = df_inner["File Path"].str.split("//")
+    df_inner["zip_group"] = zip_parts.str[0]
+    df_inner["inside_path"] = zip_parts.str[1]
     
     # From inside_path, extract the folder and the filename.
     # Assumption: if splitting by "/" yields more than one part,
     # then the folder is the second element (index 1) and the filename is the last element.
-    df_inner["folder"] = df_inner["inside_path"].apply(
-        lambda x: x.split("/")[1] if len(x.split("/")) > 1 else ""
-    )
-    df_inner["filename"] = df_inner["inside_path"].apply(
-        lambda x: x.split("/")[-1] if x else ""
-    )
-    
-    # Initialize the page (Bates) counter.
-    bates_counter = 1
-
-    # Helper function to build the Bates number using user inputs and the counter.
-    def make_bates(counter):
-        bates = f"{prefix}.{box}.{folder_num}.{counter:04d}"
-        if include_suffix:
-            bates += "_0001"
-        return bates
+    parts = df_inner["inside_path"].str.split("/")
+    df_inner["folder"] = parts.str[1].fillna("")
+    df_inner["filename"] = parts.str[-1].fillna("")
     
     # ------------------------------
-    # Process rows that are inside a folder.
+    # Number every ZIP row in one pass.
+    # Folder rows come first, grouped by (zip_group, folder); rows inside the ZIP but not
+    # in a folder follow as one block. Within each block, files are ordered by priority
+    # (the first matching prefix, e.g. FE then Civmec, then everything else) and File Path,
+    # and the page counter is simply the position in that order.
     # ------------------------------
-    in_folder = df_inner[df_inner["folder"] != ""].copy()
-    groups = in_folder.groupby(["zip_group", "folder"])
-    
-    # Process each folder group in sorted order (by zip_group then folder).
-    for (zip_grp, folder_name) in sorted(groups.groups.keys(), key=lambda x: (x[0], x[1])):
-        group_df = groups.get_group((zip_grp, folder_name)).copy()
-        # Sort the rows within the folder (by File Path; adjust as needed)
-        group_df = group_df.sort_values("File Path")
-        
-        # Partition the group into FE files, Civmec files, and any others.
-        fe_rows = group_df[group_df["filename"].str.startswith("FE")]
-        civmec_rows = group_df[group_df["filename"].str.startswith("Civmec")]
-        others = group_df[~(group_df["filename"].str.startswith("FE") |
-                             group_df["filename"].str.startswith("Civmec"))]
-        
-        # Assign Bates numbers in the order: FE, then Civmec, then others.
-        for idx in fe_rows.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        for idx in civmec_rows.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        for idx in others.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        
-        # For folder documents, designate the FE document as the parent.
-        # Use the Bates/Control # value from the first FE row as the parent value.
-        if not fe_rows.empty:
-            parent_control = fe_rows.iloc[0]["Bates/Control #"]
-            # For each row in the folder group:
-            for idx in group_df.index:
-                fname = group_df.loc[idx, "filename"]
-                if fname.startswith("FE"):
-                    # For FE document: Parent ID remains blank; Begin Family is set.
-                    df.loc[idx, "Begin Family"] = parent_control
-                elif fname.startswith("Civmec"):
-                    # For Civmec: Set both Parent ID and Begin Family.
-                    df.loc[idx, "Parent ID"] = parent_control
-                    df.loc[idx, "Begin Family"] = parent_control
-                # For any other files in the folder, leave Parent ID and Begin Family blank.
-    
+    in_folder = df_inner["folder"] != ""
+    df_inner["priority"] = priority_codes(df_inner["filename"], priority_prefixes)
+    df_inner["zip_key"] = df_inner["zip_group"].where(in_folder, "")
+    df_inner["folder_key"] = df_inner["folder"].where(in_folder, "")
+    df_inner["section"] = (~in_folder).astype(int)
+    df_inner = df_inner.sort_values(["section", "zip_key", "folder_key", "priority", "File Path"])
+
+    counters = pd.Series(np.arange(1, len(df_inner) + 1), index=df_inner.index)
+    # PREFIX.BOX.FOLDER.0001 (plus _0001 if requested), see bates_codec.make_bates
+    df.loc[df_inner.index, "Other Bates"] = make_bates(prefix, box, folder_num, counters,
+                                                       suffix=1 if include_suffix else None).astype(object)
+
     # ------------------------------
-    # Process rows that are inside the ZIP but not in a folder.
+    # Families inside folders: the first file with the first priority prefix (FE) is the
+    # parent. Parent rows sort first in their folder, so the parent is the group's first
+    # row: its Bates/Control # is broadcast to the group. Rows with the first prefix get
+    # Begin Family; rows with the other prefixes (Civmec) get Parent ID and Begin Family;
+    # any other files, and rows not in a folder, stay blank.
     # ------------------------------
-    not_in_folder = df_inner[df_inner["folder"] == ""].copy()
-    if not not_in_folder.empty:
-        not_in_folder = not_in_folder.sort_values("File Path")
-        fe_rows = not_in_folder[not_in_folder["filename"].str.startswith("FE")]
-        civmec_rows = not_in_folder[not_in_folder["filename"].str.startswith("Civmec")]
-        others = not_in_folder[~(not_in_folder["filename"].str.startswith("FE") |
-                                   not_in_folder["filename"].str.startswith("Civmec"))]
-        
-        for idx in fe_rows.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        for idx in civmec_rows.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        for idx in others.index:
-            df.loc[idx, "Other Bates"] = make_bates(bates_counter)
-            bates_counter += 1
-        # For non-folder items, Parent ID and Begin Family remain blank.
-    
+    folder_rows = df_inner[df_inner["section"] == 0]
+    priority = folder_rows["priority"].to_numpy()
+    if (priority == 0).any():
+        group_start = ~folder_rows.duplicated(["zip_key", "folder_key"]).to_numpy()
+        first_row = np.flatnonzero(group_start)[np.cumsum(group_start) - 1]
+        has_parent = priority[first_row] == 0
+        parent_control = folder_rows["Bates/Control #"].to_numpy(dtype=object)[first_row]
+
+        in_family = has_parent & (priority < len(priority_prefixes))
+        is_child = in_family & (priority > 0)
+        df.loc[folder_rows.index[in_family], "Begin Family"] = parent_control[in_family]
+        df.loc[folder_rows.index[is_child], "Parent ID"] = parent_control[is_child]
+
+def process_csv(input_csv, output_csv, prefix, box, folder_num, include_suffix,
+                priority_prefixes=PRIORITY_PREFIXES, metrics_json=None):
+    # Per-stage timings are printed at the end (and written to metrics_json when given).
+    metrics = RunMetrics("bates numbering on folder and aconex")
+
+    # Read CSV into a DataFrame.
+    with metrics.stage("read") as stage:
+        df = pd.read_csv(input_csv, encoding="utf-8")
+        stage["rows"] = len(df)
+
+    with metrics.stage("number", rows=len(df)):
+        number_rows(df, prefix, box, folder_num, include_suffix, priority_prefixes)
+
     # ------------------------------
     # Write the updated DataFrame to the output CSV.
     # ------------------------------
-    df.to_csv(output_csv, index=False, encoding="utf-8")
+    with metrics.stage("write", rows=len(df)):
+        df.to_csv(output_csv, index=False, encoding="utf-8")
     print(f"Output saved to: {output_csv}")
+    metrics.finish(metrics_json)
+
+def process_batch(jobs_csv, prefix, include_suffix, priority_prefixes=PRIORITY_PREFIXES):
+    """
+    Number many loadfiles in one run. jobs_csv lists one loadfile per row with the columns
+    "Input CSV", "Box" and "Folder", and optionally "Output CSV" (default: <input name>_output.csv
+    next to the input). Box and folder numbers are kept as text so their zero-padding is preserved.
+    """
+    jobs = pd.read_csv(jobs_csv, dtype=str, encoding="utf-8-sig").rename(columns=str.strip)
+    missing = {"Input CSV", "Box", "Folder"} - set(jobs.columns)
+    if missing:
+        raise ValueError(f"Jobs CSV is missing column(s): {', '.join(sorted(missing))}")
+
+    for job in jobs.to_dict("records"):
+        input_csv = job["Input CSV"].strip().strip('"')
+        output_csv = job.get("Output CSV")
+        if not isinstance(output_csv, str) or not output_csv.strip():
+            output_csv = os.path.splitext(input_csv)[0] + "_output.csv"
+        process_csv(input_csv, output_csv.strip().strip('"'), prefix, job["Box"].strip(),
+                    job["Folder"].strip(), include_suffix, priority_prefixes)
+    print(f"Numbered {len(jobs)} loadfile(s).")
 
 if __name__ == "__main__":
-    # Prompt for the input CSV file path.
-    input_csv = input("Enter the path to the input CSV file: ").strip().strip('"')
-    
-    # Determine the directory of the input file.
-    input_dir = os.path.dirname(input_csv)
-    if not input_dir:
-        input_dir = "."
-    
-    # Define the output CSV path (saved to the same directory as the input).
-    output_csv = os.path.join(input_dir, "output.csv")
-    
-    # Prompt for the Bates number parts.
+    # Single loadfile, or a batch of box/folder loadfiles listed in a jobs CSV.
+    mode = input("Number a single loadfile or a batch from a jobs CSV? (single/batch): ").strip().lower()
+
     prefix = input("Enter the prefix for the Bates number: ").strip()
-    box_number = input("Enter the box number for the Bates number: ").strip()
-    folder_number = input("Enter the folder number for the Bates number: ").strip()
-    
-    # Ask if a suffix should be included.
     suffix_choice = input("Do you want a suffix? (yes/no): ").strip().lower()
     include_suffix = suffix_choice in ["yes", "y"]
-    
-    process_csv(input_csv, output_csv, prefix, box_number, folder_number, include_suffix)
+    priority_input = input(f"Enter the folder priority prefixes, comma-separated (blank for {', '.join(PRIORITY_PREFIXES)}): ").strip()
+    priority_prefixes = tuple(p.strip() for p in priority_input.split(",") if p.strip()) or PRIORITY_PREFIXES
+
+    if mode in ["batch", "b"]:
+        jobs_csv = input("Enter the path to the jobs CSV (columns: Input CSV, Box, Folder, optional Output CSV): ").strip().strip('"')
+        process_batch(jobs_csv, prefix, include_suffix, priority_prefixes)
+    else:
+        # Prompt for the input CSV file path.
+        input_csv = input("Enter the path to the input CSV file: ").strip().strip('"')
+
+        # Define the output CSV path (saved to the same directory as the input).
+        input_dir = os.path.dirname(input_csv) or "."
+        output_csv = os.path.join(input_dir, "output.csv")
+
+        # Prompt for the box and folder parts of the Bates number.
+        box_number = input("Enter the box number for the Bates number: ").strip()
+        folder_number = input("Enter the folder number for the Bates number: ").strip()
+
+        process_csv(input_csv, output_csv, prefix, box_number, folder_number, include_suffix, priority_prefixes)
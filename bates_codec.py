@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Shared codec for structured Bates numbers such as PREFIX.BOX.FOLDER.0001 or
+# PREFIX.BOX.FOLDER.0001_0001 (the format built by make_bates for the folder numbering
+# tool and taken apart by split_bates for the attachment folder incrementer).
+#
+# A column is parsed once into a compact frame: the prefix is interned as a categorical
+# code and box, folder, page and suffix are integers of the smallest type that holds the
+# column (int16 for four-digit pages), with the zero-padding widths kept so values format
+# back exactly. Sorting, gap and overlap checks then run on integers.
+
+BATES_PATTERN = r'^(?P<prefix>.+?)\.(?P<box>\d+)\.(?P<folder>\d+)\.(?P<page>\d+)(?:_(?P<suffix>\d+))?$'
+
+NUMBER_PARTS = ['box', 'folder', 'page', 'suffix']
+
+# Longest number part that fits an int64 exactly; longer ones make a value invalid
+MAX_DIGITS = 18
+
+def _digits_to_int64(text):
+    # Digit strings of at most MAX_DIGITS digits (<NA> allowed) to int64 with -1 for <NA>.
+    # Gaps are filled first: with a missing value to_numeric goes through float, which
+    # loses digits and misreads long zero padding.
+    numbers = pd.to_numeric(text.fillna('0')).astype(np.int64)
+    numbers[text.isna().to_numpy()] = -1
+    return numbers
+
+# Values are parsed this many at a time, so the text parts extracted by the regex only
+# exist for one block and peak memory stays close to the compact result
+PARSE_BLOCK = 100_000
+
+def _parse_block(values):
+    # One block of parse_bates, with int64 number parts
+    parts = values.astype(str).str.strip().str.extract(BATES_PATTERN)
+    valid = parts['page'].notna() & values.notna()
+    for part in NUMBER_PARTS:
+        valid &= ~(parts[part].str.len() > MAX_DIGITS).fillna(False).astype(bool)
+
+    parsed = pd.DataFrame(index=values.index)
+    parsed['prefix'] = pd.Categorical(parts['prefix'].where(valid))
+    for part in NUMBER_PARTS:
+        text = parts[part].where(valid)
+        parsed[part] = _digits_to_int64(text)
+        parsed[f'{part}_width'] = text.str.len().fillna(0).astype(np.int8)
+    parsed['valid'] = valid.to_numpy()
+    return parsed
+
+def parse_bates(values):
+    """
+    Parse a column of Bates strings with vectorized passes over blocks of PARSE_BLOCK values.
+    Returns a DataFrame on the same index with:
+      - prefix: categorical (interned) prefix
+      - box, folder, page: integers (the smallest signed type that holds the column, up to int64)
+      - suffix: integer of the same kind, -1 when the value has no _NNNN suffix
+      - box_width, folder_width, page_width, suffix_width: zero-padding widths
+      - valid: False for values that do not match the pattern or have a number part longer
+        than MAX_DIGITS digits (their numbers are -1)
+    """
+    values = pd.Series(values)
+    blocks = [_parse_block(values.iloc[start:start + PARSE_BLOCK])
+              for start in range(0, max(len(values), 1), PARSE_BLOCK)]
+    parsed = pd.concat(blocks) if len(blocks) > 1 else blocks[0]
+    parsed['prefix'] = union_categoricals([block['prefix'] for block in blocks])
+    for part in NUMBER_PARTS:
+        parsed[part] = pd.to_numeric(parsed[part], downcast='integer')
+    return parsed
+
+def split_bates(values):
+    """
+    Split Bates strings into their four dot-separated parts, PREFIX.BOX.FOLDER.PAGE, as
+    text. Only the folder has to be a number, so boxes and pages are kept exactly as
+    written (e.g. a page of 0001_0002).
+    Returns a DataFrame on the same index with:
+      - prefix, box, folder, page: the parts as text (<NA> where missing)
+      - folder_number: the folder as an int64, -1 when it is not a number of at most MAX_DIGITS digits
+      - valid: True for values with exactly four parts and a numeric folder
+    """
+    values = pd.Series(values).astype(pd.StringDtype())
+    # As text, so an empty column or values without dots still give string columns
+    parts = values.str.split('.', expand=True).reindex(columns=range(4)).astype(pd.StringDtype())
+    folder_digits = parts[2].str.fullmatch(rf'\s*\d{{1,{MAX_DIGITS}}}\s*').fillna(False).astype(bool)
+    folder = _digits_to_int64(parts[2].where(folder_digits).str.strip())
+    valid = ((values.str.count(r'\.') == 3).fillna(False).astype(bool) & folder_digits).to_numpy()
+
+    split = pd.DataFrame({'prefix': parts[0], 'box': parts[1], 'folder': parts[2], 'page': parts[3]},
+                         index=values.index)
+    split['folder_number'] = folder.to_numpy()
+    split['valid'] = valid
+    return split
+
+def make_bates(prefix, box, folder, pages, page_width=4, suffix=None, suffix_width=4):
+    """
+    Build the Bates numbers PREFIX.BOX.FOLDER.PAGE of one folder for a Series of page
+    numbers. box and folder are written exactly as entered, so their zero-padding is kept
+    and text such as A12 is allowed; pages are zero-padded to page_width. suffix (a number)
+    adds _SUFFIX to every value, e.g. suffix=1 gives PREFIX.BOX.FOLDER.0001_0001.
+    """
+    pages = pd.Series(pages)
+    bates = f"{prefix}.{box}.{folder}." + pages.astype(str).str.zfill(page_width)
+    if suffix is not None:
+        bates += '_' + str(int(suffix)).zfill(suffix_width)
+    return bates
+
+def _zero_pad(numbers, widths):
+    # zfill needs one width per call, so pad each distinct width as a block.
+    text = numbers.astype(str)
+    out = pd.Series('', index=numbers.index, dtype=object)
+    for width in pd.unique(widths):
+        mask = widths == width
+        out[mask] = text[mask].str.zfill(int(width))
+    return out
+
+def format_bates(parsed):
+    """Format a parsed frame back to Bates strings; invalid rows become NaN."""
+    out = (parsed['prefix'].astype(object).astype(str) + '.'
+           + _zero_pad(parsed['box'], parsed['box_width']) + '.'
+           + _zero_pad(parsed['folder'], parsed['folder_width']) + '.'
+           + _zero_pad(parsed['page'], parsed['page_width']))
+    has_suffix = parsed['suffix'] >= 0
+    out[has_suffix] = out[has_suffix] + '_' + _zero_pad(parsed['suffix'][has_suffix],
+                                                        parsed['suffix_width'][has_suffix])
+    return out.where(parsed['valid'])
+
+def sort_bates(parsed):
+    """
+    Return the parsed frame sorted in numeric Bates order
+    (prefix text, then box, folder, page, suffix). Invalid rows sort last.
+    """
+    prefix_codes = parsed['prefix'].cat.reorder_categories(
+        sorted(parsed['prefix'].cat.categories)).cat.codes.to_numpy()
+    order = np.lexsort((parsed['suffix'].to_numpy(), parsed['page'].to_numpy(),
+                        parsed['folder'].to_numpy(), parsed['box'].to_numpy(),
+                        prefix_codes, ~parsed['valid'].to_numpy()))
+    return parsed.iloc[order]
+
+def _same_group(sorted_parsed):
+    # True where a row shares prefix, box and folder with the row before it.
+    same = np.zeros(len(sorted_parsed), dtype=bool)
+    if len(sorted_parsed) > 1:
+        codes = sorted_parsed['prefix'].cat.codes.to_numpy()
+        box = sorted_parsed['box'].to_numpy()
+        folder = sorted_parsed['folder'].to_numpy()
+        same[1:] = (codes[1:] == codes[:-1]) & (box[1:] == box[:-1]) & (folder[1:] == folder[:-1])
+    return same & sorted_parsed['valid'].to_numpy()
+
+def find_gaps(parsed):
+    """
+    Find missing pages inside each PREFIX.BOX.FOLDER group.
+    Returns a DataFrame with the group and the first/last missing page of every gap.
+    """
+    ordered = sort_bates(parsed[parsed['valid']])
+    pages = ordered['page'].to_numpy()
+    same = _same_group(ordered)
+    step = np.zeros(len(ordered), dtype=np.int64)
+    step[1:] = pages[1:] - pages[:-1]
+    positions = np.flatnonzero(same & (step > 1))
+    after = ordered.iloc[positions]
+    return pd.DataFrame({
+        'prefix': after['prefix'].astype(object).to_numpy(),
+        'box': after['box'].to_numpy(),
+        'folder': after['folder'].to_numpy(),
+        'first_missing': pages[positions - 1] + 1,
+        'last_missing': pages[positions] - 1,
+    })
+
+def find_overlaps(begin, end):
+    """
+    Find ranges that overlap an earlier range.
+    begin and end are parsed frames (one row per range) on the same index.
+    Returns the index labels of every range whose begin page is not after the furthest
+    end page seen so far in the same PREFIX.BOX.FOLDER group.
+    """
+    valid = begin['valid'] & end['valid']
+    ordered = sort_bates(begin[valid])
+    begins = ordered['page'].to_numpy()
+    ends = end.loc[ordered.index, 'page'].to_numpy()
+    same = _same_group(ordered)
+
+    # Running maximum of the end page, restarted at the start of every group.
+    group_ids = np.cumsum(~same)
+    running_end = pd.Series(ends).groupby(group_ids).cummax().to_numpy()
+
+    overlap = np.zeros(len(ordered), dtype=bool)
+    overlap[1:] = same[1:] & (begins[1:] <= running_end[:-1])
+    return ordered.index[overlap]
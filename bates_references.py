@@ -0,0 +1,140 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+
+# Shared engine for pulling referenced Bates numbers out of free text (Note Text).
+# Without a list of known Bates numbers every PREFIX.BOX.FOLDER.PAGE(_SUFFIX) shaped value
+# is reported. With one, only known Bates numbers are reported, in any format: they are
+# found with an Aho-Corasick automaton when pyahocorasick is installed, or otherwise by
+# looking up runs of consecutive words in a set. Both find the same references: a known
+# Bates counts wherever it is not directly preceded or followed by a letter, digit or _.
+# Notes are scanned in shards on a process pool.
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# PREFIX.BOX.FOLDER.PAGE with an optional _SUFFIX (the format parsed by bates_codec),
+# standing on its own in the text
+BATES_REFERENCE_PATTERN = r'(?<![\w.])[A-Za-z][A-Za-z0-9\-]*\.\d+\.\d+\.\d+(?:_\d+)?(?![\w]|\.\d)'
+
+# Notes per task handed to the process pool; smaller inputs are scanned in-process.
+SHARD_NOTES = 50_000
+
+_WORD = re.compile(r'\w+')
+
+def _is_word_char(text, position):
+    # True when position is inside text and holds a letter, digit or _ (the \w class)
+    return 0 <= position < len(text) and (text[position].isalnum() or text[position] == '_')
+
+class ReferenceMatcher:
+    """
+    Finds referenced Bates numbers in one text at a time:
+
+        matcher = ReferenceMatcher(known_bates)      # or ReferenceMatcher() for the pattern
+        matcher.find("See ABC.001.002.0003 and ABC.001.002.0007")
+
+    find returns each distinct reference once, in order of first appearance.
+    Known Bates numbers are stripped, and those that do not start and end with a letter,
+    digit or _ are ignored. use_automaton=False forces the set lookup even when
+    pyahocorasick is available.
+    """
+
+    def __init__(self, universe=None, pattern=BATES_REFERENCE_PATTERN, use_automaton=True):
+        self.regex = re.compile(pattern)
+        self.automaton = None
+        self.known = None
+        if universe is None:
+            return
+
+        known = {str(b).strip() for b in universe if isinstance(b, str) or pd.notna(b)}
+        known = {b for b in known if b and _is_word_char(b, 0) and _is_word_char(b, len(b) - 1)}
+        if use_automaton and ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for bates in known:
+                self.automaton.add_word(bates, bates)
+            self.automaton.make_automaton()
+        else:
+            # Every known Bates is a run of whole words: index the first word and the
+            # longest run so a text only needs a few set lookups per word
+            self.known = known
+            self.first_words = {_WORD.match(b).group() for b in known}
+            self.max_words = max((len(_WORD.findall(b)) for b in known), default=0)
+
+    def find(self, text):
+        """Referenced Bates numbers in text, each once, in order of first appearance."""
+        if not isinstance(text, str) or not text:
+            return []
+        if self.automaton is not None:
+            found = []
+            for end, bates in self.automaton.iter(text):
+                start = end - len(bates) + 1
+                if not _is_word_char(text, start - 1) and not _is_word_char(text, end + 1):
+                    found.append((start, end, bates))
+            found.sort()
+            return list(dict.fromkeys(bates for _, _, bates in found))
+        if self.known is not None:
+            return self._find_known_words(text)
+        return list(dict.fromkeys(self.regex.findall(text)))
+
+    def _find_known_words(self, text):
+        # Try every run of up to max_words consecutive words that starts with a known first word
+        words = [(m.start(), m.end()) for m in _WORD.finditer(text)]
+        found = []
+        for i, (start, end) in enumerate(words):
+            if text[start:end] not in self.first_words:
+                continue
+            for _, run_end in words[i:i + self.max_words]:
+                candidate = text[start:run_end]
+                if candidate in self.known:
+                    found.append(candidate)
+        return list(dict.fromkeys(found))
+
+# Matcher of each pool worker, built once by _init_worker
+_worker_matcher = None
+
+def _init_worker(universe, pattern, use_automaton):
+    global _worker_matcher
+    _worker_matcher = ReferenceMatcher(universe, pattern, use_automaton)
+
+def _scan_shard(bates, notes, matcher=None):
+    # (source Bates, referenced Bates) pairs for one shard of notes
+    matcher = matcher or _worker_matcher
+    sources, references = [], []
+    for source, note in zip(bates, notes):
+        for reference in matcher.find(note):
+            sources.append(source)
+            references.append(reference)
+    return sources, references
+
+def extract_references(bates, notes, universe=None, pattern=BATES_REFERENCE_PATTERN,
+                       workers=None, shard_notes=SHARD_NOTES, use_automaton=True):
+    """
+    Scan every note for referenced Bates numbers (see ReferenceMatcher) and return a
+    DataFrame with one Bates/Control #, ReferencedBates row per distinct reference of a
+    note, in input order. bates and notes are aligned sequences; empty notes are skipped.
+    More than shard_notes notes are split into shards scanned on a pool of workers
+    processes (default: one per CPU); each worker builds its own matcher once.
+    """
+    bates = pd.Series(bates).to_numpy(dtype=object)
+    notes = pd.Series(notes).to_numpy(dtype=object)
+    has_text = pd.Series(notes).fillna('').astype(str).str.strip().ne('').to_numpy()
+    bates, notes = bates[has_text].tolist(), notes[has_text].tolist()
+    shards = [(bates[i:i + shard_notes], notes[i:i + shard_notes]) for i in range(0, len(notes), shard_notes)]
+
+    workers = workers or os.cpu_count() or 1
+    if len(shards) <= 1 or workers == 1:
+        matcher = ReferenceMatcher(universe, pattern, use_automaton)
+        results = [_scan_shard(shard_bates, shard_notes_, matcher) for shard_bates, shard_notes_ in shards]
+    else:
+        universe = None if universe is None else list(universe)
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_worker,
+                                 initargs=(universe, pattern, use_automaton)) as pool:
+            results = list(pool.map(_scan_shard, *zip(*shards)))
+
+    return pd.DataFrame({
+        'Bates/Control #': [source for sources, _ in results for source in sources],
+        'ReferencedBates': [reference for _, references in results for reference in references],
+    })
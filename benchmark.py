@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import contextlib
+import subprocess
+import multiprocessing
+from datetime import datetime
+import pandas as pd
+import synthetic_data
+import csv_cache
+from run_metrics import children_usage, process_peak_rss_mb
+from tool_loader import TOOL_DIR, load_tool
+
+# Benchmark suite for the tools, run against synthetic datasets (see synthetic_data.py).
+# Each benchmark calls a tool's entry function in a fresh process and records wall time,
+# CPU time, rows per second and peak RSS. Results are appended to a JSON-lines file
+# together with the git version, so runs can be compared across versions.
+
+DEFAULT_SIZES = "10k,1m"
+RESULTS_FILE = "benchmark_results.jsonl"
+
+# ------------------------------
+# Benchmarks. Each takes the dataset paths from synthetic_data.write_dataset and runs one
+# tool entry point end to end (read, process, write), exactly as a user would. A benchmark
+# that processes fewer rows than the dataset has returns its row count.
+# ------------------------------
+def bench_document_ids(paths):
+    load_tool("deduplicated report bates match.py").update_document_ids(paths["master"], paths["duplicate_report"])
+
+def bench_add_md5(paths):
+    load_tool("add md5 from doc id.py").add_md5_to_master(paths["master"], paths["md5_list"])
+
+def bench_civ_nrt(paths):
+    load_tool("add drt and civ bates numbers.py").add_civ_nrt_to_master(paths["master"], paths["civ"], paths["nrt"])
+
+def bench_match_md5(paths):
+    load_tool("md5 matcher.py").match_md5(paths["master"], paths["review_md5"])
+
+def bench_match_md5_passthrough(paths):
+    load_tool("md5 matcher.py").match_md5(paths["master"], paths["review_md5"], passthrough=True)
+
+def bench_file_path_matching(paths):
+    out_dir = os.path.dirname(paths["master"])
+    load_tool("file path matching.py").fill_missing_document_ids(
+        paths["missing_bates"], paths["duplicate_report"],
+        os.path.join(out_dir, "updated_csv1.csv"), os.path.join(out_dir, "unmatched_paths.csv"))
+
+def bench_compare_bates(paths):
+    load_tool("compare bates lists.py").compare_csv(paths["master"], paths["md5_list"])
+
+def bench_compare_bates_ranges(paths):
+    load_tool("compare bates lists.py").compare_csv_ranges(paths["master"], paths["md5_list"])
+
+def bench_group_families(paths):
+    from family_builder import group_families
+    df = pd.read_csv(paths["master"], usecols=["Row #", "Bates/Control #"], encoding="utf-8-sig")
+    group_families(df, "Row #", "Bates/Control #")
+
+def bench_email_near_duplicates(paths):
+    finder = load_tool("email duplication finder.py")
+    finder.find_near_duplicates(pd.read_csv(paths["emails"], encoding="utf-8-sig"),
+                                pd.read_csv(paths["email_group"], encoding="utf-8-sig"))
+
+def bench_email_exact_duplicates(paths):
+    load_tool("email duplication finder.py").find_duplicates(paths["emails"], paths["email_group"])
+
+def bench_duplicate_emails_report(paths):
+    creator = load_tool("duplicate emails report creator.py")
+    # The synthetic email database has the identifying columns but not the review coding ones
+    available = set(pd.read_csv(paths["emails"], nrows=0, encoding="utf-8-sig").columns)
+    creator.create_report(paths["emails"], columns=[c for c in creator.REPORT_COLUMNS if c[2] in available])
+
+def bench_notes_report(paths):
+    load_tool("hyperlink reporting for notes.py").hyperlinked_report(paths["master"])
+
+def bench_referenced_bates(paths):
+    load_tool("hyperlink reporting for notes.py").referenced_bates_report(paths["master"])
+
+def bench_csv_bates_comparison(paths):
+    load_tool("csv bates and refernced comparison.py").compare_csvs(paths["referenced_bates"], paths["pdf_bates"])
+
+def bench_date_converter(paths):
+    load_tool("date converter.py").convert_csv(paths["emails"], False, "%d-%b-%Y %H:%M")
+
+def bench_native_path_overlay(paths):
+    output_csv = os.path.join(os.path.dirname(paths["master"]), "native_paths.csv")
+    return load_tool("natvie path overlay tool.py").write_file_list(paths["natives"], output_csv, hash_files=True)
+
+def bench_bates_numbering(paths):
+    output_csv = os.path.join(os.path.dirname(paths["master"]), "numbered_master.csv")
+    load_tool("bates numbering on folder and aconex.py").process_csv(paths["master"], output_csv, "BEN", "001", "001", False)
+
+def bench_attachment_incrementer(paths):
+    output_csv = os.path.join(os.path.dirname(paths["families"]), "families_updated.csv")
+    load_tool("increment folder number for attachments.py").update_other_bates(paths["families"], output_csv)
+
+def bench_file_path_grouping(paths):
+    load_tool("file path grouping parent child.py").reorder_families(paths["families"])
+
+def bench_add_bates_from_filename(paths):
+    load_tool("add bates from filename.py").match_filenames(paths["filenames"], paths["master"])
+
+def bench_pipeline(paths):
+    load_tool("pipeline runner.py").run_pipeline(paths["master"], {
+        "duplicate_report_csv": paths["duplicate_report"],
+        "bates_csv": paths["md5_list"],
+        "civ_csv": paths["civ"],
+        "nrt_csv": paths["nrt"],
+        "second_csv": paths["review_md5"],
+    }, outputs=["master", "unmatched_document_ids", "unmatched_md5"])
+
+BENCHMARKS = {
+    "document_ids": bench_document_ids,
+    "add_md5": bench_add_md5,
+    "civ_nrt": bench_civ_nrt,
+    "match_md5": bench_match_md5,
+    "match_md5_passthrough": bench_match_md5_passthrough,
+    "file_path_matching": bench_file_path_matching,
+    "compare_bates": bench_compare_bates,
+    "compare_bates_ranges": bench_compare_bates_ranges,
+    "group_families": bench_group_families,
+    "email_near_duplicates": bench_email_near_duplicates,
+    "email_exact_duplicates": bench_email_exact_duplicates,
+    "duplicate_emails_report": bench_duplicate_emails_report,
+    "notes_report": bench_notes_report,
+    "referenced_bates": bench_referenced_bates,
+    "csv_bates_comparison": bench_csv_bates_comparison,
+    "date_converter": bench_date_converter,
+    "native_path_overlay": bench_native_path_overlay,
+    "bates_numbering": bench_bates_numbering,
+    "attachment_incrementer": bench_attachment_incrementer,
+    "file_path_grouping": bench_file_path_grouping,
+    "add_bates_from_filename": bench_add_bates_from_filename,
+    "pipeline": bench_pipeline,
+}
+
+def _run_child(name, paths, queue):
+    # Runs in a fresh process so peak RSS belongs to this benchmark alone. CPU time and
+    # peak RSS include the benchmark's own child processes (process pool workers): their
+    # CPU time is added, and the largest child's peak is added to this process's peak (an
+    # upper bound for forked workers, whose peak also counts pages shared with this process).
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            wall_start, cpu_start = time.perf_counter(), time.process_time() + children_usage()[0]
+            processed = BENCHMARKS[name](paths)
+            wall = time.perf_counter() - wall_start
+            children_cpu, children_peak = children_usage()
+            cpu = time.process_time() + children_cpu - cpu_start
+        peak = process_peak_rss_mb()
+        if peak is not None and children_peak is not None:
+            peak += children_peak
+        queue.put({"status": "ok", "wall_seconds": wall, "cpu_seconds": cpu, "peak_rss_mb": peak,
+                   "children_peak_rss_mb": children_peak,
+                   "rows_processed": processed if isinstance(processed, int) else None})
+    except Exception as e:
+        queue.put({"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+def run_benchmark(name, paths, rows):
+    """Run one benchmark in a fresh process and return its result record."""
+    # Start from a cold columnar cache so runs stay comparable
+    for path in paths.values():
+        csv_cache.clear_cache(path)
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_run_child, args=(name, paths, queue))
+    process.start()
+    process.join()
+    result = queue.get() if not queue.empty() else {"status": "error", "error": f"exit code {process.exitcode}"}
+
+    record = {"benchmark": name, "rows": rows, "version": code_version(),
+              "timestamp": datetime.now().isoformat(timespec="seconds"),
+              "python": sys.version.split()[0], "pandas": pd.__version__}
+    record.update(result)
+    if result["status"] == "ok":
+        processed = result["rows_processed"] or rows
+        record["rows_per_second"] = processed / result["wall_seconds"] if result["wall_seconds"] else None
+    return record
+
+def code_version():
+    """Short git commit of the tools (with '-dirty' for uncommitted changes), or 'unknown'."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TOOL_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=TOOL_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def dataset_paths(root_dir, rows):
+    """
+    Return the dataset for a size, generating it the first time it is needed (or again when
+    it was generated before synthetic_data added files to it).
+    """
+    out_dir = os.path.join(root_dir, f"rows_{rows}")
+    marker = os.path.join(out_dir, ".complete")
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in synthetic_data.DATASET_NAMES}
+    paths["natives"] = os.path.join(out_dir, "natives")
+    if not os.path.exists(marker) or not all(os.path.exists(path) for path in paths.values()):
+        synthetic_data.write_dataset(out_dir, rows)
+        open(marker, "w").close()
+    return paths
+
+def run_suite(root_dir, sizes=DEFAULT_SIZES, benchmarks=None, results_path=None):
+    """
+    Run the selected benchmarks (all by default) at each size, append every result to the
+    results file and return them as a DataFrame. sizes is a list or a comma-separated
+    string such as '10k,1m,10m'.
+    """
+    if isinstance(sizes, str):
+        sizes = sizes.split(",")
+    benchmarks = benchmarks or list(BENCHMARKS)
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        raise ValueError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    results_path = results_path or os.path.join(root_dir, RESULTS_FILE)
+
+    records = []
+    for size in sizes:
+        rows = synthetic_data.parse_size(size)
+        paths = dataset_paths(root_dir, rows)
+        for name in benchmarks:
+            print(f"Running {name} on {rows:,} rows...")
+            record = run_benchmark(name, paths, rows)
+            records.append(record)
+            with open(results_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            if record["status"] != "ok":
+                print(f"  failed: {record['error']}")
+
+    summary = pd.DataFrame(records)
+    print(summary.reindex(columns=["benchmark", "rows", "status", "wall_seconds", "cpu_seconds",
+                                   "rows_per_second", "peak_rss_mb"]).to_string(index=False, float_format="%.2f"))
+    print(f"Results appended to {results_path}")
+    return summary
+
+def compare_versions(results_path, base_version, head_version):
+    """Print wall time and peak RSS of two versions side by side (latest run of each)."""
+    results = pd.read_json(results_path, lines=True)
+    results = results[results["status"] == "ok"]
+    latest = results.sort_values("timestamp").groupby(["version", "benchmark", "rows"]).last()
+    base = latest.loc[base_version][["wall_seconds", "peak_rss_mb"]]
+    head = latest.loc[head_version][["wall_seconds", "peak_rss_mb"]]
+    comparison = base.join(head, lsuffix="_base", rsuffix="_head", how="inner")
+    comparison["wall_ratio"] = comparison["wall_seconds_head"] / comparison["wall_seconds_base"]
+    comparison["rss_ratio"] = comparison["peak_rss_mb_head"] / comparison["peak_rss_mb_base"]
+    print(comparison.to_string(float_format="%.2f"))
+    return comparison
+
+if __name__ == "__main__":
+    root_dir = input("Enter the directory for datasets and results: ").strip().strip('"')
+    sizes = input(f"Enter the sizes to run, comma-separated (blank for {DEFAULT_SIZES}; 10m is also supported): ").strip()
+    selected = input(f"Enter benchmarks to run, comma-separated (blank for all: {', '.join(BENCHMARKS)}): ").strip()
+    run_suite(root_dir, sizes or DEFAULT_SIZES,
+              [name.strip() for name in selected.split(",")] if selected else None)
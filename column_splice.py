@@ -0,0 +1,77 @@
+import pandas as pd
+
+# Column-splice writer: add one derived column to a CSV without re-parsing or
+# re-serializing the other columns. Only the key column goes through pandas; every
+# original record is copied byte for byte and the new field is appended to it.
+
+def _field_encoding(encoding):
+    # The BOM (if any) is already part of the copied bytes; never add a second one.
+    return "utf-8" if encoding.lower().replace("_", "-") == "utf-8-sig" else encoding
+
+def format_field(value, sep=","):
+    """Format one value the way DataFrame.to_csv would (minimal quoting, NaN -> '')."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    text = str(value)
+    if sep in text or '"' in text or "\n" in text or "\r" in text:
+        text = '"' + text.replace('"', '""') + '"'
+    return text
+
+def iter_records(f):
+    """
+    Yield the raw bytes of each CSV record from a binary file, keeping quoted newlines
+    inside their record. Works for any ASCII-compatible encoding (UTF-8, Latin-1, cp1252).
+    """
+    record = b""
+    quotes = 0
+    for line in f:
+        record += line
+        quotes += line.count(b'"')
+        # An odd number of quotes means the newline is inside a quoted field.
+        if quotes % 2 == 0:
+            yield record
+            record = b""
+            quotes = 0
+    if record:
+        yield record
+
+def splice_column(input_csv, output_csv, key_column, new_column, compute, encoding="utf-8", sep=","):
+    """
+    Write a copy of input_csv with new_column appended to every record.
+    compute receives the key column (parsed by pandas with the same encoding) and must
+    return one value per data row. All other bytes of the input, including its BOM,
+    quoting and line endings, are written unchanged.
+    Returns the computed values.
+    """
+    header = pd.read_csv(input_csv, nrows=0, encoding=encoding, sep=sep).columns
+    if key_column not in header:
+        raise ValueError(f"CSV does not contain the '{key_column}' column.")
+    if new_column in header:
+        raise ValueError(f"CSV already has a '{new_column}' column; it cannot be replaced by splicing.")
+
+    key_df = pd.read_csv(input_csv, usecols=[key_column], encoding=encoding, sep=sep)
+    values = pd.Series(compute(key_df[key_column]))
+    if len(values) != len(key_df):
+        raise ValueError(f"Expected {len(key_df)} values for '{new_column}', got {len(values)}.")
+
+    field_encoding = _field_encoding(encoding)
+    delimiter = sep.encode(field_encoding)
+    fields = iter([format_field(new_column, sep)] + [format_field(v, sep) for v in values])
+    written = 0
+
+    with open(input_csv, "rb") as src, open(output_csv, "wb") as dst:
+        for record in iter_records(src):
+            body = record.rstrip(b"\r\n")
+            # pandas skips blank lines, so they get no value either
+            if not body:
+                dst.write(record)
+                continue
+            field = next(fields, None)
+            if field is None:
+                raise ValueError(f"{input_csv} has more records than pandas parsed; check the file's quoting.")
+            dst.write(body + delimiter + field.encode(field_encoding) + record[len(body):])
+            written += 1
+
+    if written != len(values) + 1:
+        raise ValueError(f"{input_csv} has fewer records than pandas parsed; check the file's quoting.")
+    return values
@@ -1,46 +1,162 @@
 import pandas as pd
+import numpy as np
 import os
+from bates_codec import parse_bates, sort_bates, format_bates
+from csv_cache import read_csv_cached
+from run_metrics import RunMetrics
+
+def compare_csv(csv1, csv2, column_name="Bates/Control #", metrics_json=None):
+    # Per-stage timings are printed at the end (and written to metrics_json when given).
+    metrics = RunMetrics("compare bates lists")
 
-def compare_csv(csv1, csv2, column_name="Bates/Control #"):
     # Load both CSV files into dataframes
-    df1 = pd.read_csv(csv1)
-    df2 = pd.read_csv(csv2)
+    with metrics.stage("read") as stage:
+        df1 = pd.read_csv(csv1)
+        df2 = pd.read_csv(csv2)
+        stage["rows"] = len(df1) + len(df2)
     
     # Ensure the column name exists in both dataframes
     if column_name not in df1.columns or column_name not in df2.columns:
         raise ValueError(f"Column '{column_name}' not found in one or both CSV files.")
     
-    # Get the set of Bates numbers from each CSV
-    bates_csv1 = set(df1[column_name].dropna())
-    bates_csv2 = set(df2[column_name].dropna())
-    
-    # Find the extra Bates numbers in CSV1 compared to CSV2
-    extra_in_csv1 = bates_csv1 - bates_csv2
-    missing_in_csv1 = bates_csv2 - bates_csv1
-    
-    # Prepare the differences to be written to a CSV file
-    differences = []
-    
-    # Add extra Bates numbers in CSV1
-    if extra_in_csv1:
-        for bates in extra_in_csv1:
-            differences.append({"Bates Number": bates, "Status": "Extra in CSV1"})
-    
-    # Add missing Bates numbers in CSV1
-    if missing_in_csv1:
-        for bates in missing_in_csv1:
-            differences.append({"Bates Number": bates, "Status": "Missing in CSV1"})
-    
+    with metrics.stage("compare", rows=len(df1) + len(df2)):
+        # Get the set of Bates numbers from each CSV
+        bates_csv1 = set(df1[column_name].dropna())
+        bates_csv2 = set(df2[column_name].dropna())
+
+        # Find the extra Bates numbers in CSV1 compared to CSV2
+        extra_in_csv1 = bates_csv1 - bates_csv2
+        missing_in_csv1 = bates_csv2 - bates_csv1
+
+        # Prepare the differences to be written to a CSV file
+        differences = []
+
+        # Add extra Bates numbers in CSV1
+        if extra_in_csv1:
+            for bates in extra_in_csv1:
+                differences.append({"Bates Number": bates, "Status": "Extra in CSV1"})
+
+        # Add missing Bates numbers in CSV1
+        if missing_in_csv1:
+            for bates in missing_in_csv1:
+                differences.append({"Bates Number": bates, "Status": "Missing in CSV1"})
+
     # Define the output file path (same directory as csv1)
     output_file = os.path.join(os.path.dirname(csv1), "bates_comparison_results.csv")
-    
+
     # Convert the differences list to a DataFrame and save it as CSV
-    differences_df = pd.DataFrame(differences)
-    differences_df.to_csv(output_file, index=False)
-    
+    with metrics.stage("write", rows=len(differences)):
+        differences_df = pd.DataFrame(differences)
+        differences_df.to_csv(output_file, index=False)
+
     print(f"Differences saved to: {output_file}")
+    metrics.finish(metrics_json)
+
+def diff_ranges(bates1, bates2):
+    """
+    Compare two columns of Bates numbers and return the differences as ranges.
+    Both lists are parsed (see bates_codec.py), merged in numeric order, and every run of
+    consecutive Bates numbers with the same status is collapsed into one row:
+    Start Bates, End Bates, Range (e.g. ABC.001.002.0001–0457), Count and Status.
+    Values that do not follow the PREFIX.BOX.FOLDER.PAGE format are reported one per row.
+    """
+    values1 = pd.Series(bates1).dropna().drop_duplicates().reset_index(drop=True)
+    values2 = pd.Series(bates2).dropna().drop_duplicates().reset_index(drop=True)
+    parsed1 = parse_bates(values1)
+    parsed2 = parse_bates(values2)
+    key_columns = ["prefix", "box", "folder", "page", "suffix"]
+
+    # Merge both lists in numeric Bates order; bit 1 = in CSV1, bit 2 = in CSV2.
+    combined = pd.concat([
+        parsed1[parsed1["valid"]].assign(source=1),
+        parsed2[parsed2["valid"]].assign(source=2),
+    ], ignore_index=True)
+    combined["prefix"] = combined["prefix"].astype("category")
+    combined = sort_bates(combined)
+    keys = combined[key_columns].assign(prefix=combined["prefix"].cat.codes)
+    new_key = np.ones(len(combined), dtype=bool)
+    if len(combined) > 1:
+        new_key[1:] = (keys.to_numpy()[1:] != keys.to_numpy()[:-1]).any(axis=1)
+    starts = np.flatnonzero(new_key)
+    status = np.bitwise_or.reduceat(combined["source"].to_numpy(), starts) if len(starts) else np.array([], dtype=int)
+
+    # Keep the values present on one side only.
+    unique = combined.iloc[starts][status != 3].copy()
+    unique["source"] = status[status != 3]
+
+    # A new range starts unless the value directly follows the previous one with the same status.
+    n = len(unique)
+    codes = unique["prefix"].cat.codes.to_numpy()
+    box, folder = unique["box"].to_numpy(), unique["folder"].to_numpy()
+    page, suffix = unique["page"].to_numpy(), unique["suffix"].to_numpy()
+    source = unique["source"].to_numpy()
+    run_start = np.ones(n, dtype=bool)
+    if n > 1:
+        same = ((codes[1:] == codes[:-1]) & (box[1:] == box[:-1])
+                & (folder[1:] == folder[:-1]) & (source[1:] == source[:-1]))
+        next_page = (page[1:] == page[:-1] + 1) & (suffix[1:] == suffix[:-1])
+        next_suffix = (page[1:] == page[:-1]) & (suffix[:-1] >= 0) & (suffix[1:] == suffix[:-1] + 1)
+        run_start[1:] = ~(same & (next_page | next_suffix))
+    first = np.flatnonzero(run_start)
+    last = np.append(first[1:] - 1, n - 1) if n else first
+
+    start_bates = format_bates(unique.iloc[first]).to_numpy()
+    end_bates = format_bates(unique.iloc[last]).to_numpy()
+    end_short = [end.rsplit(".", 1)[-1] for end in end_bates]
+    ranges = pd.DataFrame({
+        "Start Bates": start_bates,
+        "End Bates": end_bates,
+        "Range": [s if s == e else f"{s}–{short}" for s, e, short in zip(start_bates, end_bates, end_short)],
+        "Count": last - first + 1,
+        "Status": np.where(source[first] == 1, "Extra in CSV1", "Missing in CSV1"),
+    })
+
+    # Values outside the structured format are compared as plain strings.
+    other1 = set(values1[~parsed1["valid"]])
+    other2 = set(values2[~parsed2["valid"]])
+    others = [(b, "Extra in CSV1") for b in sorted(other1 - other2, key=str)]
+    others += [(b, "Missing in CSV1") for b in sorted(other2 - other1, key=str)]
+    if others:
+        ranges = pd.concat([ranges, pd.DataFrame({
+            "Start Bates": [b for b, _ in others],
+            "End Bates": [b for b, _ in others],
+            "Range": [b for b, _ in others],
+            "Count": 1,
+            "Status": [s for _, s in others],
+        })], ignore_index=True)
+    return ranges
+
+def compare_csv_ranges(csv1, csv2, column_name="Bates/Control #", metrics_json=None):
+    """Range-compressed version of compare_csv: report extra and missing spans instead of items."""
+    metrics = RunMetrics("compare bates lists (ranges)")
+
+    # Only the Bates column is needed from each file
+    with metrics.stage("read") as stage:
+        df1 = read_csv_cached(csv1, usecols=lambda c: c == column_name)
+        df2 = read_csv_cached(csv2, usecols=lambda c: c == column_name)
+        stage["rows"] = len(df1) + len(df2)
+
+    # Ensure the column name exists in both dataframes
+    if column_name not in df1.columns or column_name not in df2.columns:
+        raise ValueError(f"Column '{column_name}' not found in one or both CSV files.")
+
+    with metrics.stage("compare", rows=len(df1) + len(df2)):
+        ranges = diff_ranges(df1[column_name], df2[column_name])
+
+    # Define the output file path (same directory as csv1)
+    output_file = os.path.join(os.path.dirname(csv1), "bates_comparison_ranges.csv")
+    with metrics.stage("write", rows=len(ranges)):
+        ranges.to_csv(output_file, index=False, encoding="utf-8-sig")
+
+    print(f"{len(ranges)} differing ranges saved to: {output_file}")
+    metrics.finish(metrics_json)
 
-# Example usage
-csv1_path = input("Paste csv 1 file path:").strip().strip('"')
-csv2_path = input("Paste file pth for csv2:").strip().strip('"')
-compare_csv(csv1_path, csv2_path)
+if __name__ == "__main__":
+    # Example usage
+    csv1_path = input("Paste csv 1 file path:").strip().strip('"')
+    csv2_path = input("Paste file pth for csv2:").strip().strip('"')
+    range_choice = input("Collapse consecutive Bates numbers into ranges? (yes/no): ").strip().lower()
+    if range_choice in ["yes", "y"]:
+        compare_csv_ranges(csv1_path, csv2_path)
+    else:
+        compare_csv(csv1_path, csv2_path)
@@ -1,85 +1,90 @@
+import numpy as np
 import pandas as pd
-from collections import defaultdict
 import os
+from run_metrics import RunMetrics
+
+STATUS_BY_SIDE = {"left_only": "Missing in CSV 2", "right_only": "Extra in CSV 2"}
 
 def group_bates_by_pattern(csv_path, pattern_column, bates_column, file_column=None):
     """
-    Group Bates numbers by pattern or file (based on the CSV).
-    If file_column is provided, group by PDF file, else by ReferencedBates (Pattern).
+    Read the (Pattern, Bates/Control #) pairs of a CSV, one row per distinct pair.
+    If file_column is provided, the pattern is the PDF file name without '.pdf',
+    else it is pattern_column (ReferencedBates). Values are read as text.
     """
-    df = pd.read_csv(csv_path)
+    df = pd.read_csv(csv_path, dtype=str)
 
     # Strip any leading/trailing spaces in column names
     df.columns = df.columns.str.strip()
 
-    grouped_data = defaultdict(list)
-
     if file_column:
         # Group by PDF file (Pattern is in the PDF file name, remove '.pdf')
-        for _, row in df.iterrows():
-            pattern = row[file_column].replace(".pdf", "")  # Remove extension
-            bates_number = row[bates_column]
-            grouped_data[pattern].append(bates_number)
+        pattern = df[file_column].str.replace(".pdf", "", regex=False)
     else:
         # Group by ReferencedBates (CSV 1 - Pattern)
-        for _, row in df.iterrows():
-            referenced_bates = row[pattern_column]
-            bates_number = row[bates_column]
-            grouped_data[referenced_bates].append(bates_number)
-    
-    return grouped_data
+        pattern = df[pattern_column]
 
-def compare_grouped_bates(grouped_csv1, grouped_csv2):
-    results = []
-
-    # Compare the grouped Bates numbers for CSV 1 to CSV 2
-    for referenced_bates in grouped_csv1:
-        if referenced_bates in grouped_csv2:
-            # Find missing Bates numbers in CSV 2 (CSV 1 has them but CSV 2 does not)
-            missing_in_csv2 = set(grouped_csv1[referenced_bates]) - set(grouped_csv2[referenced_bates])
-
-            # Add missing Bates numbers to results
-            for missing_bates in missing_in_csv2:
-                results.append({"Pattern": referenced_bates, "Bates/Control #": missing_bates, "Status": "Missing in CSV 2"})
-        else:
-            # If the referenced_bates doesn't exist in CSV 2 at all, it's completely missing
-            for bates_number in grouped_csv1[referenced_bates]:
-                results.append({"Pattern": referenced_bates, "Bates/Control #": bates_number, "Status": "Missing in CSV 2"})
-
-    # Find extra Bates numbers in CSV 2 (those present in CSV 2 but not in CSV 1)
-    for referenced_bates in grouped_csv2:
-        if referenced_bates not in grouped_csv1:
-            for bates_number in grouped_csv2[referenced_bates]:
-                results.append({"Pattern": referenced_bates, "Bates/Control #": bates_number, "Status": "Extra in CSV 2"})
+    pairs = pd.DataFrame({"Pattern": pattern.to_numpy(), "Bates/Control #": df[bates_column].to_numpy()})
+    return pairs.drop_duplicates(ignore_index=True)
 
+def compare_grouped_bates(grouped_csv1, grouped_csv2):
+    """
+    Compare the (Pattern, Bates/Control #) pairs of CSV 1 and CSV 2 with one outer merge.
+    Returns the pairs found on one side only, with Status "Missing in CSV 2" (only in CSV 1)
+    or "Extra in CSV 2" (only in CSV 2), whether or not the pattern exists on both sides.
+    Rows are grouped by pattern, in order of first appearance (CSV 1 before CSV 2).
+    """
+    both = pd.concat([grouped_csv1, grouped_csv2], ignore_index=True)
+
+    # Each (pattern, Bates) pair as one integer, so the merge joins on a single numeric key
+    pattern_codes, _ = pd.factorize(both["Pattern"], use_na_sentinel=False)
+    bates_codes, bates_values = pd.factorize(both["Bates/Control #"], use_na_sentinel=False)
+    key = pattern_codes.astype(np.int64) * max(len(bates_values), 1) + bates_codes
+
+    rows = np.arange(len(both))
+    n1 = len(grouped_csv1)
+    merged = pd.DataFrame({"_key": key[:n1], "_row": rows[:n1]}).merge(
+        pd.DataFrame({"_key": key[n1:], "_row": rows[n1:]}), on="_key", how="outer", indicator=True)
+    merged = merged[merged["_merge"] != "both"]
+    one_side = merged["_row_x"].fillna(merged["_row_y"]).to_numpy().astype(np.int64)
+
+    results = both.iloc[one_side].reset_index(drop=True)
+    results["Status"] = merged["_merge"].astype(str).map(STATUS_BY_SIDE).to_numpy()
     return results
 
-def main():
-    # Input file paths
-    csv1_path = input("Enter the path to the first CSV (from notes text): ").strip().strip('"')
-    csv2_path = input("Enter the path to the second CSV (from PDF extraction): ").strip().strip('"')
-
-    # Read CSV 1 directory path to save results in the same directory
-    input_directory = os.path.dirname(csv1_path)
+def compare_csvs(csv1_path, csv2_path, metrics_json=None):
+    """
+    Compare CSV 1 (ReferencedBates, Bates/Control # from the notes text) with CSV 2
+    (PDF_File, Bates/Control # from the PDF extraction) and write the differences to
+    comparison_results.csv next to CSV 1. Returns the output path.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("csv bates and referenced comparison")
 
-    # Group Bates numbers by ReferencedBates for CSV 1 (grouped by referenced Bates)
-    grouped_csv1 = group_bates_by_pattern(csv1_path, 'ReferencedBates', 'Bates/Control #')
+    with metrics.stage("read") as stage:
+        # (ReferencedBates, Bates) pairs for CSV 1
+        grouped_csv1 = group_bates_by_pattern(csv1_path, 'ReferencedBates', 'Bates/Control #')
 
-    # Group Bates numbers by PDF file (grouped by file name) for CSV 2
-    grouped_csv2 = group_bates_by_pattern(csv2_path, 'Pattern', 'Bates/Control #', file_column='PDF_File')
+        # (PDF file name, Bates) pairs for CSV 2
+        grouped_csv2 = group_bates_by_pattern(csv2_path, 'Pattern', 'Bates/Control #', file_column='PDF_File')
+        stage["rows"] = len(grouped_csv1) + len(grouped_csv2)
 
     # Compare grouped Bates numbers between CSV 1 and CSV 2
-    results = compare_grouped_bates(grouped_csv1, grouped_csv2)
-
-    # Create a DataFrame from the results
-    result_df = pd.DataFrame(results)
+    with metrics.stage("compare", rows=len(grouped_csv1) + len(grouped_csv2)):
+        result_df = compare_grouped_bates(grouped_csv1, grouped_csv2)
 
-    # Create the output file path in the same directory as CSV 1
-    output_csv_path = os.path.join(input_directory, 'comparison_results.csv')
+    # Save the results in the same directory as CSV 1
+    output_csv_path = os.path.join(os.path.dirname(csv1_path), 'comparison_results.csv')
+    with metrics.stage("write", rows=len(result_df)):
+        result_df.to_csv(output_csv_path, index=False)
+    metrics.finish(metrics_json)
+    return output_csv_path
 
-    # Save the results to a new CSV
-    result_df.to_csv(output_csv_path, index=False)
+def main():
+    # Input file paths
+    csv1_path = input("Enter the path to the first CSV (from notes text): ").strip().strip('"')
+    csv2_path = input("Enter the path to the second CSV (from PDF extraction): ").strip().strip('"')
 
+    output_csv_path = compare_csvs(csv1_path, csv2_path)
     print(f"Comparison complete. Results saved to {output_csv_path}")
 
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import os
+import json
+import hashlib
+import pandas as pd
+
+# Transparent columnar cache for input CSVs.
+# A read parses only the columns the tool asks for and saves them as Parquet next to the
+# CSV (in a .csv_cache folder). Later reads with the same parse options load their columns
+# from the Parquet file; a read that needs columns the cache lacks parses those plus the
+# cached ones and replaces the cache file. Every read returns what the cache holds, so the
+# first read and later ones give the same dtypes. There is one cache file per CSV and set
+# of parse options: older copies are removed when a new one is written. Needs pyarrow;
+# without it every read falls back to plain pd.read_csv.
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+CACHE_DIR_NAME = ".csv_cache"
+# Bytes hashed from the start and end of the CSV as its content fingerprint.
+SAMPLE_BYTES = 1024 * 1024
+
+def content_fingerprint(path):
+    """Hash the size plus the first and last SAMPLE_BYTES of a file (cheap even for multi-GB files)."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if size > SAMPLE_BYTES:
+            f.seek(max(size - SAMPLE_BYTES, SAMPLE_BYTES))
+            digest.update(f.read(SAMPLE_BYTES))
+    return digest.hexdigest()
+
+def _short_hash(text, length):
+    return hashlib.sha1(text.encode()).hexdigest()[:length]
+
+def _cache_prefix(csv_path, read_kwargs=None, cache_dir=None):
+    # "<cache dir>/<stem>-<path hash>-" for every copy of a CSV, plus "<options hash>-"
+    # for the copies read with read_kwargs
+    csv_path = os.path.abspath(csv_path)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(csv_path), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    prefix = f"{stem}-{_short_hash(csv_path, 8)}-"
+    if read_kwargs is not None:
+        options = json.dumps({k: repr(v) for k, v in sorted(read_kwargs.items())}, sort_keys=True)
+        prefix += f"{_short_hash(options, 8)}-"
+    return os.path.join(cache_dir, prefix)
+
+def cache_path_for(csv_path, read_kwargs, cache_dir=None):
+    """Return the Parquet path for a CSV, keyed on path, parse options, size, mtime and content."""
+    st = os.stat(csv_path)
+    key = json.dumps({
+        "size": st.st_size,
+        "mtime": st.st_mtime_ns,
+        "content": content_fingerprint(csv_path),
+    }, sort_keys=True)
+    return _cache_prefix(csv_path, read_kwargs, cache_dir) + f"{_short_hash(key, 16)}.parquet"
+
+def _remove_superseded(cache_file, prefix):
+    # Delete the other copies of the same CSV and parse options (older contents)
+    cache_dir, start = os.path.split(prefix)
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(start) and name.endswith(".parquet") and path != cache_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _resolve_columns(usecols, available):
+    if usecols is None:
+        return None
+    if callable(usecols):
+        return [c for c in available if usecols(c)]
+    return [c for c in available if c in set(usecols)]
+
+def _parquet_safe(df):
+    # Arrow needs one type per column; object columns holding mixed values are stored as text.
+    df = df.copy(deep=False)
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if not values.map(lambda v: isinstance(v, str)).all():
+            df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+    return df
+
+def read_csv_cached(csv_path, usecols=None, cache_dir=None, **read_kwargs):
+    """
+    Drop-in for pd.read_csv(csv_path, usecols=usecols, **read_kwargs) backed by a Parquet cache.
+    usecols may be a list of names or a callable, as with pd.read_csv. Columns of mixed
+    types come back as text, on the first read as on later ones. Chunked reads are not cached.
+    """
+    if pq is None or read_kwargs.get("chunksize") or read_kwargs.get("iterator"):
+        return pd.read_csv(csv_path, usecols=usecols, **read_kwargs)
+
+    header = list(pd.read_csv(csv_path, nrows=0, **read_kwargs).columns)
+    columns = _resolve_columns(usecols, header)
+    wanted = header if columns is None else columns
+
+    cache_file = cache_path_for(csv_path, read_kwargs, cache_dir)
+    cached = pq.read_schema(cache_file).names if os.path.exists(cache_file) else []
+    if all(c in cached for c in wanted):
+        return pd.read_parquet(cache_file, columns=wanted)
+
+    # Parse the requested columns plus those already cached, so the new cache file
+    # still serves the earlier readers, then return the columns as stored.
+    needed = [c for c in header if c in cached or c in wanted]
+    df = _parquet_safe(pd.read_csv(csv_path, usecols=needed, **read_kwargs))
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = cache_file + ".tmp"
+        df.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+        _remove_superseded(cache_file, _cache_prefix(csv_path, read_kwargs, cache_dir))
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Warning: could not cache {csv_path}: {e}")
+        return df[wanted]
+    return pd.read_parquet(cache_file, columns=wanted)
+
+def clear_cache(csv_path, cache_dir=None):
+    """Delete every cached copy of a CSV."""
+    prefix = _cache_prefix(csv_path, cache_dir=cache_dir)
+    cache_dir, start = os.path.split(prefix)
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.startswith(start) and (name.endswith(".parquet") or name.endswith(".parquet.tmp")):
+            os.remove(os.path.join(cache_dir, name))
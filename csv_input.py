@@ -0,0 +1,235 @@
+import os
+import csv
+import codecs
+import pandas as pd
+
+# Shared input layer for CSV exports of unknown encoding.
+# sniff_csv looks at a bounded sample of the file to pick the encoding and BOM, and at
+# the header line to pick the delimiter. read_csv_auto then reads the file once, decoding
+# line by line: a line that is not valid in the sniffed encoding is decoded with the
+# fallback encoding instead of failing the whole read, and its line number is reported.
+
+SAMPLE_BYTES = 1024 * 1024
+BLOCK_BYTES = 4 * 1024 * 1024
+# Bytes read at a time past the end of a block to finish its last line.
+LINE_BYTES = 64 * 1024
+FALLBACK_ENCODING = "ISO-8859-1"
+DELIMITERS = ",;\t|"
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+def sniff_delimiter(header):
+    """
+    The delimiter of a CSV header line: a comma unless the header has no comma-separated
+    fields and another of DELIMITERS splits it into more fields (quotes are respected).
+    """
+    field_counts = {d: len(next(csv.reader([header], delimiter=d), [])) for d in DELIMITERS}
+    if field_counts[","] > 1:
+        return ","
+    best = max(DELIMITERS, key=lambda d: field_counts[d])
+    return best if field_counts[best] > 1 else ","
+
+def sniff_csv(path, sample_bytes=SAMPLE_BYTES, fallback_encoding=FALLBACK_ENCODING):
+    """
+    Return {"encoding", "bom", "delimiter"} for a CSV, from its first sample_bytes only.
+    The encoding is taken from the BOM when there is one, otherwise UTF-8 if the sample
+    decodes as UTF-8, otherwise fallback_encoding. The delimiter comes from the header
+    line (see sniff_delimiter).
+    """
+    with open(path, "rb") as f:
+        sample = f.read(sample_bytes)
+
+    bom, encoding = b"", None
+    for mark, name in BOMS:
+        if sample.startswith(mark):
+            bom, encoding = mark, name
+            break
+    if encoding is None:
+        try:
+            # final=False so a character cut off by the end of the sample is not an error
+            codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+            encoding = "utf-8"
+        except UnicodeDecodeError:
+            encoding = fallback_encoding
+
+    # Only the header line: data rows (free text, numbers with decimal commas) mislead
+    text = sample[len(bom):].decode(encoding, errors="replace")
+    delimiter = sniff_delimiter(text.split("\n", 1)[0].rstrip("\r"))
+
+    return {"encoding": encoding, "bom": bom, "delimiter": delimiter}
+
+class FallbackDecodingReader:
+    """
+    Text stream over a binary file decoded with an incremental decoder, in blocks of
+    whole lines. Lines that fail to decode are decoded with fallback_encoding and their
+    1-based line numbers are collected in fallback_lines. Lines end at the newline as
+    encoded in the file's encoding, so UTF-16 lines are split on whole code units; a
+    single-byte fallback cannot read UTF-16, so there bad lines are decoded in the file's
+    encoding with replacement characters instead.
+    """
+
+    def __init__(self, path, encoding, fallback_encoding=FALLBACK_ENCODING, skip_bytes=0):
+        self._file = open(path, "rb")
+        self._file.seek(skip_bytes)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._newline = "\n".encode(encoding)
+        self.encoding = encoding
+        self.fallback_encoding = fallback_encoding if len(self._newline) == 1 else encoding
+        self.fallback_lines = []
+        self._line_number = 0
+        # Decoded text not yet returned is self._buffer[self._pos:]
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def _decode_line(self, line):
+        self._line_number += 1
+        try:
+            return self._decoder.decode(line)
+        except UnicodeDecodeError:
+            self._decoder.reset()
+            self.fallback_lines.append(self._line_number)
+            return line.decode(self.fallback_encoding, errors="replace")
+
+    def _find_newline(self, data, start=0):
+        # Offset of the first encoded newline at or after start that begins on a code unit
+        width = len(self._newline)
+        end = data.find(self._newline, start)
+        while end > 0 and end % width:
+            end = data.find(self._newline, end + 1)
+        return end
+
+    def _split_lines(self, block):
+        # The lines of a block, each with its newline (the last may have none)
+        lines, start = [], 0
+        while start < len(block):
+            end = self._find_newline(block, start)
+            end = len(block) if end < 0 else end + len(self._newline)
+            lines.append(block[start:end])
+            start = end
+        return lines
+
+    def _finish_line(self, block):
+        # Extend block to the end of its last line, reading ahead and seeking back the excess
+        while True:
+            more = self._file.read(LINE_BYTES)
+            end = self._find_newline(more)
+            if end < 0:
+                block += more
+                if len(more) < LINE_BYTES:
+                    return block
+                continue
+            end += len(self._newline)
+            self._file.seek(end - len(more), os.SEEK_CUR)
+            return block + more[:end]
+
+    def _next_block(self):
+        # Read whole lines in blocks; only a block that fails to decode is retried line by line.
+        block = self._file.read(BLOCK_BYTES)
+        if len(block) == BLOCK_BYTES and not block.endswith(self._newline):
+            block = self._finish_line(block)
+        if not block:
+            self._eof = True
+            try:
+                return self._decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                self.fallback_lines.append(self._line_number)
+                return ""
+        try:
+            text = self._decoder.decode(block)
+            self._line_number += text.count("\n")
+            return text
+        except UnicodeDecodeError:
+            self._decoder.reset()
+            return "".join(self._decode_line(line) for line in self._split_lines(block))
+
+    def _fill(self, size):
+        # Decode blocks until size characters are buffered past self._pos (or the file ends),
+        # joining the unread rest and the new blocks once instead of growing a string per block
+        available = len(self._buffer) - self._pos
+        if available >= size or self._eof:
+            return
+        parts = [self._buffer[self._pos:]]
+        while not self._eof and available < size:
+            parts.append(self._next_block())
+            available += len(parts[-1])
+        self._buffer, self._pos = "".join(parts), 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = float("inf")
+        self._fill(size)
+        end = min(len(self._buffer), self._pos + size)
+        text, self._pos = self._buffer[self._pos:end], end
+        return text
+
+    def readline(self, size=-1):
+        end = self._buffer.find("\n", self._pos)
+        while end < 0 and not self._eof:
+            scanned = len(self._buffer) - self._pos
+            self._fill(scanned + 1)
+            end = self._buffer.find("\n", self._pos + scanned)
+        end = len(self._buffer) if end < 0 else end + 1
+        if size is not None and 0 <= size < end - self._pos:
+            end = self._pos + size
+        text, self._pos = self._buffer[self._pos:end], end
+        return text
+
+    def close(self):
+        self._file.close()
+
+def report_fallback(path, reader, limit=20):
+    """Print which lines of path needed the fallback encoding."""
+    if not reader.fallback_lines:
+        return
+    shown = ", ".join(str(n) for n in reader.fallback_lines[:limit])
+    more = f" (and {len(reader.fallback_lines) - limit} more)" if len(reader.fallback_lines) > limit else ""
+    if reader.fallback_encoding == reader.encoding:
+        how = "had their invalid characters replaced"
+    else:
+        how = f"were decoded as {reader.fallback_encoding}"
+    print(f"{len(reader.fallback_lines)} line(s) of {path} were not valid {reader.encoding} "
+          f"and {how}: {shown}{more}")
+
+def _read_chunks(path, reader, chunks, report):
+    with reader, chunks:
+        yield from chunks
+    if report:
+        report_fallback(path, reader)
+
+def read_csv_auto(path, report=True, sample_bytes=SAMPLE_BYTES, fallback_encoding=FALLBACK_ENCODING, **kwargs):
+    """
+    pd.read_csv with the encoding, BOM and delimiter sniffed from the file (see sniff_csv).
+    The file is read once; lines that need the fallback encoding are printed when report
+    is True. Pass sep= to override the sniffed delimiter. With chunksize= a generator of
+    chunks is returned and the report is printed once it is exhausted.
+    """
+    fmt = sniff_csv(path, sample_bytes, fallback_encoding)
+    kwargs.setdefault("sep", fmt["delimiter"])
+    reader = FallbackDecodingReader(path, fmt["encoding"], fallback_encoding, len(fmt["bom"]))
+
+    if kwargs.get("chunksize"):
+        return _read_chunks(path, reader, pd.read_csv(reader, **kwargs), report)
+
+    with reader:
+        df = pd.read_csv(reader, **kwargs)
+    if report:
+        report_fallback(path, reader)
+    return df
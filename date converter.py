@@ -1,5 +1,17 @@
 import pandas as pd
 import os
+from run_metrics import RunMetrics
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+# Date columns converted by default when they are present in the file.
+DEFAULT_DATE_COLUMNS = ["Date", "Primary Date", "Date Sent", "Date Received", "Sent Date", "Received Date"]
+
+# Upper bound on the whole-column format passes before falling back to per-value parsing.
+MAX_INFERRED_FORMATS = 10
 
 def parse_date(value, dayfirst):
     """
@@ -18,6 +30,106 @@ def parse_date(value, dayfirst):
         return original_value
     return dt
 
+def ordered_formats(fmt, dayfirst):
+    """
+    The formats to try for an inferred format, in parse_date's order: with both a day and a
+    month, the chosen day/month order first and then the opposite one (so 2025-01-02 is
+    2 January month-first but 1 February day-first, while 2025-01-13 is 13 January either way).
+    """
+    if "%d" not in fmt or "%m" not in fmt:
+        return [fmt]
+    swapped = fmt.replace("%d", "\0").replace("%m", "%d").replace("\0", "%m")
+    if (fmt.index("%d") < fmt.index("%m")) == dayfirst:
+        return [fmt, swapped]
+    return [swapped, fmt]
+
+def convert_dates(values, dayfirst, out_fmt, cache=None):
+    """
+    Convert a column of dates to out_fmt, parsing each distinct value only once.
+    The distinct values are parsed a whole column at a time with explicit formats inferred
+    from the data; only values no inferred format accepts go through parse_date one by one.
+    Values that cannot be parsed are returned unchanged. cache maps raw value -> output and
+    can be shared between columns so repeated values are never parsed twice.
+    """
+    if cache is None:
+        cache = {}
+
+    # Parse only the distinct values that have not been seen before.
+    uniques = pd.Series(values.dropna().unique())
+    uniques = uniques[~uniques.isin(list(cache))] if cache else uniques
+    if uniques.empty:
+        return values.map(cache)
+
+    # Only text goes through format inference; other values keep the scalar behaviour.
+    is_text = uniques.map(lambda v: isinstance(v, str)).astype(bool)
+    remaining = uniques[is_text].str.strip()
+    remaining.index = uniques[is_text].to_numpy()
+
+    # Infer a format from the first unparsed value, apply it to everything left, repeat.
+    # A value no format can be inferred for is set aside for the fallback.
+    leftovers = list(uniques[~is_text])
+    for _ in range(MAX_INFERRED_FORMATS):
+        if remaining.empty:
+            break
+        fmt = guess_datetime_format(remaining.iloc[0], dayfirst=dayfirst)
+        parsed = None
+        if fmt:
+            # Chosen day/month order first; only values it rejects (e.g. 13/01 when
+            # month-first was chosen) get the opposite order, as in parse_date
+            for order_fmt in ordered_formats(fmt, dayfirst):
+                if parsed is None:
+                    parsed = pd.to_datetime(remaining, format=order_fmt, errors='coerce')
+                    continue
+                missing = parsed.isna().to_numpy()
+                if missing.any():
+                    parsed[missing] = pd.to_datetime(remaining[missing], format=order_fmt, errors='coerce')
+        if parsed is None or pd.isna(parsed.iloc[0]):
+            leftovers.append(remaining.index[0])
+            remaining = remaining.iloc[1:]
+            continue
+        ok = parsed.notna()
+        cache.update(zip(remaining.index[ok], parsed[ok].dt.strftime(out_fmt)))
+        remaining = remaining[~ok]
+
+    # Whatever is left gets the per-value dayfirst / monthfirst fallback.
+    for raw in leftovers + list(remaining.index):
+        parsed = parse_date(raw, dayfirst)
+        cache[raw] = parsed.strftime(out_fmt) if isinstance(parsed, pd.Timestamp) else parsed
+
+    return values.map(cache)
+
+def convert_csv(input_file, dayfirst, out_fmt, date_columns=None, metrics_json=None):
+    """
+    Convert the date columns of input_file (default: the DEFAULT_DATE_COLUMNS present) to
+    out_fmt and write <name>_Date_Converted.csv next to it. Returns the output path.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("date converter")
+
+    with metrics.stage("read") as stage:
+        df = pd.read_csv(input_file)
+        stage["rows"] = len(df)
+
+    if date_columns is None:
+        date_columns = [col for col in DEFAULT_DATE_COLUMNS if col in df.columns]
+    missing = [col for col in date_columns if col not in df.columns]
+    if not date_columns or missing:
+        raise ValueError(f"Date column(s) not found in the CSV file: {', '.join(missing) or 'Date'}")
+
+    # Parse + format, sharing one cache across all the columns
+    cache = {}
+    with metrics.stage("convert", rows=len(df) * len(date_columns)):
+        for col in date_columns:
+            df[col] = convert_dates(df[col], dayfirst, out_fmt, cache)
+
+    dir_name   = os.path.dirname(input_file)
+    base_name  = os.path.splitext(os.path.basename(input_file))[0]
+    output_csv = os.path.join(dir_name, f"{base_name}_Date_Converted.csv")
+    with metrics.stage("write", rows=len(df)):
+        df.to_csv(output_csv, index=False)
+    metrics.finish(metrics_json)
+    return output_csv
+
 def main():
     # 1. Get input file
     input_file = input("Enter the input CSV file path: ").strip().strip('"')
@@ -39,37 +151,25 @@ def main():
     else:
         out_fmt = "%d-%b-%Y"
 
-    # 4. Read CSV
+    # 4. Read the header
     try:
-        df = pd.read_csv(input_file)
+        columns = pd.read_csv(input_file, nrows=0).columns
     except Exception as e:
         print(f"Error reading CSV file: {e}")
         return
 
-    # 5. Ensure there's a Date column
-    if "Date" not in df.columns:
-        print("No 'Date' column found in the CSV file.")
-        return
-
-    # 6. Apply parsing + formatting
-    def format_date(val):
-        parsed = parse_date(val, dayfirst)
-        if isinstance(parsed, pd.Timestamp):
-            return parsed.strftime(out_fmt)
-        return parsed
-
-    df["Date"] = df["Date"].apply(format_date)
-
-    # 7. Save out
-    dir_name   = os.path.dirname(input_file)
-    base_name  = os.path.splitext(os.path.basename(input_file))[0]
-    output_csv = os.path.join(dir_name, f"{base_name}_Date_Converted.csv")
+    # 5. Choose the date columns to convert
+    found = [col for col in DEFAULT_DATE_COLUMNS if col in columns]
+    print(f"\nDate columns found: {', '.join(found) if found else 'none'}")
+    columns_input = input("Enter the date columns to convert, comma-separated (blank for the ones found): ").strip()
+    date_columns = [col.strip() for col in columns_input.split(",") if col.strip()] if columns_input else found
 
+    # 6. Convert and save out
     try:
-        df.to_csv(output_csv, index=False)
+        output_csv = convert_csv(input_file, dayfirst, out_fmt, date_columns)
         print(f"\n✅ Converted CSV saved to: {output_csv}")
     except Exception as e:
-        print(f"Error writing output CSV: {e}")
+        print(f"Error converting CSV file: {e}")
 
 if __name__ == "__main__":
     main()
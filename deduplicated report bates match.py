@@ -1,8 +1,10 @@
 import pandas as pd
 import os
-from tqdm import tqdm
 import unicodedata
 import re
+import numpy as np
+from run_metrics import RunMetrics, NO_METRICS
+from trigram_index import TrigramIndex
 
 def normalize_path(path):
     """Normalize file paths by removing special characters, normalizing Unicode, and stripping whitespace."""
@@ -14,9 +16,157 @@ def normalize_path(path):
     path = path.lower().strip()
     return path
 
-def update_document_ids(master_csv, duplicate_report_csv):
+def _segment_similarity(a, b):
+    # Equal folder names score 1; a name cut short (one a prefix of the other) scores 0.8
+    if a == b:
+        return 1.0
+    if min(len(a), len(b)) >= 3 and (a.startswith(b) or b.startswith(a)):
+        return 0.8
+    return 0.0
+
+def suffix_score(folders_a, folders_b):
+    """
+    How well two folder lists agree from the deepest folder upwards, from 0 to 1.
+    Matching stops at the first folder that differs, so a re-rooted volume (different
+    drive or top folders above the same tree) still scores on the shared part.
+    """
+    if not folders_a or not folders_b:
+        return 0.0
+    total = 0.0
+    for a, b in zip(reversed(folders_a), reversed(folders_b)):
+        similarity = _segment_similarity(a, b)
+        if not similarity:
+            break
+        total += similarity
+    return total / min(len(folders_a), len(folders_b))
+
+def fuzzy_paths(paths, normalized=None):
+    """
+    Normalize paths for the fuzzy stage: like normalize_path, but backslashes become '/'
+    first so Windows paths keep their folders. normalized (the normalize_path output for
+    the same paths) is reused when no path contains a backslash.
+    """
+    paths = paths.fillna('').astype(str)
+    has_backslash = paths.str.contains('\\', regex=False)
+    if normalized is not None and not has_backslash.any():
+        return normalized
+    return paths.str.replace('\\', '/', regex=False).apply(normalize_path)
+
+def suggest_matches(miss_paths, duplicate_paths, duplicate_bates, duplicate_raw_paths,
+                    min_confidence=0.5, top_basenames=3, min_basename_score=0.5, max_per_basename=200):
+    """
+    Propose an original bates for paths (normalized with fuzzy_paths) that found no exact match.
+    Candidates are the duplicates with the same file name, or, when there is none, with one
+    of the top_basenames most similar names from a trigram index over duplicate file names
+    (at most max_per_basename duplicates per name). Each candidate is scored
+        confidence = file name similarity * (0.5 + 0.5 * folder suffix score)
+    and the best one at or above min_confidence is suggested.
+    Returns a DataFrame on miss_paths' index with 'suggested original bates',
+    'suggested duplicate path' and 'match confidence' (blank where nothing qualifies).
+    """
+    suggested = np.full(len(miss_paths), -1, dtype=np.int64)
+    confidence = np.full(len(miss_paths), np.nan)
+    if len(miss_paths) and len(duplicate_paths):
+        _score_candidates(miss_paths, duplicate_paths, min_confidence, top_basenames,
+                          min_basename_score, max_per_basename, suggested, confidence)
+
+    found = suggested >= 0
+    return pd.DataFrame({
+        'suggested original bates': np.where(found, duplicate_bates.to_numpy(dtype=object)[suggested], None),
+        'suggested duplicate path': np.where(found, duplicate_raw_paths.to_numpy(dtype=object)[suggested], None),
+        'match confidence': confidence.round(3),
+    }, index=miss_paths.index)
+
+def _split_folder(paths):
+    # (folder, file name) arrays for normalized paths
+    parts = paths.str.rpartition('/')
+    return parts[0].to_numpy(dtype=object), parts[2].to_numpy(dtype=object)
+
+def _score_candidates(miss_paths, duplicate_paths, min_confidence, top_basenames, min_basename_score,
+                      max_per_basename, suggested, confidence):
+    # Fills suggested (duplicate positions) and confidence in place; see suggest_matches
+
+    # Basename index: duplicate positions grouped by file name
+    dup_folders, dup_names = _split_folder(duplicate_paths)
+    name_codes, names = pd.factorize(dup_names)
+    by_name = np.argsort(name_codes, kind='stable')
+    name_offsets = np.concatenate([[0], np.cumsum(np.bincount(name_codes, minlength=len(names)))])
+    names = pd.Index(names)
+
+    miss_folders, miss_names = _split_folder(miss_paths)
+    exact = names.get_indexer(miss_names)
+
+    # Near file names for the misses without an exact name, from the trigram index
+    candidate_names = {i: [(code, 1.0)] for i, code in enumerate(exact) if code >= 0}
+    inexact = np.flatnonzero(exact < 0)
+    if len(inexact):
+        hits = TrigramIndex(names).search(miss_names[inexact], k=top_basenames, min_score=min_basename_score)
+        for query, key, score in zip(hits['query'], hits['key'], hits['score']):
+            candidate_names.setdefault(inexact[query], []).append((key, score))
+
+    for i, name_hits in candidate_names.items():
+        folders = miss_folders[i].split('/') if miss_folders[i] else []
+        best, best_confidence = None, min_confidence
+        for code, name_score in name_hits:
+            start, end = name_offsets[code], min(name_offsets[code + 1], name_offsets[code] + max_per_basename)
+            # Later duplicates win ties, as in the exact lookup
+            for position in by_name[start:end][::-1]:
+                candidate = dup_folders[position].split('/') if dup_folders[position] else []
+                score = name_score * (0.5 + 0.5 * suffix_score(folders, candidate))
+                if score > best_confidence or (best is None and score >= best_confidence):
+                    best, best_confidence = position, score
+        if best is not None:
+            suggested[i], confidence[i] = best, best_confidence
+
+def fill_document_ids(master_df, duplicate_df, id_column='document id', path_column='file path', metrics=None,
+                      suggest=True, min_confidence=0.5):
+    """
+    Fill blank document ids in master_df with the original bates of the matching duplicate path.
+    duplicate_df must use lower-case 'original bates' and 'duplicate path' columns.
+    Returns the updated master_df and a DataFrame of the blank rows that found no match.
+    With suggest, the unmatched rows get a proposed original bates from a fuzzy second
+    stage (see suggest_matches) for review; document ids are only ever filled by exact matches.
+    The normalize, index build, match and fuzzy match stages are recorded in metrics when given.
+    """
+    metrics = metrics or NO_METRICS
+
+    # Normalize file paths in both dataframes
+    with metrics.stage("normalize", rows=len(master_df) + len(duplicate_df)):
+        master_paths = master_df[path_column].apply(normalize_path)
+        duplicate_paths = duplicate_df['duplicate path'].apply(normalize_path)
+
+    # Create a mapping from normalized duplicate paths to original Bates numbers
+    with metrics.stage("index build", rows=len(duplicate_df)):
+        duplicate_map = pd.Series(duplicate_df['original bates'].to_numpy(), index=duplicate_paths)
+        duplicate_map = duplicate_map[~duplicate_map.index.duplicated(keep='last')]
+
+    # Update blank document ids in one pass; blanks without a match are unmatched
+    with metrics.stage("match", rows=len(master_df)):
+        blank = master_df[id_column].isna()
+        found = blank & master_paths.isin(duplicate_map.index)
+        master_df[id_column] = master_df[id_column].astype(object)
+        master_df.loc[found, id_column] = master_paths[found].map(duplicate_map)
+        unmatched_df = master_df[blank & ~found]
+
+    # Second stage for the misses only: propose the closest duplicate path
+    if suggest and not unmatched_df.empty:
+        with metrics.stage("fuzzy match", rows=len(unmatched_df)):
+            suggestions = suggest_matches(fuzzy_paths(unmatched_df[path_column]),
+                                          fuzzy_paths(duplicate_df['duplicate path'], duplicate_paths),
+                                          duplicate_df['original bates'], duplicate_df['duplicate path'],
+                                          min_confidence)
+            unmatched_df = unmatched_df.join(suggestions)
+    return master_df, unmatched_df
+
+def update_document_ids(master_csv, duplicate_report_csv, metrics_json=None, suggest=True, min_confidence=0.5):
+    # Per-stage timings are printed at the end (and written to metrics_json when given).
+    # With suggest, the unmatched report also proposes the closest duplicate for each row.
+    metrics = RunMetrics("deduplicated report bates match")
+
     # Read the master CSV file, removing BOM if present
-    master_df = pd.read_csv(master_csv, encoding='utf-8-sig', low_memory=False)
+    with metrics.stage("read master") as stage:
+        master_df = pd.read_csv(master_csv, encoding='utf-8-sig', low_memory=False)
+        stage["rows"] = len(master_df)
 
     # Normalize column names by stripping whitespace and converting to lowercase
     master_df.columns = master_df.columns.str.strip().str.lower()
@@ -26,7 +176,9 @@ def update_document_ids(master_csv, duplicate_report_csv):
         raise ValueError("Master CSV must contain 'document id' and 'file path' columns.")
 
     # Read the duplicate report CSV file
-    duplicate_df = pd.read_csv(duplicate_report_csv, encoding='utf-8', low_memory=False)
+    with metrics.stage("read duplicate report") as stage:
+        duplicate_df = pd.read_csv(duplicate_report_csv, encoding='utf-8', low_memory=False)
+        stage["rows"] = len(duplicate_df)
 
     # Normalize column names in the duplicate report CSV
     duplicate_df.columns = duplicate_df.columns.str.strip().str.lower()
@@ -35,29 +187,9 @@ def update_document_ids(master_csv, duplicate_report_csv):
     if 'original bates' not in duplicate_df.columns or 'duplicate path' not in duplicate_df.columns:
         raise ValueError("Duplicate report CSV must contain 'original bates' and 'duplicate path' columns.")
 
-    # Normalize file paths in both dataframes
-    master_df['normalized_path'] = master_df['file path'].apply(normalize_path)
-    duplicate_df['normalized_path'] = duplicate_df['duplicate path'].apply(normalize_path)
-
-    # Create a dictionary to map normalized duplicate paths to original Bates numbers
-    duplicate_dict = duplicate_df.set_index('normalized_path')['original bates'].to_dict()
-
-    # Prepare a list for unmatched entries
-    unmatched = []
-
-    # Update the master DataFrame with a progress bar
-    for index, row in tqdm(master_df.iterrows(), total=len(master_df), desc="Processing rows", unit="row"):
-        if pd.isna(row['document id']):  # If Document id is blank
-            normalized_path = row['normalized_path']
-            if normalized_path in duplicate_dict:
-                # Update with the corresponding Original Bates
-                master_df.at[index, 'document id'] = duplicate_dict[normalized_path]
-            else:
-                # Add to unmatched list if no match is found
-                unmatched.append(row.to_dict())
-
-    # Drop the normalized_path column
-    master_df.drop(columns=['normalized_path'], inplace=True)
+    # Fill blank document ids from the duplicate report
+    master_df, unmatched_df = fill_document_ids(master_df, duplicate_df, metrics=metrics,
+                                                suggest=suggest, min_confidence=min_confidence)
 
     # Determine the output directory (same as master CSV)
     output_dir = os.path.dirname(master_csv)
@@ -66,14 +198,16 @@ def update_document_ids(master_csv, duplicate_report_csv):
     output_master_csv = os.path.join(output_dir, "updated_master.csv")
     unmatched_report_csv = os.path.join(output_dir, "unmatched_report.csv")
 
-    # Save the updated master DataFrame to a new CSV
-    master_df.to_csv(output_master_csv, index=False, encoding='utf-8-sig')
-    print(f"Updated master CSV written to {output_master_csv}")
+    with metrics.stage("write", rows=len(master_df) + len(unmatched_df)):
+        # Save the updated master DataFrame to a new CSV
+        master_df.to_csv(output_master_csv, index=False, encoding='utf-8-sig')
+        print(f"Updated master CSV written to {output_master_csv}")
+
+        # Save the unmatched entries to a separate CSV, including all columns from the master CSV
+        unmatched_df.to_csv(unmatched_report_csv, index=False, encoding='utf-8-sig')
+        print(f"Unmatched report CSV written to {unmatched_report_csv}")
 
-    # Save the unmatched entries to a separate CSV, including all columns from the master CSV
-    unmatched_df = pd.DataFrame(unmatched)
-    unmatched_df.to_csv(unmatched_report_csv, index=False, encoding='utf-8-sig')
-    print(f"Unmatched report CSV written to {unmatched_report_csv}")
+    metrics.finish(metrics_json)
 
 if __name__ == "__main__":
     # File paths
@@ -1,122 +1,126 @@
 #!/usr/bin/env python3
 import os
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
+from family_builder import parse_row_numbers
+from run_metrics import RunMetrics
 
-def main():
-    # Prompt the user for the input CSV file path.
-    # This also strips any extra spaces and wrapping double quotes.
-    input_csv = input("Enter the path to the input CSV file: ").strip().strip('"')
-    
-    # Verify the file exists.
-    if not os.path.exists(input_csv):
-        print("Error: The input CSV file does not exist.")
-        return
+# Report columns as (output column, side, input column): side is "duplicate" for values
+# taken from the duplicate row and "original" for values taken from its original (host) row.
+# - "Duplicate Document ID" and "Duplicate Bates #" come from the duplicate row.
+# - "Original Document ID" and "Origianal Bates" come from the original row's
+#    "Bates/Control #" and "End Bates/Control #" respectively.
+# - The remaining columns (Type, Document ID, etc.) are taken from the original row.
+REPORT_COLUMNS = [
+    ("Duplicate Document ID", "duplicate", "Document ID"),
+    ("Duplicate Bates #", "duplicate", "Bates/Control #"),
+    ("Original Document ID", "original", "Bates/Control #"),
+    ("Origianal Bates", "original", "End Bates/Control #"),
+    ("Type", "original", "Type"),
+    ("Document ID", "original", "Document ID"),
+    ("Coded", "original", "Coded"),
+    ("Rating", "original", "Rating"),
+    ("Date", "original", "Date"),
+    ("Title", "original", "Title"),
+    ("From", "original", "From"),
+    ("To", "original", "To"),
+    ("Primary Date", "original", "Primary Date"),
+    ("Redactions", "original", "Redactions"),
+]
 
-    # Determine the output file path (report.csv in the same directory as the input file).
-    input_dir = os.path.dirname(input_csv)
-    output_csv = os.path.join(input_dir, "report.csv")
-    
-    # Read the CSV into a pandas DataFrame.
-    try:
-        df = pd.read_csv(input_csv, encoding="utf-8-sig")
-    except Exception as e:
-        print("Error reading the CSV file:", e)
-        return
+def _warn(message, row_numbers, limit=5):
+    # One summary line per problem instead of a line per row
+    examples = ", ".join(f"'{r}'" for r in row_numbers[:limit])
+    more = f" (+{len(row_numbers) - limit} more)" if len(row_numbers) > limit else ""
+    print(f"Warning: {len(row_numbers)} {message}: {examples}{more}")
 
-    # Ensure the "Row #" column is a stripped string.
+def build_report(df, columns=REPORT_COLUMNS):
+    """
+    Pair every duplicate row with its original and return the report as a DataFrame,
+    one column per (output column, side, input column) entry of columns.
+    A duplicate is a row whose "Row #" contains a period; its original is the row whose
+    "Row #" is the integer before the first period, at any depth ("12.3" and "12.3.1" are
+    both duplicates of "12"). When an original row number appears more than once, the
+    last one is used. Duplicates are reported in file order.
+    """
     if "Row #" not in df.columns:
-        print("Error: The CSV file does not contain a 'Row #' column.")
-        return
-    df["Row #"] = df["Row #"].astype(str).str.strip()
+        raise ValueError("The CSV file does not contain a 'Row #' column.")
+    for output, side, source in columns:
+        if side not in ("duplicate", "original"):
+            raise ValueError(f"Report column '{output}' must come from 'duplicate' or 'original', not '{side}'.")
+    missing = sorted({source for _, _, source in columns} - set(df.columns))
+    if missing:
+        raise ValueError(f"The CSV file is missing column(s): {', '.join(missing)}")
 
-    # Identify duplicate rows using string search:
-    # A duplicate row is one whose "Row #" field contains a period.
-    df["is_dup"] = df["Row #"].str.contains(r'\.')
+    # Parse every "Row #" into its integer host key once
+    row_numbers = df["Row #"].astype(str).str.strip()
+    parsed = parse_row_numbers(row_numbers)
+    is_dup = row_numbers.str.contains(".", regex=False).to_numpy()
+    unparsed = parsed["host"].isna().to_numpy()
+    host = parsed["host"].to_numpy(dtype=np.int64, na_value=-1)
 
-    # Separate original rows (no period) and duplicate rows (contain a period).
-    originals = df[~df["is_dup"]].copy()
-    duplicates = df[df["is_dup"]].copy()
+    # Original rows must be whole integers; duplicates need an integer before the first period
+    bad_orig = ~is_dup & (unparsed | ~row_numbers.str.isdecimal().to_numpy())
+    if bad_orig.any():
+        _warn("original row number(s) could not be parsed and were skipped",
+              row_numbers[bad_orig].tolist())
+    bad_dup = is_dup & unparsed
+    if bad_dup.any():
+        _warn("duplicate row number(s) could not be parsed and were skipped",
+              row_numbers[bad_dup].tolist())
 
-    # Build a dictionary mapping from the integer value of the original "Row #"
-    # to its corresponding row (as a Series).
-    orig_map = {}
-    for idx, row in originals.iterrows():
-        try:
-            # Convert the original row number to an integer.
-            key = int(float(row["Row #"]))
-            orig_map[key] = row
-        except ValueError:
-            print(f"Warning: Could not parse original row number '{row['Row #']}'. Skipping this row.")
-            continue
+    # One join of the duplicates' host keys onto the originals' (the last original wins),
+    # carrying row positions so the report columns are gathered afterwards in one take each
+    orig_rows = np.flatnonzero(~is_dup & ~bad_orig)
+    dup_rows = np.flatnonzero(is_dup & ~bad_dup)
+    originals = pd.DataFrame({"_host": host[orig_rows], "_orig": orig_rows}).drop_duplicates("_host", keep="last")
+    duplicates = pd.DataFrame({"_host": host[dup_rows], "_dup": dup_rows})
+    pairs = duplicates.merge(originals, on="_host", how="left", validate="many_to_one")
+    no_orig = pairs["_orig"].isna().to_numpy()
+    if no_orig.any():
+        _warn("duplicate row(s) have no original row and were skipped",
+              row_numbers.to_numpy()[dup_rows[no_orig]].tolist())
+    pairs = pairs[~no_orig]
+    positions = {"duplicate": pairs["_dup"].to_numpy(),
+                 "original": pairs["_orig"].to_numpy().astype(np.int64)}
 
-    output_rows = []
-    # Process each duplicate row with a progress bar.
-    for idx, dup in tqdm(duplicates.iterrows(), total=duplicates.shape[0],
-                         desc="Processing duplicates", unit="dup"):
-        dup_row_str = dup["Row #"]
-        try:
-            # Extract the integer part of the duplicate row number.
-            # For example, if dup_row_str is "2.1", splitting on "." gives "2".
-            orig_key = int(dup_row_str.split('.')[0])
-        except Exception as e:
-            print(f"Error parsing duplicate row number '{dup_row_str}':", e)
-            continue
+    return pd.DataFrame({output: df[source].to_numpy()[positions[side]] for output, side, source in columns})
 
-        if orig_key not in orig_map:
-            print(f"Warning: Original row for duplicate row '{dup_row_str}' not found.")
-            continue
+def create_report(input_csv, output_csv=None, columns=REPORT_COLUMNS, metrics_json=None):
+    """
+    Read input_csv (all values as text, so they are written exactly as read), build the
+    duplicate report (see build_report) and write it to output_csv
+    (default: report.csv in the same directory as the input file).
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("duplicate emails report creator")
+    if output_csv is None:
+        output_csv = os.path.join(os.path.dirname(input_csv), "report.csv")
+    with metrics.stage("read") as stage:
+        df = pd.read_csv(input_csv, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        stage["rows"] = len(df)
+    with metrics.stage("build report", rows=len(df)):
+        report_df = build_report(df, columns)
+    with metrics.stage("write", rows=len(report_df)):
+        report_df.to_csv(output_csv, index=False, encoding="utf-8")
+    print(f"Report successfully written to: {output_csv}")
+    metrics.finish(metrics_json)
+    return report_df
 
-        orig = orig_map[orig_key]
-        
-        # Build the output row.
-        # - "Duplicate Document ID" and "Duplicate Bates #" come from the duplicate row.
-        # - "Original Document ID" and "Origianal Bates" come from the original row’s
-        #    "Bates/Control #" and "End Bates/Control #" respectively.
-        # - The remaining columns (Type, Document ID, etc.) are taken from the original row.
-        out_row = {
-            "Duplicate Document ID": dup["Document ID"],
-            "Duplicate Bates #": dup["Bates/Control #"],
-            "Original Document ID": orig["Bates/Control #"],
-            "Origianal Bates": orig["End Bates/Control #"],
-            "Type": orig["Type"],
-            "Document ID": orig["Document ID"],
-            "Coded": orig["Coded"],
-            "Rating": orig["Rating"],
-            "Date": orig["Date"],
-            "Title": orig["Title"],
-            "From": orig["From"],
-            "To": orig["To"],
-            "Primary Date": orig["Primary Date"],
-            "Redactions": orig["Redactions"]
-        }
-        output_rows.append(out_row)
+def main():
+    # Prompt the user for the input CSV file path.
+    # This also strips any extra spaces and wrapping double quotes.
+    input_csv = input("Enter the path to the input CSV file: ").strip().strip('"')
 
-    # Define the desired column order for the report.
-    report_columns = [
-        "Duplicate Document ID",
-        "Duplicate Bates #",
-        "Original Document ID",
-        "Origianal Bates",
-        "Type",
-        "Document ID",
-        "Coded",
-        "Rating",
-        "Date",
-        "Title",
-        "From",
-        "To",
-        "Primary Date",
-        "Redactions"
-    ]
-    report_df = pd.DataFrame(output_rows, columns=report_columns)
+    # Verify the file exists.
+    if not os.path.exists(input_csv):
+        print("Error: The input CSV file does not exist.")
+        return
 
-    # Write the report CSV in the same directory as the input CSV.
     try:
-        report_df.to_csv(output_csv, index=False, encoding="utf-8")
-        print(f"Report successfully written to: {output_csv}")
+        create_report(input_csv)
     except Exception as e:
-        print("Error writing the report CSV:", e)
+        print("Error creating the report:", e)
 
 if __name__ == "__main__":
     main()
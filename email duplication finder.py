@@ -1,12 +1,155 @@
 import pandas as pd
+import numpy as np
 import os
+import re
+import zlib
 from tqdm import tqdm
+from run_metrics import RunMetrics
+
+# MinHash / LSH settings for the near-duplicate mode: NUM_BANDS bands of BAND_ROWS
+# minhashes each. Two subjects with Jaccard similarity s share at least one band with
+# probability 1 - (1 - s**BAND_ROWS)**NUM_BANDS (about 0.99 at s = 0.7).
+NUM_BANDS = 16
+BAND_ROWS = 4
+NUM_PERM = NUM_BANDS * BAND_ROWS
+SHINGLE_SIZE = 3
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+# Reply/forward prefixes stripped from subjects, including stacked ones like "RE: FW: RE[2]:".
+SUBJECT_PREFIX = re.compile(r'^(?:\s*(?:re|fw|fwd|aw|sv|wg)\s*(?:\[\d+\])?\s*:)+', re.IGNORECASE)
+
+def normalize_subject(title):
+    """Lower-case a subject, drop RE:/FW: prefixes, punctuation and repeated whitespace."""
+    if pd.isna(title):
+        return ''
+    title = SUBJECT_PREFIX.sub('', str(title))
+    title = re.sub(r'[^\w\s]', ' ', title.lower())
+    return ' '.join(title.split())
+
+def minhash_signatures(subjects, seed=1):
+    """
+    Compute a MinHash signature (NUM_PERM unsigned integers) for each subject string
+    from its character shingles. Returns an array of shape (len(subjects), NUM_PERM).
+    """
+    # a and b span the whole field so a * x + b wraps many times and the permutations mix well;
+    # the uint64 products overflow on purpose before the reduction mod the prime.
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+    signatures = np.empty((len(subjects), NUM_PERM), dtype=np.uint64)
+    for i, subject in enumerate(subjects):
+        shingles = {subject[j:j + SHINGLE_SIZE] for j in range(max(len(subject) - SHINGLE_SIZE + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(sh.encode('utf-8')) for sh in shingles), dtype=np.uint64)
+        signatures[i] = ((np.outer(hashes, a) + b) % MERSENNE_PRIME).min(axis=0)
+    return signatures
+
+def band_keys(signatures):
+    """Collapse each band of BAND_ROWS minhashes into one key; returns shape (n, NUM_BANDS)."""
+    keys = np.zeros((len(signatures), NUM_BANDS), dtype=np.uint64)
+    for row in range(BAND_ROWS):
+        keys = keys * np.uint64(1000003) ^ signatures[:, row::BAND_ROWS][:, :NUM_BANDS]
+    return keys
+
+# Date bucket for rows whose date cannot be parsed.
+NO_DATE_BUCKET = np.iinfo(np.int64).min
+
+def parse_dates(dates):
+    """Parse a Date column to naive UTC timestamps; unparseable values become NaT."""
+    try:
+        parsed = pd.to_datetime(dates, errors='coerce', format='mixed', utc=True)
+    except (TypeError, ValueError):  # pandas < 2.0 has no format='mixed'
+        parsed = pd.to_datetime(dates, errors='coerce', utc=True)
+    return parsed.dt.tz_localize(None)
+
+def check_near_settings(threshold, tolerance_seconds):
+    """Raise ValueError unless 0 < threshold <= 1 and tolerance_seconds > 0."""
+    if not 0 < threshold <= 1:
+        raise ValueError(f"threshold must be greater than 0 and at most 1, not {threshold}.")
+    if not tolerance_seconds > 0:
+        raise ValueError(f"tolerance_seconds must be greater than 0, not {tolerance_seconds}.")
+
+def find_near_duplicates(df_full, df_group, threshold=0.8, tolerance_seconds=60):
+    """
+    Find CSV1 rows that are near-duplicates of CSV2 rows.
+    Subjects are normalized and indexed with MinHash signatures and LSH bands, so only
+    pairs sharing a band are ever compared. A pair matches when its estimated subject
+    similarity is at least threshold and its dates are within tolerance_seconds
+    (or both dates are unparseable and identical).
+    Returns a DataFrame of (full_index, group_index, Similarity).
+    """
+    check_near_settings(threshold, tolerance_seconds)
+    full_subjects = df_full['Title'].map(normalize_subject)
+    group_subjects = df_group['Title'].map(normalize_subject)
+
+    # Signatures are computed once per distinct normalized subject.
+    subjects = pd.Index(pd.concat([full_subjects, group_subjects]).unique())
+    signatures = minhash_signatures(tqdm(subjects, desc="Hashing subjects", unit="subject"))
+    keys = band_keys(signatures)
+    full_ids = subjects.get_indexer(full_subjects)
+    group_ids = subjects.get_indexer(group_subjects)
+
+    # LSH: subjects sharing any band key are candidate pairs. Blank subjects never match.
+    def band_table(ids):
+        ids = np.unique(ids)
+        ids = ids[subjects[ids] != '']
+        return pd.DataFrame({
+            'subject': np.repeat(ids, NUM_BANDS),
+            'band': np.tile(np.arange(NUM_BANDS), len(ids)),
+            'key': keys[ids].ravel(),
+        })
+    candidates = band_table(full_ids).merge(band_table(group_ids), on=['band', 'key'], suffixes=('_full', '_group'))
+    candidates = candidates[['subject_full', 'subject_group']].drop_duplicates()
+    sim = (signatures[candidates['subject_full'].to_numpy()] ==
+           signatures[candidates['subject_group'].to_numpy()]).mean(axis=1)
+    candidates = candidates.assign(Similarity=sim)[sim >= threshold]
+
+    # Bucket dates into tolerance windows; a match can only be in the same or a neighbouring bucket.
+    tolerance = pd.Timedelta(seconds=tolerance_seconds)
+
+    def date_rows(df, subject_ids, side):
+        dates = parse_dates(df['Date'])
+        ns = dates.to_numpy(dtype='datetime64[ns]').view('int64')
+        return pd.DataFrame({
+            f'{side}_index': df.index,
+            f'subject_{side}': subject_ids,
+            f'date_{side}': dates.to_numpy(),
+            f'raw_{side}': df['Date'].astype(str).to_numpy(),
+            'bucket': np.where(dates.isna(), NO_DATE_BUCKET, ns // tolerance.value),
+        })
+    full_rows = date_rows(df_full, full_ids, 'full')
+    group_rows = date_rows(df_group, group_ids, 'group').merge(candidates, on='subject_group')
+
+    pairs = []
+    for offset in (-1, 0, 1):
+        shifted = group_rows
+        if offset:
+            shifted = group_rows[group_rows['bucket'] != NO_DATE_BUCKET]
+            shifted = shifted.assign(bucket=shifted['bucket'] + offset)
+        pairs.append(shifted.merge(full_rows, on=['subject_full', 'bucket']))
+    pairs = pd.concat(pairs, ignore_index=True)
+
+    both_missing = pairs['date_full'].isna() & pairs['date_group'].isna()
+    within = (pairs['date_full'] - pairs['date_group']).abs() <= tolerance
+    keep = within | (both_missing & (pairs['raw_full'] == pairs['raw_group']))
+    pairs = pairs[keep.fillna(False).astype(bool)]
+    return (pairs[['full_index', 'group_index', 'Similarity']]
+            .drop_duplicates(subset=['full_index', 'group_index'])
+            .reset_index(drop=True))
+
+def find_duplicates(csv1_path, csv2_path, near_mode=False, threshold=0.8, tolerance_seconds=60,
+                    metrics_json=None):
+    """
+    Mark the CSV2 (group) emails that also appear in CSV1 (the full database) and write the
+    non-duplicate, duplicate, grouped duplicate and email duplication reports next to CSV2.
+    Emails match on identical Title and Date or, with near_mode, through find_near_duplicates
+    with the given subject similarity threshold and date tolerance_seconds; near-mode reports
+    add a Similarity column.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    if near_mode:
+        check_near_settings(threshold, tolerance_seconds)
+    metrics = RunMetrics("email duplication finder")
 
-def main():
-    # Prompt for CSV file paths and clean the inputs.
-    csv1_path = input("Enter the CSV file path for the full email database (CSV1): ").strip().strip('\'"')
-    csv2_path = input("Enter the CSV file path for the specific group (CSV2): ").strip().strip('\'"')
-    
     # Determine the output directory based on CSV2.
     output_dir = os.path.dirname(csv2_path) or "."
     grouped_output_file = os.path.join(output_dir, "grouped_duplicates_output.csv")
@@ -15,52 +158,73 @@ def main():
     email_duplication_report_file = os.path.join(output_dir, "email_duplication_report.csv")
     
     # Read both CSV files.
-    df_full = pd.read_csv(csv1_path)
-    df_group = pd.read_csv(csv2_path)
-    
-    # Build a set of (Title, Date) pairs from CSV1.
-    full_titles_dates = set(zip(df_full['Title'], df_full['Date']))
+    with metrics.stage("read") as stage:
+        df_full = pd.read_csv(csv1_path)
+        df_group = pd.read_csv(csv2_path)
+        stage["rows"] = len(df_full) + len(df_group)
     
-    # Mark rows in CSV2 as duplicates if their (Title, Date) exists in CSV1.
-    df_group['is_duplicate'] = df_group.apply(
-        lambda row: (row['Title'], row['Date']) in full_titles_dates, axis=1)
+    with metrics.stage("match", rows=len(df_full) + len(df_group)):
+        if near_mode:
+            # Pair CSV2 rows with similar CSV1 rows through the MinHash/LSH index.
+            pairs = find_near_duplicates(df_full, df_group, threshold, tolerance_seconds)
+            df_group['is_duplicate'] = df_group.index.isin(pairs['group_index'])
+        else:
+            # Build a set of (Title, Date) pairs from CSV1.
+            full_titles_dates = set(zip(df_full['Title'], df_full['Date']))
+            
+            # Mark rows in CSV2 as duplicates if their (Title, Date) exists in CSV1.
+            df_group['is_duplicate'] = df_group.apply(
+                lambda row: (row['Title'], row['Date']) in full_titles_dates, axis=1)
     
     # Separate CSV2 rows into duplicates and non-duplicates.
     df_duplicates_csv2 = df_group[df_group['is_duplicate']]
     df_non_duplicates_csv2 = df_group[~df_group['is_duplicate']]
     
-    # Save non-duplicate CSV2 rows.
-    df_non_duplicates_csv2.to_csv(non_duplicates_output_file, index=False)
+    # Save non-duplicate and individual duplicate CSV2 rows.
+    with metrics.stage("write", rows=len(df_group)):
+        df_non_duplicates_csv2.to_csv(non_duplicates_output_file, index=False)
+        df_duplicates_csv2.to_csv(individual_duplicates_output_file, index=False)
     print(f"Non-duplicate records saved to {non_duplicates_output_file}")
-    
-    # Save individual duplicate rows from CSV2.
-    df_duplicates_csv2.to_csv(individual_duplicates_output_file, index=False)
     print(f"Individual duplicate records saved to {individual_duplicates_output_file}")
     
     # For the grouped duplicates report, combine data from CSV1 and CSV2.
-    # First, get the (Title, Date) pairs from CSV2 that are duplicates.
-    duplicate_titles_dates = set(df_duplicates_csv2[['Title', 'Date']].itertuples(index=False, name=None))
-    # Get matching rows from CSV1.
-    df_duplicates_csv1 = df_full[df_full.apply(lambda row: (row['Title'], row['Date']) in duplicate_titles_dates, axis=1)]
-    # Combine the duplicate rows from CSV1 and CSV2.
-    union_duplicates = pd.concat([df_duplicates_csv1, df_duplicates_csv2], ignore_index=True)
+    if near_mode:
+        # Each CSV2 duplicate forms a group with the CSV1 rows paired to it; the group's
+        # Title and Date come from the CSV2 row and its score is the weakest pair.
+        matched_csv1 = df_full.loc[pairs['full_index']].assign(group_key=pairs['group_index'].to_numpy())
+        group_rows = df_duplicates_csv2.assign(group_key=df_duplicates_csv2.index)
+        union_duplicates = pd.concat([group_rows, matched_csv1], ignore_index=True)
+        group_similarity = pairs.groupby('group_index')['Similarity'].min()
+        group_keys = ['group_key']
+    else:
+        # First, get the (Title, Date) pairs from CSV2 that are duplicates.
+        duplicate_titles_dates = set(df_duplicates_csv2[['Title', 'Date']].itertuples(index=False, name=None))
+        # Get matching rows from CSV1.
+        df_duplicates_csv1 = df_full[df_full.apply(lambda row: (row['Title'], row['Date']) in duplicate_titles_dates, axis=1)]
+        # Combine the duplicate rows from CSV1 and CSV2.
+        union_duplicates = pd.concat([df_duplicates_csv1, df_duplicates_csv2], ignore_index=True)
+        group_keys = ['Title', 'Date']
     
-    # Helper function to join unique values.
+    # Helper function to join values as text (str() of each value, so blank cells are 'nan').
     def join_unique(series):
-        return ', '.join(series.astype(str).unique())
+        return ', '.join(series.map(str).unique())
     
-    grouped_data = []
-    grouped = union_duplicates.groupby(['Title', 'Date'])
-    for (title, date), group in tqdm(grouped, total=len(grouped), desc="Grouping duplicates"):
-        grouped_data.append({
-            'Title': title,
-            'Date': date,
-            'Bates/Control #': ', '.join(group['Bates/Control #'].astype(str)),
-            'Document ID': ', '.join(group['Document ID'].astype(str).unique()),
-            'From': join_unique(group['From']),
-            'To': join_unique(group['To']),
-            'CC': join_unique(group['CC'])
-        })
+    with metrics.stage("group", rows=len(union_duplicates)):
+        grouped_data = []
+        grouped = union_duplicates.groupby(group_keys, sort=not near_mode)
+        for _, group in tqdm(grouped, total=len(grouped), desc="Grouping duplicates"):
+            row = {
+                'Title': group['Title'].iloc[0],
+                'Date': group['Date'].iloc[0],
+                'Bates/Control #': ', '.join(group['Bates/Control #'].map(str)),
+                'Document ID': join_unique(group['Document ID']),
+                'From': join_unique(group['From']),
+                'To': join_unique(group['To']),
+                'CC': join_unique(group['CC'])
+            }
+            if near_mode:
+                row['Similarity'] = round(group_similarity[group['group_key'].iloc[0]], 3)
+            grouped_data.append(row)
     
     if grouped_data:
         grouped_df = pd.DataFrame(grouped_data)
@@ -72,23 +236,54 @@ def main():
     # Generate the Email Duplication Report.
     # For each duplicate in CSV2, join with the corresponding CSV1 row(s) on Title and Date.
     # This merge will produce one row per CSV1 row joined with each matching CSV2 row.
-    df_duplicates_csv2_filtered = df_duplicates_csv2.copy()
-    email_dup_report = pd.merge(
-        df_full, 
-        df_duplicates_csv2_filtered, 
-        on=['Title', 'Date'], 
-        suffixes=('_csv1', '_csv2')
-    )
+    if near_mode:
+        # One row per matched pair, keyed on the CSV2 row's Title and Date, with its score.
+        csv1_part = df_full.loc[pairs['full_index']].reset_index(drop=True)
+        csv2_part = df_group.loc[pairs['group_index']].reset_index(drop=True)
+        email_dup_report = pd.concat([
+            csv2_part[['Title', 'Date']],
+            csv1_part.add_suffix('_csv1'),
+            csv2_part.add_suffix('_csv2'),
+        ], axis=1)
+        email_dup_report['Similarity'] = pairs['Similarity'].round(3).to_numpy()
+        extra_columns = ['Title_csv1', 'Date_csv1', 'Similarity']
+    else:
+        df_duplicates_csv2_filtered = df_duplicates_csv2.copy()
+        email_dup_report = pd.merge(
+            df_full, 
+            df_duplicates_csv2_filtered, 
+            on=['Title', 'Date'], 
+            suffixes=('_csv1', '_csv2')
+        )
+        extra_columns = []
     
     # Select the required columns.
     email_dup_report = email_dup_report[[
         'Title', 'Date',
         'Bates/Control #_csv1', 'Document ID_csv1', 'File Path_csv1',
         'Bates/Control #_csv2', 'Document ID_csv2', 'File Path_csv2'
-    ]]
+    ] + extra_columns]
     
-    email_dup_report.to_csv(email_duplication_report_file, index=False)
+    with metrics.stage("write report", rows=len(email_dup_report)):
+        email_dup_report.to_csv(email_duplication_report_file, index=False)
     print(f"Email Duplication Report saved to {email_duplication_report_file}")
+    metrics.finish(metrics_json)
+
+def main():
+    # Prompt for CSV file paths and clean the inputs.
+    csv1_path = input("Enter the CSV file path for the full email database (CSV1): ").strip().strip('\'"')
+    csv2_path = input("Enter the CSV file path for the specific group (CSV2): ").strip().strip('\'"')
+    
+    # Ask whether to match near-duplicates (RE:/FW: variants, case, close timestamps).
+    near_choice = input("Also match near-duplicate subjects and dates? (yes/no): ").strip().lower()
+    near_mode = near_choice in ["yes", "y"]
+    threshold, tolerance_seconds = 0.8, 60
+    if near_mode:
+        threshold_input = input("Minimum subject similarity, 0-1 (blank for 0.8): ").strip()
+        tolerance_input = input("Maximum date difference in seconds (blank for 60): ").strip()
+        threshold = float(threshold_input) if threshold_input else threshold
+        tolerance_seconds = float(tolerance_input) if tolerance_input else tolerance_seconds
+    find_duplicates(csv1_path, csv2_path, near_mode, threshold, tolerance_seconds)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+
+# Shared family-building engine for the Row #-based parent/child tools.
+# A relationships export lists each host (whole Row #, e.g. "12") followed by its
+# attachments ("12.1", "12.2", ...). Everything here works on whole columns at once.
+
+def clean_values(series):
+    """
+    Remove the braille blank character (U+2800) and any extra whitespace from every value.
+    Missing values become 'nan', the same as str() on them.
+    """
+    return (series.astype(str).fillna('nan')
+            .str.replace('\u2800', '', regex=False)
+            .str.strip())
+
+# Row numbers up to this many characters made only of digits and dots are parsed with
+# array arithmetic on their code points (exact within float precision); anything else
+# goes through the regex and to_numeric path
+PLAIN_WIDTH = 15
+
+INT64_MAX_TEXT = str(np.iinfo(np.int64).max)
+
+def _digits_to_int64(digits):
+    # Digit strings as Int64; runs too large for int64 become <NA> instead of raising
+    digits = digits.str.lstrip('0').replace('', '0')
+    fits = (digits.str.len() < len(INT64_MAX_TEXT)) | (
+        (digits.str.len() == len(INT64_MAX_TEXT)) & (digits <= INT64_MAX_TEXT))
+    fits = fits.fillna(False).astype(bool)
+    # Parse with '0' in the gaps so to_numeric stays on int64 instead of going through float
+    values = pd.to_numeric(digits.where(fits, '0')).astype('Int64')
+    values[~fits] = pd.NA
+    return values
+
+def _is_whole_number(text):
+    # The original parent rule, kept exact for the rows the fast path does not handle
+    # (to_numeric misreads some of them, e.g. long runs of leading zeros)
+    try:
+        return float(text) % 1 == 0
+    except ValueError:
+        return False
+
+def _parse_general(row_numbers):
+    # Regex and to_numeric parsing, for any row number
+    uniques = pd.unique(row_numbers)
+    whole = dict(zip(uniques, map(_is_whole_number, uniques)))
+    is_parent = row_numbers.map(whole).astype(bool)
+
+    parts = row_numbers.str.extract(r'^(\d+)(?:\.(\d+))?', expand=True)
+    host = _digits_to_int64(parts[0])
+    attachment = _digits_to_int64(parts[1].fillna('0'))
+    attachment[host.isna()] = pd.NA
+    level = row_numbers.str.count(r'\.').astype('Int64')
+    level[host.isna()] = pd.NA
+
+    return pd.DataFrame({
+        'host': host.array,
+        'attachment': attachment.array,
+        'is_parent': is_parent.to_numpy(),
+        'level': level.array,
+    }, index=row_numbers.index)
+
+def _parse_plain(texts, lengths):
+    # Same results as _parse_general for row numbers of digits and dots that start with a
+    # digit, from a fixed-width code point matrix; plain is False for every other row
+    width = int(lengths.max()) if len(lengths) else 1
+    chars = np.array(texts, dtype=f'<U{width}').view(np.uint32).reshape(len(texts), width)
+    position = np.arange(width)
+    digit = (chars >= 48) & (chars <= 57)
+    dot = chars == 46
+    inside = position < lengths[:, None]
+    plain = (digit | dot | ~inside).all(axis=1) & digit[:, 0]
+
+    # Host: the leading digits; attachment: the digits right after the first dot
+    run = np.argmin(np.hstack([digit, np.zeros((len(texts), 1), dtype=bool)]), axis=1)
+    after = position > run[:, None]
+    stop = ~digit & after
+    attachment_end = np.where(stop.any(axis=1), np.argmax(stop, axis=1), width)
+    values = np.where(digit, chars - 48, 0).astype(np.int64)
+    # Each digit times 10 to the power of the digits that follow it in its number
+    powers = 10 ** np.arange(width, dtype=np.int64)
+    host = (values * powers[np.clip(run[:, None] - 1 - position, 0, width - 1)]
+            * (position < run[:, None])).sum(axis=1)
+    in_attachment = after & (position < attachment_end[:, None])
+    attachment = (values * powers[np.clip(attachment_end[:, None] - 1 - position, 0, width - 1)]
+                  * in_attachment).sum(axis=1)
+
+    # Whole numbers: no dot, or one dot followed only by zeros ("12.", "12.00")
+    level = dot.sum(axis=1)
+    fraction = (digit & (chars != 48) & after).any(axis=1)
+    is_parent = (level == 0) | ((level == 1) & ~fraction)
+    return plain, host, attachment, is_parent, level
+
+def parse_row_numbers(row_numbers):
+    """
+    Parse a cleaned Row # column in one pass.
+    Returns a DataFrame with:
+      - host: integer part of the row number ("12.3" -> 12), <NA> if unparseable or
+        too large for int64
+      - attachment: digits after the first dot ("12.3" -> 3, "12" -> 0), <NA> if unparseable
+        or too large for int64
+      - is_parent: True when the row number is a whole number (same rule as float(x) % 1 == 0)
+      - level: number of dotted levels below the host ("12" -> 0, "12.3" -> 1, "12.3.1" -> 2),
+        <NA> if unparseable
+    host, attachment and level are Int64 columns; is_parent is bool.
+    """
+    row_numbers = row_numbers.astype(str)
+    lengths = row_numbers.str.len().to_numpy()
+    short = np.flatnonzero((lengths > 0) & (lengths <= PLAIN_WIDTH))
+    plain, host, attachment, is_parent, level = _parse_plain(
+        row_numbers.to_numpy(dtype=object)[short], lengths[short])
+    fast = short[plain]
+    rest = np.setdiff1d(np.arange(len(row_numbers)), fast, assume_unique=True)
+
+    columns = {'host': host, 'attachment': attachment, 'is_parent': is_parent, 'level': level}
+    merged = {}
+    general = _parse_general(row_numbers.iloc[rest]) if len(rest) else None
+    for column, values in columns.items():
+        if column == 'is_parent':
+            out = np.zeros(len(row_numbers), dtype=bool)
+        else:
+            out = pd.array(np.zeros(len(row_numbers), dtype=np.int64), dtype='Int64')
+        out[fast] = values[plain]
+        # Everything else (blank, text, signs, exponents, very long values) the general way
+        if general is not None:
+            out[rest] = general[column].array
+        merged[column] = out
+
+    return pd.DataFrame(merged, index=row_numbers.index)
+
+def assign_family_ids(is_parent):
+    """
+    Number families in file order: each parent starts a new family and every following
+    child belongs to it. Rows before the first parent get family 0 (no parent).
+    """
+    return np.cumsum(np.asarray(is_parent, dtype=np.int64))
+
+def family_frame(df, row_column='Row #', bates_column='Bates/Control #'):
+    """
+    Clean the key columns and return a frame of Bates, family id and parent flag,
+    one row per input row, in file order.
+    """
+    row_numbers = clean_values(df[row_column])
+    parsed = parse_row_numbers(row_numbers)
+    return pd.DataFrame({
+        'Bates': clean_values(df[bates_column]).to_numpy(),
+        'Family': assign_family_ids(parsed['is_parent']),
+        'is_parent': parsed['is_parent'].to_numpy(),
+    })
+
+def family_pairs(df, row_column='Row #', bates_column='Bates/Control #'):
+    """Return one (Parent, Child) row per child that follows a parent, in file order."""
+    families = family_frame(df, row_column, bates_column)
+    parents = families[families['is_parent']].set_index('Family')['Bates']
+    children = families[~families['is_parent'] & (families['Family'] > 0)]
+    return pd.DataFrame({
+        'Parent': children['Family'].map(parents).to_numpy(),
+        'Child': children['Bates'].to_numpy(),
+    })
+
+def group_families(df, row_column='Row #', bates_column='Bates/Control #'):
+    """
+    Return one row per parent, in file order, with its children's Bates numbers as a list.
+    Children that appear before the first parent are dropped.
+    """
+    families = family_frame(df, row_column, bates_column)
+    parents = families[families['is_parent']]
+    children = families[~families['is_parent'] & (families['Family'] > 0)]
+    child_lists = children.groupby('Family', sort=False)['Bates'].agg(list)
+    grouped = parents['Family'].map(child_lists)
+    return pd.DataFrame({
+        'Bates/Control #': parents['Bates'].to_numpy(),
+        'Children': [c if isinstance(c, list) else [] for c in grouped],
+    })
@@ -1,59 +1,117 @@
+import numpy as np
 import pandas as pd
 import os
+from path_trie import PathTrie
+from run_metrics import RunMetrics
 
-# Load the CSV file
-file_path = r"C:\Users\Willi\Downloads\20241113T1037_UTC8_Tranche_4_begin_family.csv"
-df = pd.read_csv(file_path)
+# Groups documents into families by folder: a document whose name (without extension)
+# matches its folder's name is the parent, and every other document in that folder is
+# its child. All rows of a family get the parent's Other Bates as Begin Family.
 
-# Ensure that the Begin Family column is treated as a string
-df['Begin Family'] = df['Begin Family'].astype(str)
+STATUS_ORDER = {'Parent': '0', 'Child': '1', 'Non_Parent': '2'}
 
-# Function to identify parent and child documents and copy the parent's Other Bates to Begin Family
-def identify_parent_child(df):
-    # Extract the folder name from the file path
-    df['Folder_Name'] = df['File Path'].apply(lambda x: os.path.basename(os.path.dirname(x)))
+def identify_parent_child(df, nested=False, path_column='File Path', filename_column='Filename',
+                          bates_column='Other Bates'):
+    """
+    Identify parent and child documents and copy the parent's Other Bates to Begin Family.
+    Adds Folder_Name, Parent_Child_Status (Parent, Child or Non_Parent) and Child_Of.
 
-    # Identify parents
-    parent_documents = df[df['Filename'].str.split('.').str[0] == df['Folder_Name']]
-    parent_names = parent_documents['Folder_Name'].unique()
+    Folders are keyed by their full path, so same-named folders in different places are
+    separate families. With nested=True a subfolder that has its own parent document is a
+    family inside the enclosing one: its parent is a child of the enclosing family, files
+    anywhere below a family folder belong to the nearest family folder above them, and the
+    whole tree shares the top parent's Begin Family. Child_Of names the family folder a row
+    belongs to.
+    """
+    if 'Begin Family' not in df.columns:
+        df['Begin Family'] = ''
+    df['Begin Family'] = df['Begin Family'].astype(str)
 
-    # Create Parent_Child_Status column
-    df['Parent_Child_Status'] = df.apply(
-        lambda x: 'Parent' if os.path.splitext(x['Filename'])[0] == x['Folder_Name'] else
-                   'Child' if x['Folder_Name'] in parent_names else 'Non_Parent',
-        axis=1
-    )
+    # Folder → rows index: every row's folder node in the path trie
+    trie = PathTrie(df[path_column])
+    folders = trie.folder_nodes()
+    df['Folder_Name'] = trie.names(folders)
+    stem = df[filename_column].fillna('').astype(str).str.replace(r'\.[^.]*$', '', regex=True)
+    is_parent = ((stem == df['Folder_Name']) & (df['Folder_Name'] != '')).to_numpy()
 
-    # Create Child_Of column
-    df['Child_Of'] = df.apply(lambda x: x['Folder_Name'] if x['Parent_Child_Status'] == 'Child' else None, axis=1)
+    # The first parent document of a folder is the one its family uses
+    parent_positions = np.flatnonzero(is_parent)
+    parent_folders, first = np.unique(folders[parent_positions], return_index=True)
+    parent_bates = np.full(len(trie), None, dtype=object)
+    parent_bates[parent_folders] = df[bates_column].astype(str).to_numpy()[parent_positions[first]]
+    marked = np.zeros(len(trie), dtype=bool)
+    marked[parent_folders] = True
 
-    # Copy parent's Other Bates to Begin Family column for both parent and children
-    for folder_name in parent_names:
-        parent_row = df[(df['Parent_Child_Status'] == 'Parent') & (df['Folder_Name'] == folder_name)]
-        if not parent_row.empty:
-            parent_other_bates = parent_row['Other Bates'].values[0]
-            # Update Begin Family for both parent and its children
-            df.loc[df['Folder_Name'] == folder_name, 'Begin Family'] = str(parent_other_bates)
+    # Family folder (nearest marked folder) and top folder of every folder node in one pass
+    if nested:
+        nearest, top = trie.marked_ancestors(marked)
+    else:
+        nearest = top = np.where(marked, np.arange(len(trie)), -1)
+    family = nearest[folders]
 
+    # Parent documents of nested families are children of the family folder above them
+    child_of = np.where(is_parent, -1, family)
+    if nested:
+        child_of[is_parent] = nearest[trie.parent[folders[is_parent]]]
+
+    status = np.where(family >= 0, 'Child', 'Non_Parent')
+    status[is_parent] = 'Parent'
+    df['Parent_Child_Status'] = status
+    df['Child_Of'] = np.where(child_of >= 0, trie.names(child_of), None)
+
+    # One lookup from each row's top family folder to that folder's parent Other Bates
+    row_top = top[folders]
+    begin_family = parent_bates[np.maximum(row_top, 0)]
+    df['Begin Family'] = np.where(row_top >= 0, begin_family, df['Begin Family'].to_numpy(dtype=object))
+
+    # Helper columns for ordering the output (reorder_families drops them after sorting):
+    # preorder positions in the trie sort folders in path order
+    top_folder = np.where(row_top >= 0, row_top, folders)
+    df['_top_name'] = trie.names(top_folder)
+    df['_top_folder'] = trie.pre[top_folder]
+    df['_folder_path'] = trie.pre[folders]
     return df
 
-# Reorder the DataFrame with the updated parent-child identification
-df = identify_parent_child(df)
+def reorder_families(input_csv, output_csv=None, nested=False, path_column='File Path',
+                     filename_column='Filename', bates_column='Other Bates', metrics_json=None):
+    """
+    Identify families in input_csv (see identify_parent_child) and write the rows grouped by
+    family, parent first, to output_csv (default: <input name>_ReOrdered.csv next to the input).
+    Values are read and written as text, so they are written back exactly as they were read.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("file path grouping parent child")
+    with metrics.stage("read") as stage:
+        df = pd.read_csv(input_csv, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+        stage["rows"] = len(df)
+    missing = {path_column, filename_column, bates_column} - set(df.columns)
+    if missing:
+        raise ValueError(f"Input CSV is missing column(s): {', '.join(sorted(missing))}")
 
-# Create a sorting key
-df['Sort_Key'] = df['Parent_Child_Status'].replace({'Parent': '0', 'Child': '1', 'Non_Parent': '2'})
+    with metrics.stage("group", rows=len(df)):
+        df = identify_parent_child(df, nested, path_column, filename_column, bates_column)
 
-# Sort the DataFrame to ensure correct grouping
-df.sort_values(by=['Folder_Name', 'Sort_Key'], ascending=[True, True], inplace=True)
+        # Sort so each family is together: by the name of its (top) family folder, then parent first,
+        # then children and others; nested families follow the folder that encloses them
+        df['Sort_Key'] = df['Parent_Child_Status'].map(STATUS_ORDER)
+        df.sort_values(by=['_top_name', '_top_folder', '_folder_path', 'Sort_Key'], kind='stable', inplace=True)
 
-# Drop the helper columns used for sorting
-df.drop(columns=['Sort_Key'], inplace=True)
+        # Drop the helper columns used for sorting
+        df.drop(columns=['Sort_Key', '_top_name', '_top_folder', '_folder_path'], inplace=True)
 
-# Create a new index to maintain parent-child relationships
-df.reset_index(drop=True, inplace=True)
+        # Create a new index to maintain parent-child relationships
+        df.reset_index(drop=True, inplace=True)
 
-# Save the reordered DataFrame to a new CSV file
-output_file_path = os.path.join(os.path.dirname(file_path), f'{os.path.splitext(os.path.basename(file_path))[0]}_ReOrdered.csv')
-df.to_csv(output_file_path, index=False)
+    if output_csv is None:
+        output_csv = os.path.join(os.path.dirname(input_csv),
+                                  f'{os.path.splitext(os.path.basename(input_csv))[0]}_ReOrdered.csv')
+    with metrics.stage("write", rows=len(df)):
+        df.to_csv(output_csv, index=False, encoding='utf-8-sig')
+    print(f'Reordered CSV saved as {output_csv}')
+    metrics.finish(metrics_json)
+    return df
 
-print(f'Reordered CSV saved as {output_file_path}')
+if __name__ == "__main__":
+    file_path = input("Enter the path to the CSV file: ").strip().strip('"')
+    nested_choice = input("Treat subfolders with their own parent document as nested families? (yes/no): ").strip().lower()
+    reorder_families(file_path, nested=nested_choice in ["yes", "y"])
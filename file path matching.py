@@ -1,47 +1,84 @@
 import pandas as pd
+from csv_input import read_csv_auto
+from run_metrics import RunMetrics
 
-def fill_missing_document_ids(csv1_path, csv2_path, output_csv_path, unmatched_report_path):
-    # Read CSV files into DataFrames with specified encoding
-    csv1 = pd.read_csv(csv1_path, encoding='latin1')  # Change encoding if needed
-    csv2 = pd.read_csv(csv2_path, encoding='latin1')  # Change encoding if needed
+def fill_missing_document_ids(csv1_path, csv2_path, output_csv_path, unmatched_report_path, on_conflict='first',
+                              metrics_json=None):
+    """
+    Fill blank Document ids in CSV1 with the Original Bates of the matching Duplicate Path in CSV2.
+    The lookup is a single hash join, so it runs in linear time on large inputs.
+    on_conflict decides what happens when one path has several different Original Bates:
+      - 'first':    use the first candidate in CSV2 order
+      - 'all':      use every candidate, joined with '; '
+      - 'conflict': leave the Document id blank and list the path in the unmatched report
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    if on_conflict not in ('first', 'all', 'conflict'):
+        raise ValueError("on_conflict must be 'first', 'all' or 'conflict'.")
+    metrics = RunMetrics("file path matching")
+
+    # Read CSV files into DataFrames (encoding is sniffed, Latin-1 fallback per line)
+    with metrics.stage("read") as stage:
+        csv1 = read_csv_auto(csv1_path)
+        csv2 = read_csv_auto(csv2_path)
+        stage["rows"] = len(csv1) + len(csv2)
 
     # Ensure column names are consistent and trim whitespace if necessary
     csv1.columns = csv1.columns.str.strip()
     csv2.columns = csv2.columns.str.strip()
 
-    # Track unmatched file paths
-    unmatched = []
-
-    # Fill missing Document IDs in CSV1
-    for index, row in csv1.iterrows():
-        if pd.isna(row['Document id']):  # Check if Document id is missing
-            file_path = row['File path']
-            # Try to find a match in CSV2
-            match = csv2[csv2['Duplicate Path'] == file_path]
-            if not match.empty:
-                # Assign the Original Bates value to Document id
-                csv1.at[index, 'Document id'] = match.iloc[0]['Original Bates']
-            else:
-                # Add to unmatched list
-                unmatched.append({'File path': file_path})
-
-    # Output the updated DataFrame to a new CSV
-    csv1[['Document id', 'File path']].to_csv(output_csv_path, index=False)
-    print(f"Updated CSV saved to {output_csv_path}")
+    with metrics.stage("match", rows=len(csv1)):
+        # Build the Duplicate Path -> Original Bates lookup once
+        candidates = csv2[['Duplicate Path', 'Original Bates']].dropna(subset=['Duplicate Path'])
+        lookup = candidates.drop_duplicates(subset='Duplicate Path', keep='first').set_index('Duplicate Path')['Original Bates']
+        distinct = candidates.drop_duplicates()
+        distinct = distinct[distinct['Original Bates'].notna()]
+        candidate_counts = distinct.groupby('Duplicate Path').size()
+        conflicts = candidate_counts[candidate_counts > 1].index
+        candidate_lists = (distinct[distinct['Duplicate Path'].isin(conflicts)]
+                           .groupby('Duplicate Path', sort=False)['Original Bates']
+                           .agg(lambda values: '; '.join(values.astype(str))))
+
+        if on_conflict == 'all' and len(conflicts):
+            lookup = lookup.astype(object)
+            lookup.loc[candidate_lists.index] = candidate_lists
+        elif on_conflict == 'conflict':
+            lookup = lookup.drop(conflicts)
+
+        # Fill missing Document IDs in CSV1 from the lookup
+        missing = csv1['Document id'].isna()
+        missing_paths = csv1.loc[missing, 'File path']
+        found = missing_paths.isin(lookup.index)
+        csv1['Document id'] = csv1['Document id'].astype(object)
+        csv1.loc[missing_paths.index[found], 'Document id'] = missing_paths[found].map(lookup)
+
+        # Track unmatched file paths from the same pass
+        unmatched_paths = missing_paths[~found]
+        unmatched_df = pd.DataFrame({'File path': unmatched_paths.to_numpy()})
+        if on_conflict == 'conflict':
+            is_conflict = unmatched_paths.isin(conflicts).to_numpy()
+            unmatched_df['Status'] = ['Conflict' if c else 'Unmatched' for c in is_conflict]
+            unmatched_df['Candidates'] = unmatched_paths.map(candidate_lists).fillna('').to_numpy()
+
+    with metrics.stage("write", rows=len(csv1)):
+        # Output the updated DataFrame to a new CSV
+        csv1[['Document id', 'File path']].to_csv(output_csv_path, index=False)
+        print(f"Updated CSV saved to {output_csv_path}")
 
     # Output unmatched file paths to a report CSV
-    if unmatched:
-        unmatched_df = pd.DataFrame(unmatched)
+    if not unmatched_df.empty:
         unmatched_df.to_csv(unmatched_report_path, index=False)
         print(f"Unmatched file paths report saved to {unmatched_report_path}")
     else:
         print("All file paths were successfully matched.")
+    metrics.finish(metrics_json)
 
-# File paths (replace with your actual file paths)
-csv1_path = r"C:\\Users\\Willi\\Downloads\\missing bates.csv"
-csv2_path = r"C:\\Users\\Willi\\Downloads\\Duplicate Paths.csv"
-output_csv_path = r'C:\\Users\\Willi\\Downloads\\updated_csv1.csv'  # Path for the output CSV
-unmatched_report_path = r'C:\\Users\\Willi\\Downloads\\unmatched_report.csv'  # Path for the unmatched report CSV
+if __name__ == "__main__":
+    # File paths (replace with your actual file paths)
+    csv1_path = r"C:\\Users\\Willi\\Downloads\\missing bates.csv"
+    csv2_path = r"C:\\Users\\Willi\\Downloads\\Duplicate Paths.csv"
+    output_csv_path = r'C:\\Users\\Willi\\Downloads\\updated_csv1.csv'  # Path for the output CSV
+    unmatched_report_path = r'C:\\Users\\Willi\\Downloads\\unmatched_report.csv'  # Path for the unmatched report CSV
 
-# Run the function
-fill_missing_document_ids(csv1_path, csv2_path, output_csv_path, unmatched_report_path)
+    # Run the function
+    fill_missing_document_ids(csv1_path, csv2_path, output_csv_path, unmatched_report_path)
@@ -1,6 +1,95 @@
 import os
 import pandas as pd
 from tqdm import tqdm
+from csv_cache import read_csv_cached
+from column_splice import splice_column
+from bates_references import extract_references
+from run_metrics import RunMetrics
+
+def hyperlinked_flags(notes):
+    """Return 'Yes' for each non-empty Note Text and 'No' otherwise."""
+    # Set up tqdm progress bar for the processing step.
+    tqdm.pandas(desc="Processing rows")
+    return notes.progress_apply(
+        lambda note: 'Yes' if pd.notnull(note) and str(note).strip() != '' else 'No'
+    )
+
+def referenced_bates_report(file_path, universe_csv=None, workers=None, metrics_json=None):
+    """
+    Write the Bates numbers each note references (the "CSV from notes text" input of the
+    Bates/referenced comparison) to referenced_bates.csv next to file_path: one
+    Bates/Control #, ReferencedBates row per reference. With universe_csv only the Bates
+    numbers in its Bates/Control # column are reported; otherwise every value shaped like
+    PREFIX.BOX.FOLDER.PAGE is.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("referenced bates report")
+    expected_columns = ["Bates/Control #", "Note Text"]
+    with metrics.stage("read") as stage:
+        df = read_csv_cached(file_path, usecols=lambda c: c in expected_columns)
+        stage["rows"] = len(df)
+    missing_cols = [col for col in expected_columns if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing expected columns: {missing_cols}")
+
+    universe = None
+    if universe_csv:
+        with metrics.stage("read known bates") as stage:
+            known = read_csv_cached(universe_csv, usecols=lambda c: c == "Bates/Control #")
+            stage["rows"] = len(known)
+        if "Bates/Control #" not in known.columns:
+            raise ValueError("The known Bates CSV has no 'Bates/Control #' column.")
+        universe = known["Bates/Control #"].dropna().astype(str).tolist()
+
+    with metrics.stage("extract", rows=len(df)):
+        references = extract_references(df["Bates/Control #"], df["Note Text"], universe, workers=workers)
+    output_file = os.path.join(os.path.dirname(file_path), "referenced_bates.csv")
+    with metrics.stage("write", rows=len(references)):
+        references.to_csv(output_file, index=False)
+    print(f"{len(references)} referenced Bates number(s) from "
+          f"{references['Bates/Control #'].nunique()} note(s) saved to {output_file}")
+    metrics.finish(metrics_json)
+    return references
+
+def hyperlinked_report(file_path, full_copy=False, metrics_json=None):
+    """
+    Write each note's Hyperlinked flag next to file_path: a Bates/Control #, Hyperlinked
+    report (output_report.csv) or, with full_copy, the whole CSV with Hyperlinked appended
+    (output_with_hyperlinked.csv, every other byte copied unchanged). Returns the output path.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("hyperlink reporting for notes")
+    output_directory = os.path.dirname(file_path)
+
+    # Only Note Text is parsed and the rest of each record is copied unchanged
+    if full_copy:
+        output_file = os.path.join(output_directory, "output_with_hyperlinked.csv")
+        with metrics.stage("splice") as stage:
+            stage["rows"] = len(splice_column(file_path, output_file, "Note Text", "Hyperlinked", hyperlinked_flags))
+        metrics.finish(metrics_json)
+        return output_file
+
+    # Read only the expected columns (from the columnar cache after the first run).
+    expected_columns = ["Bates/Control #", "Note Text"]
+    with metrics.stage("read") as stage:
+        df = read_csv_cached(file_path, usecols=lambda c: c in expected_columns)
+        stage["rows"] = len(df)
+
+    # Ensure the expected columns exist
+    missing_cols = [col for col in expected_columns if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing expected columns: {missing_cols}")
+
+    # Create a new column "Hyperlinked": if "Note Text" is non-empty then "Yes", else "No"
+    with metrics.stage("flag", rows=len(df)):
+        df['Hyperlinked'] = hyperlinked_flags(df['Note Text'])
+
+    # Save just the required columns in the same directory as the input file.
+    output_file = os.path.join(output_directory, "output_report.csv")
+    with metrics.stage("write", rows=len(df)):
+        df[['Bates/Control #', 'Hyperlinked']].to_csv(output_file, index=False)
+    metrics.finish(metrics_json)
+    return output_file
 
 def main():
     # Ask user for the CSV file path and clean the input.
@@ -11,32 +100,24 @@ def main():
         print("File not found. Please check the file path and try again.")
         return
 
-    # Read the CSV file using pandas.
-    df = pd.read_csv(file_path)
-    
-    # Ensure the expected columns exist
-    expected_columns = ["Bates/Control #", "Note Text"]
-    missing_cols = [col for col in expected_columns if col not in df.columns]
-    if missing_cols:
-        print(f"Missing expected columns: {missing_cols}")
+    # Optionally list the Bates numbers each note references instead of the Hyperlinked flag.
+    extract = input("Extract the Bates numbers referenced in Note Text instead? (yes/no): ").strip().lower()
+    if extract in ["yes", "y"]:
+        universe_csv = input("CSV of known Bates numbers to match (blank to match the Bates pattern): ").strip().strip('"')
+        try:
+            referenced_bates_report(file_path, universe_csv or None)
+        except ValueError as e:
+            print(e)
         return
 
-    # Set up tqdm progress bar for the processing step.
-    tqdm.pandas(desc="Processing rows")
-    
-    # Create a new column "Hyperlinked": if "Note Text" is non-empty then "Yes", else "No"
-    df['Hyperlinked'] = df['Note Text'].progress_apply(
-        lambda note: 'Yes' if pd.notnull(note) and str(note).strip() != '' else 'No'
-    )
-    
-    # Create a new DataFrame with just the required columns.
-    output_df = df[['Bates/Control #', 'Hyperlinked']]
-    
-    # Save the output CSV in the same directory as the input file.
-    output_directory = os.path.dirname(file_path)
-    output_file = os.path.join(output_directory, "output_report.csv")
-    output_df.to_csv(output_file, index=False)
-    
+    # Optionally keep every original column: only Note Text is parsed and the rest of
+    # each record is copied unchanged with the Hyperlinked field appended.
+    full_copy = input("Append Hyperlinked to a full copy of the CSV instead of a two-column report? (yes/no): ").strip().lower()
+    try:
+        output_file = hyperlinked_report(file_path, full_copy in ["yes", "y"])
+    except ValueError as e:
+        print(e)
+        return
     print(f"Report saved to {output_file}")
 
 if __name__ == '__main__':
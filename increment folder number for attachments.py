@@ -1,9 +1,124 @@
 import os
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
+from bates_codec import split_bates
+from run_metrics import RunMetrics
 
+HOST_COLUMNS = ['host_num', 'pfx1', 'pfx2', 'base_folder', 'page', 'row_label', 'other_bates']
 
-def update_other_bates(input_csv: str, output_csv: str):
+
+def parse_hosts(df):
+    """
+    Split the 'Other Bates' of every host row (integer 'RowNum') into its four parts in one
+    vectorized pass (see bates_codec.split_bates). Returns one row per host, in CSV order, with the columns in HOST_COLUMNS.
+    Raises ValueError for the first host that is missing an 'Other Bates' value or does not
+    have the PREFIX.BOX.FOLDER.PAGE format.
+    """
+    host_rows = df[df['is_host']]
+    other = host_rows['Other Bates']
+    parts = split_bates(other)
+    bad = (other == '').to_numpy() | ~parts['valid'].to_numpy()
+    if bad.any():
+        idx = other.index[bad.argmax()]
+        if other[idx] == '':
+            raise ValueError(f"Host at row {idx} is missing an 'Other Bates' value.")
+        raise ValueError(f"Unexpected 'Other Bates' format at row {idx}: '{other[idx]}'")
+
+    return pd.DataFrame({
+        'host_num': host_rows['RowNum'],
+        'pfx1': parts['prefix'],
+        'pfx2': parts['box'],
+        'base_folder': parts['folder_number'],
+        'page': parts['page'],
+        'row_label': host_rows['Row #'],
+        'other_bates': other,
+    }, index=host_rows.index)
+
+
+def find_folder_collisions(hosts, attachment_counts):
+    """
+    Flag hosts whose incremented attachment folders run into the next host's base folder.
+    hosts are in CSV order; attachment_counts maps a host number to its attachment count.
+    A collision is a next host with the same prefix and box whose base folder lies in
+    base_folder + 1 .. base_folder + attachments of the host before it.
+    """
+    counts = hosts['host_num'].map(attachment_counts).fillna(0).astype(np.int64).to_numpy()
+    base = hosts['base_folder'].to_numpy()
+    last_folder = base + counts
+    same_box = np.zeros(len(hosts), dtype=bool)
+    if len(hosts) > 1:
+        same_box[:-1] = ((hosts['pfx1'].to_numpy()[:-1] == hosts['pfx1'].to_numpy()[1:])
+                         & (hosts['pfx2'].to_numpy()[:-1] == hosts['pfx2'].to_numpy()[1:]))
+    next_base = np.append(base[1:], 0)
+    collide = same_box & (next_base > base) & (next_base <= last_folder)
+    positions = np.flatnonzero(collide)
+    return pd.DataFrame({
+        'Host Row #': hosts['row_label'].to_numpy()[positions],
+        'Host Other Bates': hosts['other_bates'].to_numpy()[positions],
+        'Attachments': counts[positions],
+        'Last Attachment Folder': [f"{f:03}" for f in last_folder[positions]],
+        'Next Host Row #': hosts['row_label'].to_numpy()[positions + 1],
+        'Next Host Other Bates': hosts['other_bates'].to_numpy()[positions + 1],
+    })
+
+
+def number_attachments(df, carry=None):
+    """
+    Fill 'Other Bates' for the attachments in df (in place) by incrementing the folder segment
+    of their host's 'Other Bates': the i-th attachment of a host, in CSV order, gets folder
+    base_folder + i. carry is the state of the last host of the previous chunk when streaming
+    (None for a whole file); attachments of that host continue its count.
+    Returns (collisions, carry for the next chunk, number of attachments without a host).
+    """
+    # Normalize 'Row #' by stripping out non-digit/non-dot characters
+    df['RowNum'] = df['Row #'].str.replace(r'[^\d.]', '', regex=True)
+    # Identify host rows: RowNum is a whole integer (e.g., '1', '2')
+    df['is_host'] = df['RowNum'].str.match(r'^\d+$')
+
+    chunk_hosts = parse_hosts(df)
+    hosts = chunk_hosts
+    if carry is not None:
+        hosts = pd.concat([pd.DataFrame([carry], columns=HOST_COLUMNS), chunk_hosts], ignore_index=True)
+    # A host number defined twice uses its last definition
+    host_info = hosts.drop_duplicates('host_num', keep='last').set_index('host_num')
+
+    # Clear attachments' Other Bates so we can fill fresh values
+    attachments = df[~df['is_host']]
+    df.loc[attachments.index, 'Other Bates'] = ''
+
+    # Offset of each attachment within its host, in CSV order (continuing the carried host)
+    host_num = attachments['RowNum'].str.split('.', n=1).str[0]
+    offsets = host_num.groupby(host_num, sort=False).cumcount() + 1
+    if carry is not None and carry['host_num'] not in set(chunk_hosts['host_num']):
+        offsets[host_num == carry['host_num']] += carry['attachments']
+
+    info = host_info.reindex(host_num.to_numpy())
+    has_host = info['base_folder'].notna().to_numpy()
+    info = info[has_host]
+    new_folder = (info['base_folder'].to_numpy(dtype=np.int64) + offsets[has_host].to_numpy())
+    new_folder = pd.Series(new_folder).astype(str).str.zfill(3).to_numpy(dtype=object)
+    df.loc[attachments.index[has_host], 'Other Bates'] = (
+        info['pfx1'].to_numpy(dtype=object) + '.' + info['pfx2'].to_numpy(dtype=object) + '.'
+        + new_folder + '.' + info['page'].to_numpy(dtype=object))
+
+    # Attachment totals per host for the collision check
+    counts = host_num.value_counts(sort=False)
+    if carry is not None:
+        counts = counts.add(pd.Series({carry['host_num']: carry['attachments']}), fill_value=0)
+    collisions = find_folder_collisions(hosts, counts)
+
+    next_carry = carry
+    if len(hosts):
+        next_carry = dict(hosts.iloc[-1])
+        next_carry['attachments'] = int(counts.get(next_carry['host_num'], 0))
+
+    # Remove helper columns
+    df.drop(columns=['RowNum', 'is_host'], inplace=True)
+    return collisions, next_carry, int((~has_host).sum())
+
+
+def update_other_bates(input_csv: str, output_csv: str, chunksize=None, metrics_json=None):
     """
     Read a CSV with Bates/control numbers, 'Row #' identifiers, and an existing 'Other Bates' for hosts.
     For each host row (integer 'Row #'), use its 'Other Bates' as the base, then assign new
@@ -11,59 +126,56 @@ def update_other_bates(input_csv: str, output_csv: str):
     Attachments are processed in the exact order they appear in the CSV.
     Writes an output CSV containing all original columns (including 'Bates/Control #' and 'Row #')
     plus the updated 'Other Bates' column, preserving 'Bates/Control #' as a key for downstream usage.
+
+    When chunksize is given the CSV is streamed in chunks of that many rows and the last host's
+    state is carried across chunk boundaries, so attachments must follow their host (as they do
+    in production exports). Hosts whose attachment folders run into the next host's base folder
+    are written to a '<output name>_folder_collisions.csv' report next to the output.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
     """
+    metrics = RunMetrics("increment folder number for attachments")
+
     # Load all columns as strings to preserve formatting
-    df = pd.read_csv(input_csv, dtype=str, keep_default_na=False)
+    if chunksize:
+        chunks = pd.read_csv(input_csv, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunksize)
+    else:
+        # A one-chunk generator, so the whole-file read is timed like a streamed chunk
+        chunks = (pd.read_csv(input_csv, dtype=str, keep_default_na=False, encoding='utf-8-sig') for _ in range(1))
 
-    # Ensure 'Other Bates' column exists
-    if 'Other Bates' not in df.columns:
-        df['Other Bates'] = ''
+    carry = None
+    collision_parts = []
+    orphans = 0
+    first = True
+    for chunk in metrics.iterate("read", tqdm(chunks, desc="Chunks processed", unit="chunk")):
+        # Ensure 'Other Bates' column exists
+        if 'Other Bates' not in chunk.columns:
+            chunk['Other Bates'] = ''
 
-    # Normalize 'Row #' by stripping out non-digit/non-dot characters
-    df['RowNum'] = df['Row #'].str.replace(r'[^\d.]', '', regex=True)
-    # Identify host rows: RowNum is a whole integer (e.g., '1', '2')
-    df['is_host'] = df['RowNum'].str.match(r'^\d+$')
+        with metrics.stage("number", rows=len(chunk)):
+            collisions, carry, missing_host = number_attachments(chunk, carry)
+        collision_parts.append(collisions)
+        orphans += missing_host
 
-    # Prepare host metadata from existing 'Other Bates'
-    hosts = {}
-    for idx, row in df[df['is_host']].iterrows():
-        base_other = row['Other Bates']
-        if not base_other:
-            raise ValueError(f"Host at row {idx} is missing an 'Other Bates' value.")
-        parts = base_other.split('.')
-        if len(parts) != 4:
-            raise ValueError(f"Unexpected 'Other Bates' format at row {idx}: '{base_other}'")
-        pfx1, pfx2, folder_str, page = parts
-        hosts[row['RowNum']] = {
-            'base_folder': int(folder_str),
-            'pfx1': pfx1,
-            'pfx2': pfx2,
-            'page': page
-        }
-    
-    # Clear attachments' Other Bates so we can fill fresh values
-    df.loc[~df['is_host'], 'Other Bates'] = ''
-
-    # Group attachments under their host, preserving CSV order
-    attach_groups = {}
-    for idx, row in df[~df['is_host']].iterrows():
-        host_num = row['RowNum'].split('.', 1)[0]
-        attach_groups.setdefault(host_num, []).append(idx)
-
-    # Assign new 'Other Bates' to each attachment
-    for host_num, info in tqdm(hosts.items(), desc="Hosts processed", unit="host"):
-        attachments = attach_groups.get(host_num, [])
-        for i, idx in enumerate(attachments, start=1):
-            new_folder = f"{info['base_folder'] + i:03}"
-            new_bates = f"{info['pfx1']}.{info['pfx2']}.{new_folder}.{info['page']}"
-            df.at[idx, 'Other Bates'] = new_bates
-
-    # Remove helper columns and write output
-    df.drop(columns=['RowNum', 'is_host'], inplace=True)
-    # Ensure 'Bates/Control #' remains for external programs
-    df.to_csv(output_csv, index=False, encoding='utf-8-sig')
+        # Write the first chunk with a header, then append the rest
+        with metrics.stage("write", rows=len(chunk)):
+            chunk.to_csv(output_csv, index=False, mode='w' if first else 'a', header=first,
+                         encoding='utf-8-sig' if first else 'utf-8')
+        first = False
     print(f"✔️ Updated CSV written to: {output_csv}")
 
+    if orphans:
+        print(f"⚠️ {orphans} attachment(s) had no host row and were left without an 'Other Bates'.")
+
+    collisions = pd.concat(collision_parts, ignore_index=True)
+    if not collisions.empty:
+        name, ext = os.path.splitext(output_csv)
+        collisions_csv = f"{name}_folder_collisions{ext or '.csv'}"
+        collisions.to_csv(collisions_csv, index=False, encoding='utf-8-sig')
+        print(f"⚠️ {len(collisions)} host(s) have attachment folders that run into the next host's "
+              f"base folder. Report written to: {collisions_csv}")
+    metrics.finish(metrics_json)
+    return collisions
+
 
 if __name__ == "__main__":
     raw = input("Enter path to input CSV: ")
@@ -71,4 +183,5 @@ if __name__ == "__main__":
     folder, fname = os.path.split(input_csv)
     name, ext = os.path.splitext(fname)
     output_csv = os.path.join(folder, f"{name}_updated{ext or '.csv'}")
-    update_other_bates(input_csv, output_csv)
+    raw_chunks = input("Rows per chunk for large productions (blank to load the whole file): ").strip()
+    update_other_bates(input_csv, output_csv, int(raw_chunks) if raw_chunks else None)
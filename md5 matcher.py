@@ -1,41 +1,77 @@
 import pandas as pd
-from tqdm import tqdm
 import os
+import md5_index
+from column_splice import splice_column
+from csv_input import read_csv_auto
+from run_metrics import RunMetrics
 
-def match_md5(master_csv, second_csv):
-    # Read in the master CSV
-    master_df = pd.read_csv(master_csv, encoding='ISO-8859-1')
-    
-    # Ensure the master file contains the 'MD5 Hash' column
-    if 'MD5 Hash' not in master_df.columns:
-        raise ValueError("Master CSV does not contain the 'MD5 Hash' column.")
+def md5_match_flags(md5_hashes, second_csv=None, index_path=None, production=None):
+    """
+    Return a boolean Series telling whether each hash appears in the second CSV or, when
+    index_path is given, in the named production of the shared MD5 index.
+    """
+    if (second_csv is None) == (index_path is None):
+        raise ValueError("Provide either a second CSV or an MD5 index path.")
 
-    # Read in the second CSV
-    second_df = pd.read_csv(second_csv, encoding='ISO-8859-1')
-    
-    # Ensure the second file contains the 'MD5 Hash' column
-    if 'MD5 Hash' not in second_df.columns:
-        raise ValueError("Second CSV does not contain the 'MD5 Hash' column.")
+    if index_path is not None:
+        # Only the hashes present in the master are fetched from the index
+        second_md5_set = set(md5_index.lookup_bates(index_path, production, md5_hashes).index)
+    else:
+        # Read in the second CSV
+        second_df = read_csv_auto(second_csv)
 
-    # Create a set of MD5 hashes from the second CSV for faster lookup
-    second_md5_set = set(second_df['MD5 Hash'])
+        # Ensure the second file contains the 'MD5 Hash' column
+        if 'MD5 Hash' not in second_df.columns:
+            raise ValueError("Second CSV does not contain the 'MD5 Hash' column.")
 
-    # Add a new column to the master DataFrame to indicate match status
-    match_status = []
+        # Create a set of MD5 hashes from the second CSV for faster lookup
+        second_md5_set = set(second_df['MD5 Hash'])
 
     print("Checking for matches...")
-    for md5 in tqdm(master_df['MD5 Hash'], desc="Progress", unit="hash"):
-        match_status.append(md5 in second_md5_set)
+    return md5_hashes.isin(second_md5_set) & md5_hashes.notna()
 
-    master_df['Match Found'] = match_status
+def match_md5(master_csv, second_csv=None, index_path=None, production=None, passthrough=False,
+              metrics_json=None):
+    """
+    Flag each master row whose MD5 Hash is found; see md5_match_flags.
+    With passthrough=True only the MD5 Hash column is parsed and the master's original
+    bytes (and encoding) are kept, with the Match Found field appended (see column_splice.py).
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    """
+    metrics = RunMetrics("md5 matcher")
 
     # Generate the output file path in the same directory as the master CSV
     master_dir = os.path.dirname(master_csv)
     output_csv = os.path.join(master_dir, "output.csv")
 
+    if passthrough:
+        with metrics.stage("splice") as stage:
+            flags = splice_column(master_csv, output_csv, 'MD5 Hash', 'Match Found',
+                                  lambda hashes: md5_match_flags(hashes, second_csv, index_path, production),
+                                  encoding='ISO-8859-1')
+            stage["rows"] = len(flags)
+        print(f"Output written to {output_csv}")
+        metrics.finish(metrics_json)
+        return
+
+    # Read in the master CSV
+    with metrics.stage("read") as stage:
+        master_df = read_csv_auto(master_csv)
+        stage["rows"] = len(master_df)
+    
+    # Ensure the master file contains the 'MD5 Hash' column
+    if 'MD5 Hash' not in master_df.columns:
+        raise ValueError("Master CSV does not contain the 'MD5 Hash' column.")
+
+    # Add a new column to the master DataFrame to indicate match status
+    with metrics.stage("match", rows=len(master_df)):
+        master_df['Match Found'] = md5_match_flags(master_df['MD5 Hash'], second_csv, index_path, production)
+
     # Write the output to a new CSV
-    master_df.to_csv(output_csv, index=False)
+    with metrics.stage("write", rows=len(master_df)):
+        master_df.to_csv(output_csv, index=False)
     print(f"Output written to {output_csv}")
+    metrics.finish(metrics_json)
 
 if __name__ == "__main__":
     # Replace with your file paths
@@ -43,3 +79,6 @@ if __name__ == "__main__":
     second_csv_path = r"C:\Users\Willi\Downloads\review db md5s.csv"
 
     match_md5(master_csv_path, second_csv_path)
+
+    # Or, once the review db list has been loaded into the shared index:
+    # match_md5(master_csv_path, index_path=r"C:\Users\Willi\Downloads\md5_index.db", production="review_db")
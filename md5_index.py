@@ -0,0 +1,157 @@
+import os
+import sqlite3
+from pathlib import Path
+import pandas as pd
+from tqdm import tqdm
+
+# Shared on-disk MD5 <-> Bates/Control # index used by the MD5 tools.
+# Each reference CSV (md5_list.csv, civmec_md5.csv, NRT_MD5_hashes.csv, the review
+# db MD5 list, ...) is loaded once as a named production. Later runs query the
+# SQLite file instead of re-parsing the CSVs.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS productions (
+    name TEXT PRIMARY KEY,
+    source TEXT,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    production TEXT NOT NULL,
+    md5 TEXT,
+    bates TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_hashes_md5 ON hashes (production, md5);
+CREATE INDEX IF NOT EXISTS idx_hashes_bates ON hashes (production, bates);
+"""
+
+def connect(index_path, read_only=False):
+    """
+    Open the index database. Writers create it (and its tables) if needed; read_only
+    connections never create anything and raise FileNotFoundError for a missing index,
+    so a mistyped path is not mistaken for an empty index.
+    """
+    if read_only:
+        if not os.path.isfile(index_path):
+            raise FileNotFoundError(f"MD5 index '{index_path}' does not exist.")
+        return sqlite3.connect(f"{Path(index_path).absolute().as_uri()}?mode=ro", uri=True)
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _check_production(conn, index_path, production):
+    # Unknown production names are an error, not an empty result
+    known = [name for (name,) in conn.execute("SELECT name FROM productions ORDER BY name")]
+    if production not in known:
+        raise ValueError(f"Production '{production}' is not in the MD5 index '{index_path}'. "
+                         f"Known productions: {', '.join(known) or 'none'}")
+
+def add_production(index_path, csv_path, production, replace=False,
+                   md5_column='MD5 Hash', bates_column='Bates/Control #',
+                   encoding='utf-8-sig', chunksize=500_000):
+    """
+    Load a reference CSV into the index under the given production name.
+    Rows are appended to an existing production so new deliveries can be added
+    incrementally; pass replace=True to rebuild the production from scratch.
+    A CSV without the Bates column (e.g. a plain review db MD5 list) is stored
+    with blank Bates values.
+    """
+    conn = connect(index_path)
+    try:
+        with conn:
+            if replace:
+                conn.execute("DELETE FROM hashes WHERE production = ?", (production,))
+                conn.execute("DELETE FROM productions WHERE name = ?", (production,))
+            # source lists every CSV loaded into the production, oldest first
+            source = os.path.abspath(csv_path)
+            existing = conn.execute("SELECT source FROM productions WHERE name = ?", (production,)).fetchone()
+            if existing is None:
+                conn.execute("INSERT INTO productions (name, source, rows) VALUES (?, ?, 0)",
+                             (production, source))
+            elif source not in (existing[0] or '').split('; '):
+                conn.execute("UPDATE productions SET source = ? WHERE name = ?",
+                             ('; '.join(filter(None, [existing[0], source])), production))
+
+            added = 0
+            chunks = pd.read_csv(csv_path, encoding=encoding, dtype=str,
+                                 keep_default_na=False, chunksize=chunksize)
+            for chunk in tqdm(chunks, desc=f"Indexing {production}", unit="chunk"):
+                chunk.columns = chunk.columns.str.strip()
+                if md5_column not in chunk.columns:
+                    raise ValueError(f"CSV '{csv_path}' does not contain the '{md5_column}' column.")
+                md5s = chunk[md5_column].str.strip()
+                if bates_column in chunk.columns:
+                    bates = chunk[bates_column].str.strip()
+                else:
+                    bates = pd.Series('', index=chunk.index)
+                keep = md5s != ''
+                conn.executemany(
+                    "INSERT INTO hashes (production, md5, bates) VALUES (?, ?, ?)",
+                    zip([production] * int(keep.sum()), md5s[keep], bates[keep])
+                )
+                added += int(keep.sum())
+
+            conn.execute("UPDATE productions SET rows = rows + ? WHERE name = ?", (added, production))
+    finally:
+        conn.close()
+    print(f"Added {added} hashes to production '{production}' in {index_path}")
+    return added
+
+def list_productions(index_path):
+    """Return a DataFrame of the productions stored in the index."""
+    conn = connect(index_path, read_only=True)
+    try:
+        return pd.read_sql_query("SELECT name, source, rows FROM productions ORDER BY name", conn)
+    finally:
+        conn.close()
+
+def _lookup(index_path, production, keys, key_column, value_column):
+    """
+    Map each unique key to its value for one production with a single indexed join.
+    Duplicate keys resolve to the most recently added row, like the old dict builds.
+    Raises ValueError when the production is not in the index.
+    """
+    unique_keys = pd.Series(keys).dropna().astype(str).unique()
+    conn = connect(index_path, read_only=True)
+    try:
+        _check_production(conn, index_path, production)
+        conn.execute("CREATE TEMP TABLE lookup_keys (key TEXT PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO lookup_keys (key) VALUES (?)",
+                         ((k,) for k in unique_keys))
+        rows = conn.execute(
+            f"SELECT h.{key_column}, h.{value_column}, MAX(h.rowid) "
+            f"FROM hashes h JOIN lookup_keys k ON h.{key_column} = k.key "
+            f"WHERE h.production = ? GROUP BY h.{key_column}",
+            (production,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return pd.Series({key: value for key, value, _ in rows}, dtype=object)
+
+def lookup_bates(index_path, production, md5_hashes):
+    """Return a Series mapping MD5 Hash -> Bates/Control # for the given hashes."""
+    return _lookup(index_path, production, md5_hashes, 'md5', 'bates')
+
+def lookup_md5(index_path, production, bates_numbers):
+    """Return a Series mapping Bates/Control # -> MD5 Hash for the given Bates numbers."""
+    return _lookup(index_path, production, bates_numbers, 'bates', 'md5')
+
+def contains_md5(index_path, production, md5_hashes):
+    """Return a boolean Series telling whether each hash exists in the production."""
+    md5_hashes = pd.Series(md5_hashes)
+    found = lookup_bates(index_path, production, md5_hashes)
+    return md5_hashes.isin(found.index)
+
+def main():
+    # Prompt for the index file and the reference CSV to load into it.
+    index_path = input("Enter the path to the MD5 index file (created if missing): ").strip().strip('"')
+    csv_path = input("Enter the path to the reference CSV to add: ").strip().strip('"')
+    production = input("Enter the production name for this CSV: ").strip()
+    replace_choice = input("Replace existing rows for this production? (yes/no): ").strip().lower()
+
+    add_production(index_path, csv_path, production, replace=replace_choice in ["yes", "y"])
+    print(list_productions(index_path).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
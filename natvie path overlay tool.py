@@ -1,42 +1,274 @@
 import os
-import pandas as pd
+import csv
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from run_metrics import RunMetrics
+from tool_loader import init_worker
+
+# Read size for hashing; large reads keep the disk, not the Python loop, the bottleneck.
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+# Files are handed to the process pool in batches to amortise the per-task overhead.
+HASH_BATCH_FILES = 64
+HASH_BATCH_BYTES = 256 * 1024 * 1024
+
+def scan_directory(path, rel_dir, manifest):
+    """
+    List one directory with os.scandir.
+    If the directory's mtime matches the manifest entry from the previous scan, the cached
+    listing is reused instead (adding, removing or renaming an entry always bumps the mtime
+    of the directory that holds it). Returns (rel_dir, manifest entry).
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError as e:
+        print(f"Warning: could not read {path}: {e}")
+        return rel_dir, None
+
+    cached = manifest.get(rel_dir)
+    if cached is not None and cached["mtime"] == mtime:
+        return rel_dir, cached
+
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Warning: could not read {path}: {e}")
+        return rel_dir, None
+    return rel_dir, {"mtime": mtime, "files": sorted(files), "dirs": sorted(dirs)}
+
+def generate_file_list(start_dir, max_workers=16, manifest=None, exclude=()):
+    """
+    Walk start_dir with a pool of threads, one directory listing per task, and yield a
+    record for every file as soon as its directory has been listed.
+    manifest maps relative directory -> {"mtime", "files", "dirs"} from a previous scan
+    and is updated in place with this scan's listings. Paths in exclude are skipped.
+    """
+    if manifest is None:
+        manifest = {}
+    previous = dict(manifest)
+    manifest.clear()
+    exclude = {os.path.normcase(os.path.abspath(p)) for p in exclude}
 
-def generate_file_list(start_dir):
-    records = []
     # Get the base name of the starting directory.
     base_name = os.path.basename(os.path.normpath(start_dir))
-    # Walk through all directories starting at start_dir.
-    for root, dirs, files in os.walk(start_dir):
-        for file in files:
-            # Get the file name without its extension.
-            bates = os.path.splitext(file)[0]
-            # Build the full path.
-            full_path = os.path.join(root, file)
-            # Compute the relative path from the starting directory.
-            rel_path = os.path.relpath(full_path, start_dir)
-            # Prepend the base name of the starting directory.
-            native_path = os.path.join(base_name, rel_path)
-            records.append({"Bates/Control #": bates, "Native Path": native_path})
-    return records
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {pool.submit(scan_directory, start_dir, "", previous)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rel_dir, entry = future.result()
+                if entry is None:
+                    continue
+                manifest[rel_dir] = entry
+
+                # Queue the subdirectories before emitting rows so the pool stays busy.
+                for name in entry["dirs"]:
+                    sub_rel = os.path.join(rel_dir, name)
+                    pending.add(pool.submit(scan_directory, os.path.join(start_dir, sub_rel), sub_rel, previous))
+
+                for file in entry["files"]:
+                    full_path = os.path.join(start_dir, rel_dir, file)
+                    if exclude and os.path.normcase(os.path.abspath(full_path)) in exclude:
+                        continue
+                    # Bates is the file name without its extension; the native path is
+                    # the relative path prefixed with the starting directory's name.
+                    yield {
+                        "Bates/Control #": os.path.splitext(file)[0],
+                        "Native Path": os.path.join(base_name, rel_dir, file),
+                    }
+
+def hash_file(full_path, sha1=False):
+    """
+    Compute the MD5 (and optionally SHA-1) of one file with large buffered reads.
+    Returns (md5, sha1) hex digests; sha1 is '' when not requested.
+    """
+    md5_hash = hashlib.md5()
+    sha1_hash = hashlib.sha1() if sha1 else None
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(full_path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            md5_hash.update(view[:n])
+            if sha1_hash is not None:
+                sha1_hash.update(view[:n])
+    return md5_hash.hexdigest(), sha1_hash.hexdigest() if sha1_hash is not None else ""
+
+def hash_batch(batch, sha1=False):
+    """Process pool task: hash a batch of (key, full_path) pairs."""
+    results = []
+    for key, full_path in batch:
+        try:
+            results.append((key, *hash_file(full_path, sha1)))
+        except OSError as e:
+            print(f"Warning: could not hash {full_path}: {e}")
+            results.append((key, "", ""))
+    return results
+
+def hash_records(records, start_dir, cache, sha1=False, max_workers=None):
+    """
+    Add an MD5 Hash (and SHA-1 Hash) to each record from generate_file_list.
+    cache maps Native Path -> [size, mtime_ns, md5, sha1]; files whose size and mtime
+    match are not re-read. New results are written back into cache. Records are
+    yielded as their hashes become available, so the output order can differ from the scan.
+    """
+    parent_dir = os.path.dirname(os.path.normpath(start_dir))
+    max_workers = max_workers or os.cpu_count() or 1
+    max_in_flight = max_workers * 2
+
+    def finish(record, md5, sha1_digest):
+        record["MD5 Hash"] = md5
+        if sha1:
+            record["SHA1 Hash"] = sha1_digest
+        return record
+
+    # init_worker lets spawned workers import this tool when it was loaded with tool_loader
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker) as pool:
+        waiting = {}
+        pending = set()
+        batch, batch_bytes = [], 0
+
+        def drain(block):
+            # Collect finished batches; when block is set, wait until the pool has room.
+            nonlocal pending
+            if not pending:
+                return
+            done, pending = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for future in done:
+                for key, md5, sha1_digest in future.result():
+                    record, size, mtime_ns = waiting.pop(key)
+                    if md5:
+                        cache[key] = [size, mtime_ns, md5, sha1_digest]
+                    yield finish(record, md5, sha1_digest)
+
+        for record in records:
+            key = record["Native Path"]
+            full_path = os.path.join(parent_dir, key)
+            try:
+                st = os.stat(full_path)
+            except OSError as e:
+                print(f"Warning: could not read {full_path}: {e}")
+                yield finish(record, "", "")
+                continue
+
+            cached = cache.get(key)
+            if (cached is not None and cached[0] == st.st_size and cached[1] == st.st_mtime_ns
+                    and (cached[3] or not sha1)):
+                yield finish(record, cached[2], cached[3])
+                continue
+
+            waiting[key] = (record, st.st_size, st.st_mtime_ns)
+            batch.append((key, full_path))
+            batch_bytes += st.st_size
+            if len(batch) >= HASH_BATCH_FILES or batch_bytes >= HASH_BATCH_BYTES:
+                pending.add(pool.submit(hash_batch, batch, sha1))
+                batch, batch_bytes = [], 0
+                yield from drain(block=len(pending) >= max_in_flight)
+
+        if batch:
+            pending.add(pool.submit(hash_batch, batch, sha1))
+        while pending:
+            yield from drain(block=True)
+
+def load_manifest(manifest_path):
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(manifest, manifest_path):
+    # Write to a temporary file first so an interrupted run never leaves a broken manifest.
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+
+def write_file_list(start_dir, output_csv, manifest_path=None, max_workers=16,
+                    hash_files=False, sha1=False, hash_cache_path=None, hash_workers=None,
+                    metrics_json=None):
+    """
+    Scan start_dir and stream the Bates/Control # and Native Path rows to output_csv.
+    When manifest_path is given, directories unchanged since the last scan are not re-listed.
+    When hash_files is set, an MD5 Hash column (and SHA1 Hash when sha1 is set) is computed
+    for every native in a process pool, reusing hash_cache_path results for unchanged files.
+    Returns the number of rows written.
+    Per-stage timings are printed at the end (and written to metrics_json when given).
+    Scanning, hashing and writing are streamed together, so they are timed as one stage.
+    """
+    metrics = RunMetrics("native path overlay tool")
+    with metrics.stage("load manifests"):
+        manifest = load_manifest(manifest_path)
+        hash_cache = load_manifest(hash_cache_path) if hash_files else {}
+    exclude = [output_csv]
+    for path in (manifest_path, hash_cache_path):
+        if path:
+            exclude += [path, path + ".tmp"]
+
+    fieldnames = ["Bates/Control #", "Native Path"]
+    records = generate_file_list(start_dir, max_workers=max_workers, manifest=manifest, exclude=exclude)
+    if hash_files:
+        fieldnames.append("MD5 Hash")
+        if sha1:
+            fieldnames.append("SHA1 Hash")
+        records = hash_records(records, start_dir, hash_cache, sha1=sha1, max_workers=hash_workers)
+
+    count = 0
+    with metrics.stage("scan, hash and write") as stage:
+        with open(output_csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                count += 1
+        stage["rows"] = count
+
+    with metrics.stage("save manifests"):
+        if manifest_path:
+            save_manifest(manifest, manifest_path)
+        if hash_files and hash_cache_path:
+            save_manifest(hash_cache, hash_cache_path)
+    metrics.finish(metrics_json)
+    return count
 
 def main():
     # Get and clean user input for the starting directory.
     start_dir = input("Enter the starting directory: ").strip().strip('")')
     # Get and clean user input for the output CSV file name (without extension).
     file_name = input("Enter the name for the output CSV file (without extension): ").strip().strip('")')
-    
+
     # Create the output directory (start_dir/data) if it doesn't exist.
     output_dir = os.path.join(start_dir, "data")
     os.makedirs(output_dir, exist_ok=True)
-    # Build the full CSV file path.
+    # Build the full CSV file path, plus the scan manifest kept alongside it.
     output_csv = os.path.join(output_dir, file_name + ".csv")
-    
-    # Generate file records and write to CSV with UTF-8 encoding.
-    file_list = generate_file_list(start_dir)
-    df = pd.DataFrame(file_list)
-    df.to_csv(output_csv, index=False, encoding='utf-8')
-    
-    print(f"CSV file saved to: {output_csv}")
+    manifest_path = os.path.join(output_dir, file_name + "_scan_manifest.json")
+    hash_cache_path = os.path.join(output_dir, file_name + "_hash_cache.json")
+
+    # Ask whether to hash every native as it is listed.
+    hash_choice = input("Compute MD5 hashes for each native? (yes/no): ").strip().lower()
+    hash_files = hash_choice in ["yes", "y"]
+    sha1 = False
+    if hash_files:
+        sha1_choice = input("Also compute SHA-1 hashes? (yes/no): ").strip().lower()
+        sha1 = sha1_choice in ["yes", "y"]
+
+    # Scan the directory tree and stream the file records to CSV with UTF-8 encoding.
+    count = write_file_list(start_dir, output_csv, manifest_path=manifest_path,
+                            hash_files=hash_files, sha1=sha1, hash_cache_path=hash_cache_path)
+
+    print(f"CSV file saved to: {output_csv} ({count} files)")
 
 if __name__ == '__main__':
     main()
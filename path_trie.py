@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# Shared prefix-tree index over a File Path column.
+# Every distinct folder or file path is one node; path segments are interned once, and
+# the tree is kept in flat arrays (parent, segment, depth, first child, child count) with
+# nodes numbered level by level, so each node's children are a contiguous, name-sorted
+# block. Building the index costs one pass over all segments, after which folder-level
+# questions (rows under a folder or zip, the depth-N folder of each row, counts per
+# folder) are array operations instead of repeated string splitting.
+
+def split_segments(paths):
+    """
+    Split paths into segments: both / and \\ are separators, repeated separators count as
+    one (so Archive.zip//inner is Archive.zip then inner) and leading separators are dropped.
+    Missing paths are treated as ''.
+    Returns (segments, lengths): every row's segments one after another as an object array,
+    and the number of segments of each row.
+    """
+    paths = pd.Series(paths).fillna('').astype(str)
+    if paths.empty:
+        return np.array([], dtype=object), np.array([], dtype=np.int64)
+    # Normalize all paths as one string (NUL never occurs in a path), which is much faster
+    # than splitting row by row
+    text = '\x00' + '\x00'.join(paths.tolist())
+    text = text.replace('\\', '/')
+    while '//' in text:
+        text = text.replace('//', '/')
+    text = text.replace('\x00/', '\x00')[1:]
+    lengths = np.fromiter((row.count('/') for row in text.split('\x00')), dtype=np.int64, count=len(paths)) + 1
+    segments = np.array(text.replace('\x00', '/').split('/'), dtype=object)
+    return segments, lengths
+
+class PathTrie:
+    """
+    Prefix tree over a column of paths, built once:
+
+        trie = PathTrie(df['File Path'])
+        df['Folder'] = trie.names(trie.folder_nodes())
+        rows = trie.rows_under('C:/Custodian01/Documents/Archive001.zip')
+
+    Node 0 is the root (the empty path). Arrays, indexed by node id:
+      - parent, segment (id into segments), depth (root 0)
+      - first_child, child_count: children are first_child .. first_child + child_count - 1,
+        sorted by segment name
+      - size: number of nodes in the subtree, pre: preorder position (so a subtree is the
+        preorder range pre .. pre + size - 1)
+    row_nodes holds the node of each row's full path, aligned with index.
+    """
+
+    def __init__(self, paths):
+        paths = pd.Series(paths)
+        self.index = paths.index
+        flat, lengths = split_segments(paths)
+        codes, segments = pd.factorize(flat, sort=True)
+        self.segments = pd.Index(segments, dtype=object)
+        n_segments = max(len(self.segments), 1)
+        row_start = np.cumsum(lengths) - lengths
+
+        # Build level by level: the nodes at depth d are the distinct (parent, segment) pairs
+        # of the rows that are at least d segments long
+        parents, segment_ids, depths = [np.zeros(1, np.int64)], [np.full(1, -1, np.int64)], [np.zeros(1, np.int64)]
+        current = np.zeros(len(paths), dtype=np.int64)
+        n_nodes = 1
+        self.level_start = [0]
+        for d in range(int(lengths.max()) if len(lengths) else 0):
+            active = np.flatnonzero(lengths > d)
+            keys = current[active] * n_segments + codes[row_start[active] + d]
+            unique_keys, inverse = np.unique(keys, return_inverse=True)
+            parents.append(unique_keys // n_segments)
+            segment_ids.append(unique_keys % n_segments)
+            depths.append(np.full(len(unique_keys), d + 1, np.int64))
+            current[active] = n_nodes + inverse
+            self.level_start.append(n_nodes)
+            n_nodes += len(unique_keys)
+        self.level_start.append(n_nodes)
+
+        self.parent = np.concatenate(parents).astype(np.int32)
+        self.segment = np.concatenate(segment_ids).astype(np.int32)
+        self.depth = np.concatenate(depths).astype(np.int16)
+        self.row_nodes = current.astype(np.int32)
+
+        # Nodes are numbered by (depth, parent, segment), so parent ids never decrease and each
+        # node's children are one contiguous block
+        self.first_child = (np.searchsorted(self.parent[1:], np.arange(n_nodes), side='left') + 1).astype(np.int32)
+        self.child_count = np.bincount(self.parent[1:], minlength=n_nodes).astype(np.int32)
+
+        # Subtree sizes bottom-up, then preorder positions top-down, one level at a time
+        self.size = np.ones(n_nodes, dtype=np.int64)
+        for lo, hi in reversed(list(self._levels())[1:]):
+            np.add.at(self.size, self.parent[lo:hi], self.size[lo:hi])
+        self.pre = np.zeros(n_nodes, dtype=np.int64)
+        for lo, hi in list(self._levels())[1:]:
+            sizes = self.size[lo:hi]
+            before = np.cumsum(sizes) - sizes
+            # Subtract the running total at each node's first sibling
+            sibling_base = before[self.first_child[self.parent[lo:hi]] - lo]
+            self.pre[lo:hi] = self.pre[self.parent[lo:hi]] + 1 + before - sibling_base
+
+        # Rows in preorder, for subtree range queries
+        self._row_order = np.argsort(self.pre[self.row_nodes], kind='stable')
+        self._row_pre = self.pre[self.row_nodes][self._row_order]
+
+    def __len__(self):
+        return len(self.parent)
+
+    def _levels(self):
+        # (first node, end node) of each depth, root level first
+        return zip(self.level_start[:-1], self.level_start[1:])
+
+    def children(self, node):
+        """Node ids of the children of node, sorted by segment name."""
+        return np.arange(self.first_child[node], self.first_child[node] + self.child_count[node])
+
+    def find(self, path):
+        """Node id of a folder or file path (split like the indexed paths), or -1 if it is not in the index."""
+        node = 0
+        for part in split_segments([path])[0]:
+            if part == '' and node != 0:
+                continue
+            segment = self.segments.get_indexer([part])[0]
+            if segment < 0:
+                return -1
+            lo = self.first_child[node]
+            hi = lo + self.child_count[node]
+            position = lo + np.searchsorted(self.segment[lo:hi], segment)
+            if position >= hi or self.segment[position] != segment:
+                return -1
+            node = position
+        return int(node)
+
+    def names(self, nodes):
+        """Segment name of each node (the root and -1 give '')."""
+        nodes = np.asarray(nodes)
+        names = np.append(self.segments.to_numpy(dtype=object), '')
+        return names[np.where(nodes > 0, self.segment[np.maximum(nodes, 0)], -1)]
+
+    def paths(self, nodes, sep='/'):
+        """Full path of each node, joined with sep (the root and -1 give ''). Each distinct node is built once."""
+        unique, inverse = np.unique(np.asarray(nodes), return_inverse=True)
+        built = self.names(unique)
+        current = np.where(unique > 0, self.parent[np.maximum(unique, 0)], 0)
+        # Prepend one ancestor segment per step, for all nodes at once
+        while (current > 0).any():
+            deeper = current > 0
+            built[deeper] = self.names(current[deeper]) + sep + built[deeper]
+            current[deeper] = self.parent[current[deeper]]
+        return built[inverse.reshape(-1)]
+
+    def folder_nodes(self):
+        """The folder node of each row (the parent of its full path), as an array aligned with index."""
+        return self.parent[self.row_nodes]
+
+    def ancestor_at_depth(self, nodes, depth):
+        """Ancestor-or-self of each node at the given depth; -1 where a node is shallower."""
+        nodes = np.array(nodes, dtype=np.int32)
+        deeper = self.depth[nodes] > depth
+        while deeper.any():
+            nodes[deeper] = self.parent[nodes[deeper]]
+            deeper = self.depth[nodes] > depth
+        return np.where(self.depth[nodes] == depth, nodes, -1)
+
+    def folder_at_depth(self, depth):
+        """Depth-N folder of each row (1 = the top folder), -1 where the row's folder is shallower."""
+        return self.ancestor_at_depth(self.folder_nodes(), depth)
+
+    def rows_under(self, path):
+        """Index labels of the rows whose path is path itself or lies anywhere below it."""
+        node = self.find(path) if isinstance(path, str) else int(path)
+        if node < 0:
+            return self.index[:0]
+        lo = np.searchsorted(self._row_pre, self.pre[node], side='left')
+        hi = np.searchsorted(self._row_pre, self.pre[node] + self.size[node], side='left')
+        return self.index[np.sort(self._row_order[lo:hi])]
+
+    def marked_ancestors(self, marked):
+        """
+        For a boolean mask over nodes, return (nearest, top): the nearest and the highest marked
+        ancestor-or-self of every node, -1 where there is none. One pass over the levels.
+        """
+        marked = np.asarray(marked, dtype=bool)
+        nearest = np.where(marked, np.arange(len(self)), -1).astype(np.int64)
+        top = nearest.copy()
+        for lo, hi in list(self._levels())[1:]:
+            above_nearest = nearest[self.parent[lo:hi]]
+            above_top = top[self.parent[lo:hi]]
+            nearest[lo:hi] = np.where(marked[lo:hi], nearest[lo:hi], above_nearest)
+            top[lo:hi] = np.where(above_top >= 0, above_top, top[lo:hi])
+        return nearest, top
+
+    def folder_counts(self):
+        """
+        Per-folder row counts in one bottom-up pass: a DataFrame with one row per folder
+        (every node with children), giving its path, depth, the rows directly in it and
+        the rows anywhere below it, in path order.
+        """
+        direct = np.bincount(self.folder_nodes(), minlength=len(self))
+        total = np.bincount(self.row_nodes, minlength=len(self)).astype(np.int64)
+        for lo, hi in reversed(list(self._levels())[1:]):
+            np.add.at(total, self.parent[lo:hi], total[lo:hi])
+        folders = np.flatnonzero(self.child_count > 0)
+        folders = folders[np.argsort(self.pre[folders])]
+        return pd.DataFrame({
+            'node': folders,
+            'path': self.paths(folders),
+            'depth': self.depth[folders],
+            'rows_in_folder': direct[folders],
+            'rows_below': total[folders],
+        })
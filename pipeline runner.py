@@ -0,0 +1,197 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import pandas as pd
+import md5_index
+from csv_cache import read_csv_cached
+from run_metrics import RunMetrics
+from tool_loader import load_tool
+
+dedup_tool = load_tool("deduplicated report bates match.py")
+md5_tool = load_tool("add md5 from doc id.py")
+civ_nrt_tool = load_tool("add drt and civ bates numbers.py")
+matcher_tool = load_tool("md5 matcher.py")
+
+def find_column(df, name):
+    """Return the master column matching name, ignoring case and surrounding whitespace."""
+    for col in df.columns:
+        if col.strip().lower() == name.lower():
+            return col
+    raise ValueError(f"Master CSV must contain the '{name}' column.")
+
+# ------------------------------
+# Stages. Each takes the master DataFrame as produced by the stages it depends on plus the
+# run config, and returns (updated columns, reports). Stages never write files themselves.
+# ------------------------------
+def stage_document_ids(master_df, config):
+    duplicate_df = pd.read_csv(config["duplicate_report_csv"], encoding='utf-8', low_memory=False)
+    duplicate_df.columns = duplicate_df.columns.str.strip().str.lower()
+    if 'original bates' not in duplicate_df.columns or 'duplicate path' not in duplicate_df.columns:
+        raise ValueError("Duplicate report CSV must contain 'original bates' and 'duplicate path' columns.")
+
+    id_column = find_column(master_df, 'document id')
+    path_column = find_column(master_df, 'file path')
+    master_df, unmatched_df = dedup_tool.fill_document_ids(master_df, duplicate_df, id_column, path_column,
+                                                           suggest=config.get("suggest_document_ids", True))
+    return {id_column: master_df[id_column]}, {"unmatched_document_ids": unmatched_df}
+
+def stage_md5(master_df, config):
+    document_ids = master_df[find_column(master_df, 'document id')]
+    md5 = md5_tool.md5_for_document_ids(document_ids, config.get("bates_csv"),
+                                        config.get("index_path"), config.get("md5_production"))
+    return {'MD5 Hash': md5}, {}
+
+def stage_civ_nrt(master_df, config):
+    index_path = config.get("index_path")
+    if index_path:
+        civ_map = md5_index.lookup_bates(index_path, config.get("civ_production", "CIV"), master_df['MD5 Hash'])
+        nrt_map = md5_index.lookup_bates(index_path, config.get("nrt_production", "NRT"), master_df['MD5 Hash'])
+    else:
+        civ_map, nrt_map = civ_nrt_tool.load_civ_nrt_maps(config["civ_csv"], config["nrt_csv"])
+    master_df, unmatched_df = civ_nrt_tool.apply_civ_nrt(master_df, civ_map, nrt_map)
+    return ({'CIV Number': master_df['CIV Number'], 'NRT Number': master_df['NRT Number']},
+            {"unmatched_md5": unmatched_df})
+
+def stage_match_md5(master_df, config):
+    flags = matcher_tool.md5_match_flags(master_df['MD5 Hash'], config.get("second_csv"),
+                                         config.get("match_index_path"), config.get("match_production"))
+    return {'Match Found': flags}, {}
+
+# The declared DAG, in a valid run order. "after" lists the stages whose columns a stage reads;
+# a dependency that is not selected for a run is assumed to be satisfied by the input master.
+PIPELINE = {
+    "document_ids": {"after": [], "run": stage_document_ids},
+    "md5": {"after": ["document_ids"], "run": stage_md5},
+    "civ_nrt": {"after": ["md5"], "run": stage_civ_nrt},
+    "match_md5": {"after": ["md5"], "run": stage_match_md5},
+}
+
+def validate_config(config, stages):
+    """
+    Check that config names one input source (and, for the MD5 index, a production) for
+    every selected stage, so a bad config fails before the master is read.
+    Raises ValueError listing every problem.
+    """
+    def given(key):
+        return config.get(key) is not None
+
+    problems = []
+    if "document_ids" in stages and not given("duplicate_report_csv"):
+        problems.append("document_ids needs 'duplicate_report_csv'")
+    if "md5" in stages:
+        if given("bates_csv") == given("index_path"):
+            problems.append("md5 needs exactly one of 'bates_csv' or 'index_path'")
+        elif given("index_path") and not given("md5_production"):
+            problems.append("md5 reads 'index_path' and needs 'md5_production'")
+    if "civ_nrt" in stages and not given("index_path") and not (given("civ_csv") and given("nrt_csv")):
+        problems.append("civ_nrt needs 'index_path' or both 'civ_csv' and 'nrt_csv'")
+    if "match_md5" in stages:
+        if given("second_csv") == given("match_index_path"):
+            problems.append("match_md5 needs exactly one of 'second_csv' or 'match_index_path'")
+        elif given("match_index_path") and not given("match_production"):
+            problems.append("match_md5 reads 'match_index_path' and needs 'match_production'")
+    if problems:
+        raise ValueError("Invalid pipeline config: " + "; ".join(problems))
+
+# Output name -> file name written to the output directory.
+OUTPUT_FILES = {
+    "master": "updated_master_pipeline.csv",
+    "unmatched_document_ids": "unmatched_report.csv",
+    "unmatched_md5": "unmatched_md5_report.csv",
+}
+
+def run_pipeline(master_csv, config, stages=None, outputs=("master",), output_dir=None, max_workers=4,
+                 metrics_json=None, budgets=None):
+    """
+    Run the selected enrichment stages on one in-memory copy of the master CSV.
+    The master is parsed once; each stage sees the columns produced by its upstream stages,
+    independent stages run concurrently, and only the requested outputs are written.
+    Per-stage timings are printed at the end (and written to metrics_json when given);
+    budgets sets per-stage limits as in run_metrics.RunMetrics.
+    Returns the final master DataFrame and a dict of reports.
+    """
+    stages = list(PIPELINE) if stages is None else [s for s in PIPELINE if s in stages]
+    unknown = set(outputs) - set(OUTPUT_FILES)
+    if unknown:
+        raise ValueError(f"Unknown outputs: {', '.join(sorted(unknown))}")
+    validate_config(config, stages)
+
+    # Resolve each selected stage's selected ancestors.
+    ancestors = {}
+    for name in stages:
+        found = []
+        for dep in PIPELINE[name]["after"]:
+            if dep in stages:
+                found += [a for a in ancestors[dep] if a not in found] + [dep]
+        ancestors[name] = found
+
+    metrics = RunMetrics("pipeline runner", budgets)
+
+    # Read the master CSV once (from the columnar cache when it is unchanged since the last run)
+    with metrics.stage("read") as stage:
+        master_df = read_csv_cached(master_csv, encoding='utf-8-sig', low_memory=False)
+        stage["rows"] = len(master_df)
+
+    def stage_input(name):
+        # A shallow copy shares the unchanged columns; upstream columns are layered on top.
+        frame = master_df.copy(deep=False)
+        for dep in ancestors[name]:
+            for col, values in updates[dep].items():
+                frame[col] = values
+        return frame
+
+    def run_stage(name, frame):
+        with metrics.stage(name, rows=len(frame)):
+            return PIPELINE[name]["run"](frame, config)
+
+    updates, reports = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+        remaining = list(stages)
+        while remaining or running:
+            # Start every stage whose dependencies have finished.
+            for name in list(remaining):
+                if all(dep in updates for dep in ancestors[name]):
+                    remaining.remove(name)
+                    print(f"Starting stage: {name}")
+                    running[pool.submit(run_stage, name, stage_input(name))] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                updates[name], stage_reports = future.result()
+                reports.update(stage_reports)
+                print(f"Finished stage: {name}")
+
+    # Apply every stage's columns in pipeline order
+    for name in stages:
+        for col, values in updates[name].items():
+            master_df[col] = values
+
+    # Write only the requested outputs
+    output_dir = output_dir or os.path.dirname(master_csv)
+    for output in outputs:
+        frame = master_df if output == "master" else reports.get(output)
+        if frame is None:
+            print(f"Skipping output '{output}': its stage was not run.")
+            continue
+        path = os.path.join(output_dir, OUTPUT_FILES[output])
+        with metrics.stage(f"write {output}", rows=len(frame)):
+            frame.to_csv(path, index=False, encoding='utf-8-sig')
+        print(f"{output} written to {path}")
+
+    metrics.finish(metrics_json)
+    return master_df, reports
+
+if __name__ == "__main__":
+    # File paths (replace with actual paths)
+    master_csv_path = r"C:\Users\Willi\Downloads\Civmec Report\2025-01-13_08_25_52PM_Upload_details_report_for_20250109_Civmec_Expert_Documents.csv"
+    config = {
+        "duplicate_report_csv": r"C:\Users\Willi\Downloads\Civmec Report\20250109 Civmec Expert Documents-deduped-file-info.csv",
+        "bates_csv": r"C:\Users\Willi\Downloads\Civmec Report\md5_list.csv",
+        "civ_csv": r"C:\Users\Willi\Downloads\Civmec Report\civmec_md5.csv",
+        "nrt_csv": r"C:\Users\Willi\Downloads\Civmec Report\NRT_MD5_hashes.csv",
+        "second_csv": r"C:\Users\Willi\Downloads\review db md5s.csv",
+    }
+
+    # Run every stage and write the enriched master plus both unmatched reports
+    run_pipeline(master_csv_path, config,
+                 outputs=["master", "unmatched_document_ids", "unmatched_md5"])
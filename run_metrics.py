@@ -0,0 +1,209 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Shared per-stage instrumentation for the tools.
+# A RunMetrics object records named stages (read, normalize, index build, match, write)
+# with wall time, CPU time, rows processed and peak memory, prints a summary table at the
+# end of the run and can write the same numbers to a JSON file. Optional budgets per stage
+# print a warning (or raise) when a stage runs longer or uses more memory than allowed.
+
+def peak_rss_mb():
+    """Peak resident memory of the current process in MB, or None where it cannot be read."""
+    # Linux: VmHWM belongs to this process image, while ru_maxrss also counts the parent
+    # the process was forked from.
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+    except (ImportError, AttributeError):
+        return None
+
+def children_usage():
+    """
+    CPU seconds and peak resident memory in MB of the child processes that have finished
+    and been waited for (e.g. process pool workers after the pool shuts down), or (0.0, None)
+    where it cannot be read. The peak is that of the largest single child.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0, None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak = usage.ru_maxrss / (1024 * 1024) if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return usage.ru_utime + usage.ru_stime, peak or None
+
+# Highest peak seen before the high-water mark was last reset
+_peak_before_reset = 0.0
+
+def process_peak_rss_mb():
+    """Peak resident memory of the whole process in MB, even across reset_peak_rss calls."""
+    current = peak_rss_mb()
+    return None if current is None else max(current, _peak_before_reset)
+
+def reset_peak_rss():
+    """Reset the process memory high-water mark (Linux only). Returns True on success."""
+    global _peak_before_reset
+    _peak_before_reset = process_peak_rss_mb() or 0.0
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class RunMetrics:
+    """
+    Collect per-stage metrics for one tool run:
+
+        metrics = RunMetrics("md5 matcher")
+        with metrics.stage("read") as stage:
+            df = pd.read_csv(path)
+            stage["rows"] = len(df)
+        metrics.finish("metrics.json")
+
+    budgets maps a stage name to limits, e.g. {"match": {"wall_seconds": 60, "peak_rss_mb": 4000}}.
+    Peak memory is per stage where the high-water mark can be reset (Linux) and no other
+    stage is running at the same time; otherwise it is the process peak so far.
+    """
+
+    def __init__(self, run_name, budgets=None, raise_on_budget=False):
+        self.run_name = run_name
+        self.budgets = budgets or {}
+        self.raise_on_budget = raise_on_budget
+        self.stages = []
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def _begin(self, name, rows):
+        with self._lock:
+            per_stage = self._active == 0 and reset_peak_rss()
+            self._active += 1
+        return {"stage": name, "rows": rows}, per_stage, time.perf_counter(), time.process_time() + children_usage()[0]
+
+    def _end(self, state, keep=True):
+        record, per_stage, wall_start, cpu_start = state
+        record["wall_seconds"] = time.perf_counter() - wall_start
+        # process_time covers every thread, so concurrent stages overlap here; child processes
+        # (pool workers) are counted in the stage they finish in
+        record["cpu_seconds"] = time.process_time() + children_usage()[0] - cpu_start
+        record["peak_rss_mb"] = peak_rss_mb()
+        with self._lock:
+            self._active -= 1
+            record["peak_scope"] = "stage" if per_stage and self._active == 0 else "process"
+            if keep:
+                self.stages.append(record)
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        """Time the enclosed block as one stage; set record["rows"] inside it if rows is unknown up front."""
+        state = self._begin(name, rows)
+        try:
+            yield state[0]
+        finally:
+            self._end(state)
+        self._check_budget(state[0])
+
+    def iterate(self, name, iterable):
+        """Yield from iterable (e.g. CSV chunks), timing each step as stage name with rows = len(item)."""
+        iterator = iter(iterable)
+        while True:
+            state = self._begin(name, None)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._end(state, keep=False)
+                return
+            state[0]["rows"] = len(item) if hasattr(item, "__len__") else None
+            self._end(state)
+            yield item
+
+    def _check_budget(self, record):
+        budget = self.budgets.get(record["stage"], {})
+        for key, limit in budget.items():
+            value = record.get(key)
+            if value is not None and value > limit:
+                message = f"Stage '{record['stage']}' exceeded its {key} budget: {value:.2f} > {limit}"
+                if self.raise_on_budget:
+                    raise RuntimeError(message)
+                print(f"Warning: {message}")
+
+    def summary(self):
+        """
+        Return one row per stage name (repeated stages, e.g. per chunk, are added up) with
+        rows per second, plus a total row.
+        """
+        records = pd.DataFrame(self.stages, columns=["stage", "rows", "wall_seconds", "cpu_seconds",
+                                                     "peak_rss_mb", "peak_scope"])
+        records["rows"] = pd.to_numeric(records["rows"], errors="coerce")
+        table = records.groupby("stage", sort=False).agg(
+            calls=("stage", "size"),
+            rows=("rows", lambda r: r.sum(min_count=1)),
+            wall_seconds=("wall_seconds", "sum"),
+            cpu_seconds=("cpu_seconds", "sum"),
+            peak_rss_mb=("peak_rss_mb", "max"),
+            peak_scope=("peak_scope", lambda scope: "stage" if (scope == "stage").all() else "process"),
+        ).reset_index()
+        table.insert(5, "rows_per_second", table["rows"] / table["wall_seconds"].where(table["wall_seconds"] > 0))
+        total = {"stage": "total", "wall_seconds": time.perf_counter() - self._start,
+                 "cpu_seconds": table["cpu_seconds"].sum(), "peak_rss_mb": process_peak_rss_mb()}
+        table = pd.concat([table, pd.DataFrame([total])], ignore_index=True)
+        return table.astype({"calls": "Int64", "rows": "Int64"})
+
+    def finish(self, json_path=None):
+        """Print the summary table and, when json_path is given, write the metrics there as JSON."""
+        table = self.summary()
+        print(f"\nStage metrics for {self.run_name}:")
+        display = table.copy()
+        for col in ["calls", "rows"]:
+            display[col] = table[col].astype(object).where(table[col].notna(), "")
+        print(display.to_string(index=False, na_rep="", float_format="%.2f"))
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "run": self.run_name,
+                    "started": self.started.isoformat(timespec="seconds"),
+                    "stages": self.stages,
+                    "total_wall_seconds": float(table["wall_seconds"].iloc[-1]),
+                    "peak_rss_mb": process_peak_rss_mb(),
+                }, f, indent=2)
+            print(f"Metrics written to {json_path}")
+        return table
+
+class NullMetrics:
+    """
+    Stand-in for RunMetrics when a caller passes no metrics: stage and iterate time
+    nothing and never touch the memory high-water mark, so an instrumented helper can run
+    inside another tool's (or thread's) stage without disturbing its numbers.
+    """
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        yield {"stage": name, "rows": rows}
+
+    def iterate(self, name, iterable):
+        return iter(iterable)
+
+    def finish(self, json_path=None):
+        return None
+
+NO_METRICS = NullMetrics()
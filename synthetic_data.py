@@ -0,0 +1,302 @@
+import os
+import codecs
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+# Synthetic e-discovery inputs for benchmarking the tools at any size.
+# Everything is generated in chunks from a seeded RNG, so a 10M-row dataset never has to
+# fit in memory and the same size and seed always produce the same files.
+
+CHUNK_ROWS = 1_000_000
+# Native files written to disk for the path overlay tool; larger datasets get the first ones only.
+NATIVE_FILES = 100_000
+# CSV files of a dataset (see write_dataset); the natives are a folder next to them.
+DATASET_NAMES = ["master", "duplicate_report", "missing_bates", "md5_list", "civ", "nrt",
+                 "review_md5", "emails", "email_group", "families", "filenames",
+                 "referenced_bates", "pdf_bates"]
+PAGES_PER_FOLDER = 10_000
+FOLDERS_PER_BOX = 1_000
+SUBJECT_WORDS = np.array([
+    "project", "update", "invoice", "meeting", "schedule", "steel", "fabrication", "site",
+    "variation", "claim", "report", "drawing", "revision", "inspection", "delivery", "contract",
+    "minutes", "budget", "approval", "shutdown", "module", "weld", "quality", "safety",
+])
+# Random pseudo-words widen the subject vocabulary to tens of thousands of words,
+# so subjects are about as distinct as in a real mailbox.
+_letters = np.array(list("abcdefghijklmnopqrstuvwxyz"), dtype=object)
+_word_rng = np.random.default_rng(0)
+PSEUDO_WORDS = np.array(["".join(_letters[_word_rng.integers(0, 26, k)])
+                         for k in _word_rng.integers(4, 10, 20_000)], dtype=object)
+REPLY_PREFIXES = np.array(["", "", "", "RE: ", "FW: ", "Re: ", "RE: RE: "], dtype=object)
+MAILBOXES = np.array([f"user{i:04d}@example.com" for i in range(2_000)], dtype=object)
+
+def parse_size(text):
+    """Turn '10k', '1m' or '10M' into a row count."""
+    text = str(text).strip().lower().replace("_", "")
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+def _zfill(values, width):
+    # Zero-padded text as an object array; each distinct value is formatted once
+    unique, inverse = np.unique(np.asarray(values), return_inverse=True)
+    return np.array([f"{v:0{width}d}" for v in unique.tolist()], dtype=object)[inverse]
+
+def bates_numbers(positions, prefix="ABC"):
+    """Bates numbers PREFIX.BOX.FOLDER.PAGE for 0-based document positions."""
+    positions = np.asarray(positions)
+    page = positions % PAGES_PER_FOLDER + 1
+    folder = positions // PAGES_PER_FOLDER % FOLDERS_PER_BOX + 1
+    box = positions // (PAGES_PER_FOLDER * FOLDERS_PER_BOX) + 1
+    return prefix + "." + _zfill(box, 3) + "." + _zfill(folder, 3) + "." + _zfill(page, 4)
+
+def md5_hashes(rng, n):
+    """n random 32-character hex strings."""
+    digits = rng.bytes(16 * n).hex()
+    return np.array([digits[i:i + 32] for i in range(0, 32 * n, 32)], dtype=object)
+
+def upload_details_chunks(n_rows, seed=0, prefix="ABC", blank_id_fraction=0.1,
+                          duplicate_md5_fraction=0.05, chunk_rows=CHUNK_ROWS):
+    """
+    Yield chunks of an upload-details report: Row #, Bates/Control #, Document id,
+    MD5 Hash, File Path, Filename and Note Text.
+    Row # follows the host/attachment hierarchy (12, 12.1, 12.2, ...), attachments share
+    their host's folder, a share of natives sit inside zip containers (Archive.zip//inner/...),
+    a share of Document ids are blank and a share of MD5 hashes repeat earlier ones.
+    """
+    host = 0
+    previous_md5 = None
+    for chunk_no, start in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng([seed, chunk_no])
+        n = min(chunk_rows, n_rows - start)
+        positions = np.arange(start, start + n)
+
+        # Families: every chunk starts with a host so families never span chunks
+        is_host = rng.random(n) < 0.7
+        is_host[0] = True
+        host_numbers = host + np.cumsum(is_host)
+        host = int(host_numbers[-1])
+        host_start = np.maximum.accumulate(np.where(is_host, np.arange(n), 0))
+        attachment = np.arange(n) - host_start
+        host_text = host_numbers.astype(str).astype(object)
+        row_numbers = np.where(is_host, host_text, host_text + "." + attachment.astype(str).astype(object))
+
+        bates = bates_numbers(positions, prefix)
+        document_ids = np.where(rng.random(n) < blank_id_fraction, None, bates)
+
+        # MD5 hashes, some repeated from earlier rows (duplicates across the collection)
+        md5 = md5_hashes(rng, n)
+        repeat = np.flatnonzero(rng.random(n) < duplicate_md5_fraction)
+        if previous_md5 is not None and len(repeat):
+            md5[repeat] = previous_md5[rng.integers(0, len(previous_md5), len(repeat))]
+        previous_md5 = md5
+
+        # File paths: attachments live in their host's folder; some hosts are inside zips
+        custodian = _zfill(rng.integers(1, 40, n)[host_start], 2)
+        folder = _zfill(rng.integers(1, 500, n)[host_start], 3)
+        in_zip = (rng.random(n) < 0.2)[host_start]
+        extension = np.array([".pdf", ".docx", ".msg", ".xlsx", ".jpg"], dtype=object)[rng.integers(0, 5, n)]
+        filenames = "file_" + _zfill(positions, 8) + extension
+        container = np.where(in_zip, "Archive" + folder + ".zip//inner/folder" + folder, "Folder" + folder)
+        paths = "Custodian" + custodian + "/Documents/" + container + "/" + filenames
+
+        # Note Text: some notes reference other Bates numbers
+        has_note = rng.random(n) < 0.15
+        referenced = bates_numbers(rng.integers(0, n_rows, n), prefix)
+        notes = np.where(has_note, "See " + referenced, None)
+
+        yield pd.DataFrame({
+            "Row #": row_numbers,
+            "Bates/Control #": bates,
+            "Document id": document_ids,
+            "MD5 Hash": md5,
+            "File Path": paths,
+            "Filename": filenames,
+            "Note Text": notes,
+        })
+
+def email_database_chunks(n_rows, seed=0, prefix="EML", chunk_rows=CHUNK_ROWS):
+    """
+    Yield chunks of an email database: Title, Date, Bates/Control #, Row #, Document ID,
+    End Bates/Control #, From, To, CC and File Path.
+    About one email in ten is a duplicate of the email before it (Row # 12.1 after 12).
+    """
+    host = 0
+    for chunk_no, start in enumerate(range(0, n_rows, chunk_rows)):
+        rng = np.random.default_rng([seed, 1_000 + chunk_no])
+        n = min(chunk_rows, n_rows - start)
+        # One common business word followed by two to four rarer ones
+        common = SUBJECT_WORDS[rng.integers(0, len(SUBJECT_WORDS), n)]
+        rare = PSEUDO_WORDS[rng.integers(0, len(PSEUDO_WORDS), (n, 4))]
+        lengths = rng.integers(2, 5, n)
+        subjects = pd.Series([c + " " + " ".join(r[:k]) for c, r, k in zip(common, rare, lengths)])
+        numbers = _zfill(rng.integers(1, 5_000, n), 4)
+        titles = (REPLY_PREFIXES[rng.integers(0, len(REPLY_PREFIXES), n)]
+                  + subjects.str.capitalize().to_numpy(dtype=object) + " " + numbers)
+        dates = pd.Timestamp("2018-01-01") + pd.to_timedelta(rng.integers(0, 6 * 365 * 86_400, n), unit="s")
+        bates = bates_numbers(np.arange(start, start + n), prefix)
+
+        # Duplicates follow their original, so families never span chunks
+        is_host = rng.random(n) >= 0.1
+        is_host[0] = True
+        host_numbers = host + np.cumsum(is_host)
+        host = int(host_numbers[-1])
+        copy = np.arange(n) - np.maximum.accumulate(np.where(is_host, np.arange(n), 0))
+        host_text = host_numbers.astype(str).astype(object)
+
+        # Senders and recipients from a shared pool; most emails have no CC
+        to = MAILBOXES[rng.integers(0, len(MAILBOXES), n)]
+        second = rng.random(n) < 0.3
+        to[second] = to[second] + "; " + MAILBOXES[rng.integers(0, len(MAILBOXES), second.sum())]
+        cc = np.where(rng.random(n) < 0.4, MAILBOXES[rng.integers(0, len(MAILBOXES), n)], None)
+        custodian = _zfill(rng.integers(1, 40, n), 2)
+        yield pd.DataFrame({
+            "Title": titles,
+            "Date": dates.strftime("%Y-%m-%d %H:%M:%S"),
+            "Bates/Control #": bates,
+            "Row #": np.where(is_host, host_text, host_text + "." + copy.astype(str).astype(object)),
+            "Document ID": bates,
+            "End Bates/Control #": bates,
+            "From": MAILBOXES[rng.integers(0, len(MAILBOXES), n)],
+            "To": to,
+            "CC": cc,
+            "File Path": "Custodian" + custodian + "/Mail/Inbox/" + bates + ".msg",
+        })
+
+def email_group(email_df, seed=0, duplicate_fraction=0.5, size=None):
+    """
+    Pick an email group (CSV2) from an email database: a share are exact copies, some are
+    near-duplicates (reply prefix, changed case, timestamp a few seconds off), the rest new.
+    """
+    rng = np.random.default_rng([seed, 2])
+    size = size or max(1, len(email_df) // 10)
+    picked = email_df.sample(n=min(size, len(email_df)), random_state=seed).reset_index(drop=True)
+    kind = rng.random(len(picked))
+    near = (kind >= duplicate_fraction * 0.6) & (kind < duplicate_fraction)
+    new = kind >= duplicate_fraction
+    picked.loc[near, "Title"] = "RE: " + picked.loc[near, "Title"].str.upper()
+    shifted = pd.to_datetime(picked.loc[near, "Date"]) + pd.to_timedelta(rng.integers(1, 30, near.sum()), unit="s")
+    picked.loc[near, "Date"] = shifted.dt.strftime("%Y-%m-%d %H:%M:%S")
+    picked.loc[new, "Title"] = "New thread " + pd.Series(np.arange(new.sum()), index=picked.index[new]).astype(str)
+    picked["Bates/Control #"] = bates_numbers(np.arange(len(picked)), "GRP")
+    return picked
+
+def family_rows(chunk, start):
+    """
+    The input of the attachment and family tools for a chunk of the master: Row #,
+    Bates/Control #, File Path, Filename and Other Bates. Each family sits in a folder named
+    after its host's file, so the host is the folder's parent document. Hosts get an
+    Other Bates numbered by their position (OTH.BOX.FOLDER.0001, a box per 1,000 positions),
+    leaving a free folder for every attachment; attachments have none.
+    """
+    n = len(chunk)
+    is_host = ~chunk["Row #"].str.contains(".", regex=False).to_numpy()
+    host_pos = np.maximum.accumulate(np.where(is_host, np.arange(n), 0))
+    stems = chunk["Filename"].str.rpartition(".")[0].to_numpy(dtype=object)
+    folders = chunk["File Path"].str.rpartition("/")[0].to_numpy(dtype=object)
+    positions = start + np.arange(n)
+    other = "OTH." + _zfill(positions // 1_000 + 1, 3) + "." + _zfill(positions % 1_000 + 1, 3) + ".0001"
+    return pd.DataFrame({
+        "Row #": chunk["Row #"].to_numpy(),
+        "Bates/Control #": chunk["Bates/Control #"].to_numpy(),
+        "File Path": folders[host_pos] + "/" + stems[host_pos] + "/" + chunk["Filename"].to_numpy(dtype=object),
+        "Filename": chunk["Filename"].to_numpy(),
+        "Other Bates": np.where(is_host, other, ""),
+    })
+
+def write_natives(root, bates):
+    """Write one small native per Bates number as <root>/<PREFIX.BOX.FOLDER>/<Bates>.pdf."""
+    folders = pd.Series(bates).str.rpartition(".")[0]
+    for folder in folders.unique():
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+    for number, folder in zip(bates, folders):
+        with open(os.path.join(root, folder, number + ".pdf"), "wb") as f:
+            f.write(number.encode())
+
+def _append(df, path, first):
+    # The first chunk starts the file with a UTF-8 BOM and the header, like the real exports
+    if first:
+        with open(path, "wb") as f:
+            f.write(codecs.BOM_UTF8)
+    df.to_csv(path, mode="a", header=first, index=False, encoding="utf-8")
+
+def write_dataset(out_dir, n_rows, seed=0):
+    """
+    Write a full synthetic dataset of n_rows documents to out_dir and return a dict of paths:
+    master (upload details), duplicate_report, missing_bates, md5_list, civ, nrt, review_md5,
+    emails, email_group, families (see family_rows), filenames (extension-less names to look
+    up in the master), referenced_bates and pdf_bates (the Bates numbers referenced by the
+    notes, and the same pairs as found in the referenced PDFs, with some missing and some
+    extra) and natives (a folder with the first NATIVE_FILES documents as files).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in DATASET_NAMES}
+    paths["natives"] = os.path.join(out_dir, "natives")
+    rng = np.random.default_rng([seed, 3])
+
+    chunks = upload_details_chunks(n_rows, seed)
+    for i, chunk in enumerate(tqdm(chunks, total=-(-n_rows // CHUNK_ROWS), desc=f"Generating {n_rows:,} rows")):
+        first = i == 0
+        blank = chunk["Document id"].isna()
+        _append(chunk, paths["master"], first)
+
+        # Duplicate report: most blank-id natives are duplicates of an earlier original,
+        # with their path written slightly differently (case, en dash) as in real exports
+        dup = chunk[blank & (rng.random(len(chunk)) < 0.9)]
+        variant = dup["File Path"].where(rng.random(len(dup)) < 0.7,
+                                         dup["File Path"].str.upper().str.replace("/", " – /", n=1, regex=False))
+        _append(pd.DataFrame({
+            "Original Bates": chunk["Bates/Control #"].sample(n=len(dup), replace=True, random_state=seed + i).to_numpy(),
+            "Duplicate Path": variant.to_numpy(),
+        }), paths["duplicate_report"], first)
+        _append(pd.DataFrame({"Document id": chunk.loc[blank, "Document id"],
+                              "File path": chunk.loc[blank, "File Path"]}), paths["missing_bates"], first)
+
+        # MD5 reference lists
+        _append(chunk.loc[~blank, ["Bates/Control #", "MD5 Hash"]], paths["md5_list"], first)
+        for name, share, ref_prefix in [("civ", 0.4, "CIV"), ("nrt", 0.2, "NRT")]:
+            ref = chunk.loc[rng.random(len(chunk)) < share, ["MD5 Hash"]]
+            ref.insert(0, "Bates/Control #", bates_numbers(np.arange(len(ref)) + i * CHUNK_ROWS, ref_prefix))
+            _append(ref, paths[name], first)
+        _append(chunk.loc[rng.random(len(chunk)) < 0.3, ["MD5 Hash"]], paths["review_md5"], first)
+
+        # Family and filename inputs
+        _append(family_rows(chunk, i * CHUNK_ROWS), paths["families"], first)
+        known = chunk.loc[rng.random(len(chunk)) < 0.1, "Filename"].str.rpartition(".")[0]
+        unknown = "unknown_file_" + _zfill(np.arange(len(known) // 10) + i * CHUNK_ROWS, 8)
+        _append(pd.DataFrame({"Filename": np.concatenate([known.to_numpy(dtype=object), unknown])}),
+                paths["filenames"], first)
+
+        # Referenced Bates from the notes, and the PDF extraction of the referenced documents
+        notes = chunk["Note Text"].notna()
+        references = pd.DataFrame({"Bates/Control #": chunk.loc[notes, "Bates/Control #"].to_numpy(),
+                                   "ReferencedBates": chunk.loc[notes, "Note Text"].str[len("See "):].to_numpy()})
+        _append(references, paths["referenced_bates"], first)
+        found = references[rng.random(len(references)) >= 0.05]
+        extra = references.sample(frac=0.05, random_state=seed + i)
+        extra = extra.assign(**{"Bates/Control #": bates_numbers(rng.integers(0, n_rows, len(extra)))})
+        pdf = pd.concat([found, extra], ignore_index=True)
+        _append(pd.DataFrame({"PDF_File": pdf["ReferencedBates"] + ".pdf",
+                              "Bates/Control #": pdf["Bates/Control #"]}), paths["pdf_bates"], first)
+
+        # Natives on disk, up to NATIVE_FILES
+        native_rows = max(0, min(len(chunk), NATIVE_FILES - i * CHUNK_ROWS))
+        write_natives(paths["natives"], chunk["Bates/Control #"].to_numpy()[:native_rows])
+
+    # Email database sized like the master, and a group drawn from it
+    group_parts = []
+    for i, chunk in enumerate(email_database_chunks(n_rows, seed)):
+        _append(chunk, paths["emails"], i == 0)
+        group_parts.append(email_group(chunk, seed + i, size=max(1, len(chunk) // 10)))
+    email_group_df = pd.concat(group_parts, ignore_index=True)
+    email_group_df["Bates/Control #"] = bates_numbers(np.arange(len(email_group_df)), "GRP")
+    email_group_df.to_csv(paths["email_group"], index=False, encoding="utf-8-sig")
+
+    return paths
+
+if __name__ == "__main__":
+    out_dir = input("Enter the output directory: ").strip().strip('"')
+    size = parse_size(input("Enter the number of rows (e.g. 10k, 1m, 10m): "))
+    written = write_dataset(os.path.join(out_dir, f"rows_{size}"), size)
+    for name, path in written.items():
+        print(f"{name}: {path}")
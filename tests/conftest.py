@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The tools and their shared modules live in the repository root, next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tool_loader  # noqa: E402,F401  (lets tests import the tool scripts by module name)
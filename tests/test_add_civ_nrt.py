@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from tool_loader import load_tool
+
+civ_nrt = load_tool("add drt and civ bates numbers.py")
+
+@pytest.fixture
+def inputs(tmp_path):
+    master = tmp_path / 'master.csv'
+    master.write_text('Bates/Control #,MD5 Hash,Size,Date\n'
+                      'A0001,aa,010,1.50\nA0002,,20,\nA0003,cc,30,NA\nA0004,dd,0040,2024-01-02\n',
+                      encoding='utf-8-sig')
+    civ = tmp_path / 'civ.csv'
+    pd.DataFrame({'Bates/Control #': ['CIV1', 'CIV3'], 'MD5 Hash': ['aa', 'cc']}).to_csv(civ, index=False)
+    nrt = tmp_path / 'nrt.csv'
+    pd.DataFrame({'Bates/Control #': ['NRT3'], 'MD5 Hash': ['cc']}).to_csv(nrt, index=False)
+    return tmp_path, str(master), str(civ), str(nrt)
+
+def test_whole_file_and_chunked_outputs_are_identical(inputs):
+    tmp_path, master, civ, nrt = inputs
+    outputs = {}
+    for chunksize in (None, 1, 3):
+        civ_nrt.add_civ_nrt_to_master(master, civ, nrt, chunksize=chunksize)
+        outputs[chunksize] = ((tmp_path / 'updated_master_with_civ_nrt.csv').read_bytes(),
+                              (tmp_path / 'unmatched_md5_report.csv').read_bytes())
+    assert outputs[None] == outputs[1] == outputs[3]
+
+def test_values_are_written_as_read(inputs):
+    tmp_path, master, civ, nrt = inputs
+    civ_nrt.add_civ_nrt_to_master(master, civ, nrt)
+    written = pd.read_csv(tmp_path / 'updated_master_with_civ_nrt.csv', dtype=str, keep_default_na=False,
+                          encoding='utf-8-sig')
+    assert written['Size'].tolist() == ['010', '20', '30', '0040']
+    assert written['Date'].tolist() == ['1.50', '', 'NA', '2024-01-02']
+    assert written['CIV Number'].tolist() == ['CIV1', '', 'CIV3', '']
+    assert written['NRT Number'].tolist() == ['', '', 'NRT3', '']
@@ -0,0 +1,89 @@
+import filecmp
+
+import pandas as pd
+import pytest
+
+from tool_loader import load_tool
+
+incrementer = load_tool("increment folder number for attachments.py")
+
+ROWS = [
+    ('B1', '1', 'ABC.001.010.0001'),
+    ('B2', '1.1', ''),
+    ('B3', '1.2', 'old'),
+    ('B4', '2', 'ABC.001.020.0002_0001'),
+    ('B5', '2.1', ''),
+    ('B6', '2.1.1', ''),
+    ('B7', 'Row 3', 'ABC.A12.011.0003'),
+    ('B8', '3.1', ''),
+    ('B9', '3.2', ''),
+    ('B10', '9.1', 'no host'),
+    ('B11', '4', 'XYZ.002.007.0009'),
+    ('B12', '4.1', ''),
+]
+
+def old_update_other_bates(df):
+    # The tool's row-by-row numbering before it was vectorized and streamed
+    df = df.copy()
+    row_num = df['Row #'].str.replace(r'[^\d.]', '', regex=True)
+    is_host = row_num.str.match(r'^\d+$')
+    hosts = {}
+    for idx in df.index[is_host]:
+        pfx1, pfx2, folder_str, page = df.at[idx, 'Other Bates'].split('.')
+        hosts[row_num[idx]] = (int(folder_str), pfx1, pfx2, page)
+    df.loc[~is_host, 'Other Bates'] = ''
+    attach_groups = {}
+    for idx in df.index[~is_host]:
+        attach_groups.setdefault(row_num[idx].split('.', 1)[0], []).append(idx)
+    for host_num, (base_folder, pfx1, pfx2, page) in hosts.items():
+        for i, idx in enumerate(attach_groups.get(host_num, []), start=1):
+            df.at[idx, 'Other Bates'] = f"{pfx1}.{pfx2}.{base_folder + i:03}.{page}"
+    return df
+
+@pytest.fixture
+def families_csv(tmp_path):
+    path = tmp_path / 'families.csv'
+    pd.DataFrame(ROWS, columns=['Bates/Control #', 'Row #', 'Other Bates']).to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize('chunksize', [None, 1, 2, 3, 100])
+def test_matches_the_old_numbering(families_csv, tmp_path, chunksize):
+    output = tmp_path / f'out_{chunksize}.csv'
+    incrementer.update_other_bates(str(families_csv), str(output), chunksize)
+    expected = old_update_other_bates(pd.read_csv(families_csv, dtype=str, keep_default_na=False))
+    written = pd.read_csv(output, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    assert written.equals(expected)
+
+def test_whole_file_numbers_attachments_after_a_later_host(tmp_path):
+    # Without streaming an attachment may follow a later host, as in the old tool
+    path = tmp_path / 'unordered.csv'
+    pd.DataFrame(ROWS + [('B13', '3.3', '')], columns=['Bates/Control #', 'Row #', 'Other Bates']).to_csv(path, index=False)
+    incrementer.update_other_bates(str(path), str(tmp_path / 'out.csv'))
+    expected = old_update_other_bates(pd.read_csv(path, dtype=str, keep_default_na=False))
+    assert pd.read_csv(tmp_path / 'out.csv', dtype=str, keep_default_na=False, encoding='utf-8-sig').equals(expected)
+    assert expected['Other Bates'].iloc[-1] == 'ABC.A12.014.0003'
+
+def test_streaming_matches_the_whole_file(families_csv, tmp_path):
+    # Chunk sizes 1 and 2 put family boundaries in every possible place
+    whole = tmp_path / 'whole.csv'
+    expected_collisions = incrementer.update_other_bates(str(families_csv), str(whole))
+    for chunksize in (1, 2):
+        streamed = tmp_path / f'chunks_{chunksize}.csv'
+        collisions = incrementer.update_other_bates(str(families_csv), str(streamed), chunksize)
+        assert filecmp.cmp(whole, streamed, shallow=False)
+        assert collisions.equals(expected_collisions)
+
+def test_folder_collisions_are_reported(tmp_path):
+    path = tmp_path / 'collide.csv'
+    pd.DataFrame([('B1', '1', 'ABC.001.010.0001'), ('B2', '1.1', ''), ('B3', '1.2', ''),
+                  ('B4', '2', 'ABC.001.012.0002')],
+                 columns=['Bates/Control #', 'Row #', 'Other Bates']).to_csv(path, index=False)
+    collisions = incrementer.update_other_bates(str(path), str(tmp_path / 'out.csv'), chunksize=1)
+    assert collisions[['Host Row #', 'Last Attachment Folder', 'Next Host Row #']].values.tolist() == [['1', '012', '2']]
+    assert (tmp_path / 'out_folder_collisions.csv').exists()
+
+def test_host_without_other_bates_is_rejected(tmp_path):
+    path = tmp_path / 'bad.csv'
+    pd.DataFrame([('B1', '1', '')], columns=['Bates/Control #', 'Row #', 'Other Bates']).to_csv(path, index=False)
+    with pytest.raises(ValueError, match="missing an 'Other Bates'"):
+        incrementer.update_other_bates(str(path), str(tmp_path / 'out.csv'))
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bates_codec
+from bates_codec import find_gaps, find_overlaps, format_bates, make_bates, parse_bates, sort_bates, split_bates
+
+VALUES = ['ABC.001.002.0001', 'ABC.001.002.0010', 'ABC.1.2.3_0004', 'ABC.001.002.0002_0001',
+          'XYZ.010.001.0099', 'A.B.001.002.0003', 'ABC.001.002', 'not bates', '', None,
+          'ABC.001.002.000000000000000001', 'ABC.001.002.99999999999999999999']
+
+def old_make_bates(counters, prefix, box, folder_num, include_suffix):
+    # The numbering tool's own builder before the shared codec
+    bates = f"{prefix}.{box}.{folder_num}." + counters.astype(str).str.zfill(4)
+    if include_suffix:
+        bates += "_0001"
+    return bates.astype(object)
+
+@pytest.fixture(params=[100_000, 3], ids=['one block', 'many blocks'])
+def block_size(request, monkeypatch):
+    monkeypatch.setattr(bates_codec, 'PARSE_BLOCK', request.param)
+
+def test_parse_format_round_trip(block_size):
+    values = pd.Series(VALUES, index=range(10, 10 + len(VALUES)))
+    parsed = parse_bates(values)
+    formatted = format_bates(parsed)
+    assert parsed.index.tolist() == values.index.tolist()
+    assert parsed['valid'].tolist() == [True] * 6 + [False] * 4 + [True, False]
+    for value, out in zip(VALUES, formatted):
+        if isinstance(out, str):
+            assert out == value
+        else:
+            assert pd.isna(out)
+
+def test_parts_use_small_integers():
+    parsed = parse_bates(pd.Series(['ABC.001.002.0001', 'ABC.001.002.9999_0001'] * 10))
+    assert parsed['page'].dtype == np.int16
+    assert parsed['box'].dtype == np.int8
+    # 18 digits stay exact next to invalid values, and long zero padding is not misread
+    wide = parse_bates(pd.Series(['ABC.1.2.123456789012345678', 'junk', 'ABC.1.2.000000000000000009']))
+    assert wide['page'].tolist() == [123456789012345678, -1, 9]
+
+def test_sort_is_numeric(block_size):
+    values = ['B.1.1.2', 'A.2.1.1', 'A.10.1.1', 'A.2.1.10', 'A.2.1.9', 'A.2.1.9_0002', 'A.2.1.9_0001',
+              'junk', 'A.002.1.3']
+    ordered = format_bates(sort_bates(parse_bates(pd.Series(values))))
+    assert ordered.dropna().tolist() == ['A.2.1.1', 'A.002.1.3', 'A.2.1.9', 'A.2.1.9_0001', 'A.2.1.9_0002',
+                                         'A.2.1.10', 'A.10.1.1', 'B.1.1.2']
+    assert ordered.isna().tolist()[-1]
+
+def test_gaps_match_a_brute_force_scan():
+    rng = np.random.default_rng(7)
+    pages = sorted(set(rng.integers(1, 200, 120).tolist()))
+    values = [f'P.001.{folder:03d}.{page:04d}' for folder in (1, 2) for page in pages[folder::2]]
+    gaps = find_gaps(parse_bates(pd.Series(values)))
+
+    expected = []
+    for folder in (1, 2):
+        present = pages[folder::2]
+        expected += [(folder, a + 1, b - 1) for a, b in zip(present, present[1:]) if b - a > 1]
+    assert list(zip(gaps['folder'], gaps['first_missing'], gaps['last_missing'])) == expected
+
+def test_overlaps_match_a_brute_force_scan():
+    begin = pd.Series(['P.1.1.0001', 'P.1.1.0005', 'P.1.1.0003', 'P.1.2.0004', 'P.1.1.0011', 'P.1.2.0001'])
+    end = pd.Series(['P.1.1.0004', 'P.1.1.0010', 'P.1.1.0003', 'P.1.2.0009', 'P.1.1.0012', 'P.1.2.0004'])
+    overlaps = find_overlaps(parse_bates(begin), parse_bates(end))
+
+    ranges = [(b.rsplit('.', 1)[0], int(b.rsplit('.', 1)[1]), int(e.rsplit('.', 1)[1])) for b, e in zip(begin, end)]
+    expected = [i for i, (group, first, _) in enumerate(ranges)
+                if any(g == group and (f, j) < (first, i) and first <= last
+                       for j, (g, f, last) in enumerate(ranges))]
+    assert sorted(overlaps) == expected == [2, 3]
+
+@pytest.mark.parametrize('box, folder', [('001', '002'), ('1', '0002'), ('A12', '003'), ('12', 'F-7'), ('', '')])
+@pytest.mark.parametrize('include_suffix', [False, True])
+def test_make_bates_matches_the_old_builder(box, folder, include_suffix):
+    counters = pd.Series(np.arange(1, 13), index=np.arange(20, 32))
+    new = make_bates('PRE', box, folder, counters, suffix=1 if include_suffix else None)
+    old = old_make_bates(counters, 'PRE', box, folder, include_suffix)
+    assert new.astype(object).tolist() == old.tolist()
+    assert new.index.tolist() == old.index.tolist()
+
+def test_split_bates_keeps_text_parts():
+    split = split_bates(pd.Series(['ABC.001.002.0001_0002', 'ABC.A12.002.0001', 'ABC.001.X.0001', 'short']))
+    assert split['box'].tolist()[:2] == ['001', 'A12']
+    assert split['folder_number'].tolist() == [2, 2, -1, -1]
+    assert split['valid'].tolist() == [True, True, False, False]
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from column_splice import splice_column
+from tool_loader import load_tool
+
+def flag(keys):
+    return keys.astype(str).str.len() > 3
+
+def old_add_column(input_csv, output_csv, key_column, new_column, compute, encoding):
+    # The tools' original path: parse the whole file, add the column, write it all back
+    df = pd.read_csv(input_csv, encoding=encoding)
+    df[new_column] = compute(df[key_column])
+    df.to_csv(output_csv, index=False, encoding=encoding)
+
+def test_pandas_written_file_is_byte_identical(tmp_path):
+    source = tmp_path / 'in.csv'
+    pd.DataFrame({'Key': ['abcd', 'ab', None, 'x,y,z'], 'Note': ['plain', 'say "hi"', 'two\nlines', '']}).to_csv(source, index=False)
+    splice_column(str(source), str(tmp_path / 'new.csv'), 'Key', 'Long', flag)
+    old_add_column(str(source), str(tmp_path / 'old.csv'), 'Key', 'Long', flag, 'utf-8')
+    assert (tmp_path / 'new.csv').read_bytes() == (tmp_path / 'old.csv').read_bytes()
+
+@pytest.mark.parametrize('encoding, newline, bom', [('utf-8-sig', b'\r\n', b'\xef\xbb\xbf'), ('ISO-8859-1', b'\n', b'')])
+def test_other_bytes_are_kept_and_values_parse_the_same(tmp_path, encoding, newline, bom):
+    text = ('Key,Amount,Note\n0012,1.50,"quoted, comma"\ncafé,2,"line one\nline two"\n\n'
+            'abcdef,,"""quoted"""\n').replace('\n', newline.decode())
+    source = tmp_path / 'in.csv'
+    source.write_bytes(bom + text.encode('utf-8' if bom else encoding))
+    splice_column(str(source), str(tmp_path / 'new.csv'), 'Key', 'Long', flag, encoding=encoding)
+    old_add_column(str(source), str(tmp_path / 'old.csv'), 'Key', 'Long', flag, encoding)
+
+    spliced = (tmp_path / 'new.csv').read_bytes()
+    assert spliced.startswith(bom + b'Key,Amount,Note,Long' + newline)
+    assert spliced.count(newline) == text.encode(encoding).count(newline)
+    new = pd.read_csv(tmp_path / 'new.csv', dtype=str, encoding=encoding)
+    old = pd.read_csv(tmp_path / 'old.csv', dtype=str, encoding=encoding)
+    assert new['Long'].tolist() == old['Long'].tolist() == ['True', 'True', 'True']
+    # The old path re-serialized every column; splicing keeps what was written (0012, 1.50)
+    assert new['Key'].tolist() == ['0012', 'café', 'abcdef']
+    assert new['Amount'].tolist()[0] == '1.50'
+
+def test_bad_columns_and_lengths_are_rejected(tmp_path):
+    source = tmp_path / 'in.csv'
+    source.write_text('Key,Long\na,b\n')
+    with pytest.raises(ValueError, match="does not contain"):
+        splice_column(str(source), str(tmp_path / 'out.csv'), 'Missing', 'New', flag)
+    with pytest.raises(ValueError, match="already has"):
+        splice_column(str(source), str(tmp_path / 'out.csv'), 'Key', 'Long', flag)
+    with pytest.raises(ValueError, match="Expected 1 values"):
+        splice_column(str(source), str(tmp_path / 'out.csv'), 'Key', 'New', lambda keys: [1, 2])
+
+def test_md5_matcher_passthrough_matches_the_full_rewrite(tmp_path):
+    master = tmp_path / 'master.csv'
+    second = tmp_path / 'second.csv'
+    pd.DataFrame({'Bates/Control #': ['A1', 'A2', 'A3'], 'MD5 Hash': ['aa', None, 'cc'],
+                  'Size': ['010', '20', '30']}).to_csv(master, index=False)
+    pd.DataFrame({'MD5 Hash': ['cc', 'dd']}).to_csv(second, index=False)
+    matcher = load_tool("md5 matcher.py")
+    matcher.match_md5(str(master), str(second))
+    full = pd.read_csv(tmp_path / 'output.csv', dtype=str)
+    matcher.match_md5(str(master), str(second), passthrough=True)
+    spliced = pd.read_csv(tmp_path / 'output.csv', dtype=str)
+    assert spliced['Match Found'].tolist() == full['Match Found'].tolist() == ['False', 'False', 'True']
+    assert spliced['Size'].tolist() == ['010', '20', '30']
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from bates_codec import parse_bates
+from tool_loader import load_tool
+
+compare = load_tool("compare bates lists.py")
+
+def expand(ranges):
+    # Turn every range row back into its individual Bates numbers
+    items = {}
+    for start, end, count, status in ranges[['Start Bates', 'End Bates', 'Count', 'Status']].itertuples(index=False):
+        if start == end:
+            values = [start]
+        else:
+            first, last = parse_bates(pd.Series([start, end])).to_dict('records')
+            head = start.rsplit('.', 1)[0]
+            if first['suffix'] < 0:
+                values = [f"{head}.{page:0{first['page_width']}d}" for page in range(first['page'], last['page'] + 1)]
+            else:
+                page = start.rsplit('.', 1)[1].split('_')[0]
+                values = [f"{head}.{page}_{suffix:0{first['suffix_width']}d}"
+                          for suffix in range(first['suffix'], last['suffix'] + 1)]
+        assert len(values) == count
+        items.update((value, status) for value in values)
+    return items
+
+def write_lists(tmp_path, seed=3):
+    rng = np.random.default_rng(seed)
+    universe = [f"ABC.{box:03d}.{folder:03d}.{page:04d}" for box in (1, 2) for folder in (1, 7) for page in range(1, 120)]
+    universe += [f"ABC.001.001.0200_{suffix:04d}" for suffix in range(1, 9)]
+    universe += ['loose-1', 'loose-2', 'XYZ.1.2']
+    picks = rng.random((2, len(universe)))
+    list1 = [v for v, keep in zip(universe, picks[0]) if keep < 0.7]
+    list2 = [v for v, keep in zip(universe, picks[1]) if keep < 0.7]
+    csv1, csv2 = tmp_path / 'one.csv', tmp_path / 'two.csv'
+    pd.DataFrame({'Bates/Control #': list1}).to_csv(csv1, index=False)
+    pd.DataFrame({'Bates/Control #': list2 + list2[:5]}).to_csv(csv2, index=False)
+    return csv1, csv2
+
+def test_ranges_cover_the_same_items_as_the_plain_comparison(tmp_path):
+    csv1, csv2 = write_lists(tmp_path)
+    compare.compare_csv(str(csv1), str(csv2))
+    compare.compare_csv_ranges(str(csv1), str(csv2))
+    plain = pd.read_csv(tmp_path / 'bates_comparison_results.csv')
+    ranges = pd.read_csv(tmp_path / 'bates_comparison_ranges.csv', encoding='utf-8-sig')
+    assert expand(ranges) == dict(zip(plain['Bates Number'], plain['Status']))
+    assert len(ranges) < len(plain)
+
+def test_consecutive_pages_collapse_into_one_range():
+    ranges = compare.diff_ranges(pd.Series(['P.1.1.0001', 'P.1.1.0002', 'P.1.1.0003', 'P.1.1.0005', 'P.1.1.0009']),
+                                 pd.Series(['P.1.1.0005', 'P.1.1.0006']))
+    assert ranges[['Range', 'Count', 'Status']].values.tolist() == [
+        ['P.1.1.0001–0003', 3, 'Extra in CSV1'],
+        ['P.1.1.0006', 1, 'Missing in CSV1'],
+        ['P.1.1.0009', 1, 'Extra in CSV1'],
+    ]
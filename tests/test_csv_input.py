@@ -0,0 +1,72 @@
+import io
+
+import pandas as pd
+import pytest
+
+import csv_input
+from csv_input import read_csv_auto, sniff_csv, sniff_delimiter
+
+ROWS = [['Key', 'Name', 'Note'], ['1', 'Zoë', 'plain'], ['2', 'Müller', '"a, b"'], ['3', 'café', '"two\nlines"'],
+        ['4', 'Ñandú', 'x']]
+
+def csv_text(rows=ROWS, sep=',', newline='\n'):
+    return newline.join(sep.join(row) for row in rows) + newline
+
+def old_read(path):
+    # The tools' original read: UTF-8, or the whole file again as ISO-8859-1 if that fails
+    try:
+        return pd.read_csv(path, encoding='utf-8')
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding='ISO-8859-1')
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'ISO-8859-1'])
+@pytest.mark.parametrize('newline', ['\n', '\r\n'])
+def test_single_encoding_files_read_like_the_old_fallback(tmp_path, encoding, newline):
+    path = tmp_path / 'in.csv'
+    path.write_bytes(csv_text(newline=newline).encode(encoding))
+    assert read_csv_auto(str(path)).equals(old_read(path))
+
+def test_mixed_file_only_falls_back_on_the_bad_lines(tmp_path, capsys):
+    path = tmp_path / 'mixed.csv'
+    lines = csv_text().encode('utf-8').split(b'\n')
+    lines[3] = lines[3].decode('utf-8').encode('ISO-8859-1')  # the "café" row, a Latin-1 export line
+    path.write_bytes(b'\n'.join(lines))
+    # A sample that stops before the bad line, as in a large export
+    df = read_csv_auto(str(path), sample_bytes=len(b'\n'.join(lines[:3])))
+    assert df['Name'].tolist() == ['Zoë', 'Müller', 'café', 'Ñandú']
+    # The old whole-file fallback turned every UTF-8 name into mojibake
+    assert old_read(path)['Name'].tolist()[0] == 'ZoÃ«'
+    assert 'line(s) of' in capsys.readouterr().out
+
+@pytest.mark.parametrize('encoding, bom', [('utf-8', b'\xef\xbb\xbf'), ('utf-16-le', b'\xff\xfe'), ('utf-16-be', b'\xfe\xff')])
+def test_bom_files(tmp_path, encoding, bom):
+    path = tmp_path / 'bom.csv'
+    path.write_bytes(bom + csv_text().encode(encoding))
+    assert sniff_csv(str(path))['encoding'] == encoding
+    expected = pd.read_csv(io.StringIO(csv_text()))
+    assert read_csv_auto(str(path)).equals(expected)
+
+@pytest.mark.parametrize('sep', [';', '\t', '|'])
+def test_delimiter_comes_from_the_header(tmp_path, sep):
+    rows = [['Key', 'Amount', 'Note']] + [[str(i), f'{i},50', 'a, b, c'] for i in range(3)]
+    path = tmp_path / 'sep.csv'
+    path.write_text(csv_text(rows, sep))
+    df = read_csv_auto(str(path))
+    assert list(df.columns) == ['Key', 'Amount', 'Note']
+    assert df['Amount'].tolist() == ['0,50', '1,50', '2,50']
+    assert sniff_delimiter('"a,b";c;d') == ';'
+    assert sniff_delimiter('single') == ','
+
+@pytest.mark.parametrize('block_bytes', [7, 64, 1000])
+def test_small_blocks_give_the_same_frame(tmp_path, monkeypatch, block_bytes):
+    monkeypatch.setattr(csv_input, 'BLOCK_BYTES', block_bytes)
+    monkeypatch.setattr(csv_input, 'LINE_BYTES', 5)
+    rows = [ROWS[0]] + [[str(i), ROWS[1 + i % 4][1], ROWS[1 + i % 4][2]] for i in range(60)]
+    path = tmp_path / 'big.csv'
+    data = csv_text(rows).encode('utf-8').split(b'\n')
+    data[17] = data[17].decode('utf-8').encode('ISO-8859-1')
+    path.write_bytes(b'\n'.join(data))
+    expected = pd.read_csv(io.StringIO(csv_text(rows)))
+    assert read_csv_auto(str(path), report=False, sample_bytes=100).equals(expected)
+    chunks = list(read_csv_auto(str(path), report=False, sample_bytes=100, chunksize=11))
+    assert pd.concat(chunks).equals(expected)
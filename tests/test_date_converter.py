@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tool_loader import load_tool
+
+converter = load_tool("date converter.py")
+
+VALUES = [
+    '01/02/2025', '13/02/2025', '02/13/2025', '1/2/2025', '31/12/2024 14:30', '12/31/2024 14:30',
+    '2025-01-02', '2025-01-13', '2025-13-01', '2025-01-02 08:15:00', '2025/02/01', ' 05/06/2024 ',
+    '03-Jan-2025', 'Jan 3, 2025', '3 January 2025', '20250102', '01.02.2025', '2025-01-02T08:15:00Z',
+    'not a date', '', '00/00/0000', '02/30/2025', np.nan, '01/02/2025', '13/02/2025',
+]
+
+def old_format_date(value, dayfirst, out_fmt):
+    # The original tool: parse_date on every row, formatting what parses
+    parsed = converter.parse_date(value, dayfirst)
+    if isinstance(parsed, pd.Timestamp):
+        return parsed.strftime(out_fmt)
+    return parsed
+
+@pytest.mark.parametrize('dayfirst', [True, False])
+@pytest.mark.parametrize('out_fmt', ['%d-%b-%Y', '%d-%b-%Y %H:%M'])
+def test_matches_parse_date_on_every_value(dayfirst, out_fmt):
+    values = pd.Series(VALUES, dtype=object)
+    converted = converter.convert_dates(values, dayfirst, out_fmt)
+    expected = [old_format_date(v, dayfirst, out_fmt) for v in VALUES]
+    assert [None if pd.isna(v) else v for v in converted] == [None if pd.isna(v) else v for v in expected]
+
+def test_cache_is_shared_between_columns():
+    cache = {}
+    converter.convert_dates(pd.Series(['01/02/2025', '13/02/2025']), True, '%d-%b-%Y', cache)
+    assert cache == {'01/02/2025': '01-Feb-2025', '13/02/2025': '13-Feb-2025'}
+    second = converter.convert_dates(pd.Series(['13/02/2025', '14/02/2025']), True, '%d-%b-%Y', cache)
+    assert second.tolist() == ['13-Feb-2025', '14-Feb-2025']
+
+def test_convert_csv_writes_next_to_the_input(tmp_path):
+    path = tmp_path / 'emails.csv'
+    pd.DataFrame({'Date': ['01/02/2025', 'junk'], 'Primary Date': ['2025-03-04', ''], 'Title': ['a', 'b']}).to_csv(path, index=False)
+    output = converter.convert_csv(str(path), True, '%d-%b-%Y')
+    assert output == str(tmp_path / 'emails_Date_Converted.csv')
+    written = pd.read_csv(output, keep_default_na=False)
+    # Day-first input reads 2025-03-04 as 3 April, as parse_date always has
+    assert written.values.tolist() == [['01-Feb-2025', '03-Apr-2025', 'a'], ['junk', '', 'b']]
+    with pytest.raises(ValueError):
+        converter.convert_csv(str(path), True, '%d-%b-%Y', date_columns=['Sent'])
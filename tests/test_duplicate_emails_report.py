@@ -0,0 +1,32 @@
+import pandas as pd
+
+from tool_loader import load_tool
+
+report_creator = load_tool("duplicate emails report creator.py")
+
+COLUMNS = [
+    ("Duplicate Bates #", "duplicate", "Bates/Control #"),
+    ("Original Document ID", "original", "Bates/Control #"),
+]
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=["Row #", "Bates/Control #"])
+
+def test_pairs_duplicates_with_originals():
+    df = frame([("1", "A1"), ("1.1", "A2"), ("2", "A3"), ("2.1", "A4"), ("2.1.1", "A5")])
+    report = report_creator.build_report(df, COLUMNS)
+    assert report.values.tolist() == [["A2", "A1"], ["A4", "A3"], ["A5", "A3"]]
+
+def test_long_numeric_row_numbers_are_skipped(capsys):
+    df = frame([("1", "A1"), ("99999999999999999999", "A2"), ("99999999999999999999.1", "A3"),
+                ("1.1", "A4")])
+    report = report_creator.build_report(df, COLUMNS)
+    assert report.values.tolist() == [["A4", "A1"]]
+    warnings = capsys.readouterr().out
+    assert "1 original row number(s) could not be parsed" in warnings
+    assert "1 duplicate row number(s) could not be parsed" in warnings
+
+def test_largest_int64_row_number_still_pairs():
+    df = frame([("9223372036854775807", "A1"), ("9223372036854775807.1", "A2")])
+    report = report_creator.build_report(df, COLUMNS)
+    assert report.values.tolist() == [["A2", "A1"]]
@@ -0,0 +1,53 @@
+import os
+
+import pandas as pd
+import pytest
+
+from tool_loader import load_tool
+
+finder = load_tool("email duplication finder.py")
+
+COLUMNS = ['Title', 'Date', 'Bates/Control #', 'Document ID', 'File Path', 'From', 'To', 'CC']
+
+def write_emails(tmp_path):
+    full = pd.DataFrame([
+        ['Budget', '2024-01-02 10:00:00', 'A1', 'D1', 'p/1', 'ann', 'bob', None],
+        ['RE: Site visit', '2024-01-03 09:00:30', 'A2', 'D2', 'p/2', 'ann', 'bob', 'cat'],
+        ['Minutes', '2024-01-04 08:00:00', 'A3', 'D3', 'p/3', 'ann', 'bob', None],
+    ], columns=COLUMNS)
+    group = pd.DataFrame([
+        ['Budget', '2024-01-02 10:00:00', 'B1', 'E1', 'q/1', 'ann', 'bob', None],
+        ['Site visit', '2024-01-03 09:00:00', 'B2', 'E2', 'q/2', 'ann', 'bob', 'cat'],
+        ['Other', '2024-01-05 08:00:00', 'B3', 'E3', 'q/3', 'ann', 'bob', None],
+    ], columns=COLUMNS)
+    full.to_csv(tmp_path / 'full.csv', index=False)
+    group.to_csv(tmp_path / 'group.csv', index=False)
+    return str(tmp_path / 'full.csv'), str(tmp_path / 'group.csv')
+
+def test_exact_mode_keeps_the_original_report_layout(tmp_path):
+    csv1, csv2 = write_emails(tmp_path)
+    finder.find_duplicates(csv1, csv2)
+    grouped = pd.read_csv(tmp_path / 'grouped_duplicates_output.csv', keep_default_na=False)
+    assert list(grouped.columns) == ['Title', 'Date', 'Bates/Control #', 'Document ID', 'From', 'To', 'CC']
+    assert grouped.values.tolist() == [['Budget', '2024-01-02 10:00:00', 'A1, B1', 'D1, E1', 'ann', 'bob', 'nan']]
+    report = pd.read_csv(tmp_path / 'email_duplication_report.csv')
+    assert 'Similarity' not in report.columns
+
+@pytest.mark.parametrize('tolerance_seconds, matched', [(60, ['B1', 'B2']), (10, ['B1'])])
+def test_near_mode_uses_the_tolerance(tmp_path, tolerance_seconds, matched):
+    csv1, csv2 = write_emails(tmp_path)
+    finder.find_duplicates(csv1, csv2, near_mode=True, tolerance_seconds=tolerance_seconds)
+    duplicates = pd.read_csv(tmp_path / 'duplicates_individual_output.csv')
+    assert duplicates['Bates/Control #'].tolist() == matched
+    grouped = pd.read_csv(tmp_path / 'grouped_duplicates_output.csv')
+    assert (grouped['Similarity'] == 1.0).all()
+
+@pytest.mark.parametrize('threshold, tolerance_seconds', [(0.8, 0), (0.8, -5), (0, 60), (1.5, 60)])
+def test_bad_near_settings_are_rejected(tmp_path, threshold, tolerance_seconds):
+    csv1, csv2 = write_emails(tmp_path)
+    with pytest.raises(ValueError):
+        finder.find_duplicates(csv1, csv2, near_mode=True, threshold=threshold,
+                               tolerance_seconds=tolerance_seconds)
+    assert not os.path.exists(tmp_path / 'duplicates_individual_output.csv')
+    with pytest.raises(ValueError):
+        finder.find_near_duplicates(pd.read_csv(csv1), pd.read_csv(csv2), threshold, tolerance_seconds)
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from family_builder import PLAIN_WIDTH, _parse_general, _parse_plain, clean_values, parse_row_numbers
+
+# Row numbers the old parent/child filter saw in real exports, plus the awkward ones
+VALUES = [
+    '1', '12', '12.1', '12.10', '12.3.1', '7.', '7.00', '7.010', '0', '000012', '0012.5',
+    ' 12 ', '12⠀', '⠀12.2', '', ' ', 'nan', 'abc', '12a', 'a12', '-3', '+4', '1e3',
+    '1.5e1', '.5', '12..3', 'inf', '123456789012345', '1234567890123456', '99999999999999999999',
+    '1.99999999999999999999', '9223372036854775807', '9223372036854775808.1',
+    '00000000000000000000012.5', '12.99999999999999999999999',
+]
+
+def old_is_parent(row_val):
+    # The parent rule of "parent child filter for row number.py" before the shared engine
+    try:
+        cleaned = str(row_val).replace('⠀', '').strip()
+        return float(cleaned) % 1 == 0
+    except Exception:
+        return False
+
+def test_is_parent_matches_old_rule():
+    row_numbers = clean_values(pd.Series(VALUES + [None]))
+    parsed = parse_row_numbers(row_numbers)
+    expected = [old_is_parent(v) for v in VALUES + [None]]
+    assert parsed['is_parent'].tolist() == expected
+    assert _parse_general(row_numbers)['is_parent'].tolist() == expected
+
+def test_plain_and_general_agree():
+    row_numbers = clean_values(pd.Series(VALUES))
+    texts = row_numbers.to_numpy(dtype=object)
+    lengths = row_numbers.str.len().to_numpy()
+    short = np.flatnonzero((lengths > 0) & (lengths <= PLAIN_WIDTH))
+    plain, host, attachment, is_parent, level = _parse_plain(texts[short], lengths[short])
+    general = _parse_general(row_numbers.iloc[short[plain]])
+    assert plain.sum() > 10
+    assert host[plain].tolist() == general['host'].tolist()
+    assert attachment[plain].tolist() == general['attachment'].tolist()
+    assert is_parent[plain].tolist() == general['is_parent'].tolist()
+    assert level[plain].tolist() == general['level'].tolist()
+
+def test_columns_are_nullable_integers():
+    parsed = parse_row_numbers(pd.Series(['12', '12.3', '', '99999999999999999999', '1.99999999999999999999']))
+    for column in ('host', 'attachment', 'level'):
+        assert parsed[column].dtype == 'Int64'
+    assert parsed['host'].tolist() == [12, 12, pd.NA, pd.NA, 1]
+    assert parsed['attachment'].tolist() == [0, 3, pd.NA, pd.NA, pd.NA]
+    assert parsed['level'].tolist() == [0, 1, pd.NA, pd.NA, 1]
+    assert parsed['is_parent'].tolist() == [True, False, False, True, True]
+
+def test_largest_int64_host_is_kept():
+    parsed = parse_row_numbers(pd.Series(['9223372036854775807', '9223372036854775807.2']))
+    assert parsed['host'].tolist() == [2 ** 63 - 1, 2 ** 63 - 1]
+    assert parsed['attachment'].tolist() == [0, 2]
@@ -0,0 +1,33 @@
+import csv
+import hashlib
+import os
+import subprocess
+import sys
+import textwrap
+
+from tool_loader import TOOL_DIR
+
+def test_hash_pool_workers_find_the_tool_under_spawn(tmp_path):
+    natives = tmp_path / 'natives'
+    natives.mkdir()
+    contents = {f'ABC{i:04d}.txt': f'native {i}\n'.encode() for i in range(5)}
+    for name, data in contents.items():
+        (natives / name).write_bytes(data)
+    output_csv = tmp_path / 'out.csv'
+
+    # A caller that is not __main__ of any tool (python -c has no main file for the spawned
+    # workers to re-run), loading the tool through tool_loader as benchmark.py does
+    script = textwrap.dedent(f"""
+        import multiprocessing, sys
+        sys.path.insert(0, {TOOL_DIR!r})
+        from tool_loader import load_tool
+        multiprocessing.set_start_method('spawn', force=True)
+        load_tool('natvie path overlay tool.py').write_file_list({str(natives)!r}, {str(output_csv)!r},
+                                                                 hash_files=True, hash_workers=2)
+    """)
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+
+    with open(output_csv, newline='', encoding='utf-8') as f:
+        hashes = {os.path.basename(row['Native Path']): row['MD5 Hash'] for row in csv.DictReader(f)}
+    assert hashes == {name: hashlib.md5(data).hexdigest() for name, data in contents.items()}
@@ -0,0 +1,38 @@
+import os
+import sys
+import importlib
+import importlib.abc
+import importlib.util
+
+# Loads the tool scripts as modules for the benchmark suite and the pipeline runner.
+# The scripts live next to this file and their names contain spaces, so they cannot be
+# imported with a plain import statement. Importing this module lets the import system find
+# each tool under its name with spaces replaced by underscores ("md5 matcher.py" is
+# md5_matcher); process pool workers need that to unpickle the tools' functions.
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class ToolFinder(importlib.abc.MetaPathFinder):
+    """Import hook that maps md5_matcher to "md5 matcher.py" in TOOL_DIR."""
+
+    def find_spec(self, fullname, path=None, target=None):
+        if path is not None:
+            return None
+        for name in os.listdir(TOOL_DIR):
+            if ' ' in name and name.endswith('.py') and os.path.splitext(name)[0].replace(' ', '_') == fullname:
+                return importlib.util.spec_from_file_location(fullname, os.path.join(TOOL_DIR, name))
+        return None
+
+if not any(isinstance(finder, ToolFinder) for finder in sys.meta_path):
+    sys.meta_path.append(ToolFinder())
+
+def load_tool(filename):
+    """Import one of the tool scripts by file name (their names contain spaces)."""
+    return importlib.import_module(os.path.splitext(filename)[0].replace(' ', '_'))
+
+def init_worker():
+    """
+    Process pool initializer for the tools' pools. It does nothing itself: unpickling it in
+    a spawned worker imports this module, which lets the worker find the tool functions it
+    is sent (under spawn the worker does not inherit ToolFinder).
+    """
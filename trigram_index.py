@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+# Shared inverted trigram index for near-match lookups (paths, filenames).
+# Each key is broken into character trigrams (padded so the start and end of the text
+# count too); trigram extraction is vectorized in batches and the index is stored as
+# flat posting arrays. A search only gathers the postings of a query's rarest trigrams,
+# up to a fixed budget, so the candidate set stays bounded however large the index is,
+# and the best candidates are then scored exactly by trigram Jaccard similarity.
+
+BATCH_TEXTS = 50_000
+POSTING_BUDGET = 20_000
+MAX_CANDIDATES = 100
+
+def trigram_codes(texts, batch_texts=BATCH_TEXTS):
+    """
+    Return (rows, codes): the distinct trigrams of each text as 63-bit integer codes
+    (three code points of 21 bits), with the position of the text they came from.
+    Texts are padded with two leading spaces and one trailing space.
+    """
+    texts = ['  ' + t + ' ' for t in pd.Series(texts).fillna('').astype(str).tolist()]
+    row_parts, code_parts = [], []
+    for start in range(0, len(texts), batch_texts):
+        batch = np.array(texts[start:start + batch_texts])
+        width = batch.dtype.itemsize // 4
+        chars = batch.view(np.uint32).reshape(len(batch), width).astype(np.int64)
+        codes = (chars[:, :-2] << 42) | (chars[:, 1:-1] << 21) | chars[:, 2:]
+        lengths = np.char.str_len(batch)
+        valid = np.arange(width - 2) < (lengths - 2)[:, None]
+        rows = np.broadcast_to(np.arange(start, start + len(batch))[:, None], valid.shape)
+        row_parts.append(rows[valid])
+        code_parts.append(codes[valid])
+    if not row_parts:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    rows, codes = np.concatenate(row_parts), np.concatenate(code_parts)
+
+    # Keep each trigram once per text
+    order = np.lexsort((codes, rows))
+    rows, codes = rows[order], codes[order]
+    keep = np.ones(len(rows), dtype=bool)
+    keep[1:] = (rows[1:] != rows[:-1]) | (codes[1:] != codes[:-1])
+    return rows[keep], codes[keep]
+
+class TrigramIndex:
+    """
+    Inverted trigram index over a list of keys:
+
+        index = TrigramIndex(master_stems)
+        hits = index.search(unmatched_stems, k=3, min_score=0.5)
+
+    search returns one row per (query, candidate) with the key position and its trigram
+    Jaccard similarity (shared trigrams / all distinct trigrams of both).
+    """
+
+    def __init__(self, keys):
+        self.keys = pd.Series(keys).fillna('').astype(str).to_numpy(dtype=object)
+        rows, codes = trigram_codes(self.keys)
+        tids, vocabulary = pd.factorize(codes)
+        self.vocabulary = pd.Index(vocabulary)
+
+        # Trigrams of each key (rows are already sorted), for exact scoring
+        self.key_offsets = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=len(self.keys)))])
+        self.key_trigrams = tids.astype(np.int32)
+
+        # Postings: the keys containing each trigram
+        order = np.argsort(tids, kind='stable')
+        self.postings = rows[order].astype(np.int32)
+        self.posting_offsets = np.concatenate([[0], np.cumsum(np.bincount(tids, minlength=len(vocabulary)))])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, tids, posting_budget, max_candidates):
+        # Gather postings from the rarest trigrams first, up to the budget (always at least one)
+        lengths = self.posting_offsets[tids + 1] - self.posting_offsets[tids]
+        order = np.argsort(lengths, kind='stable')
+        take = order[:max(1, int(np.searchsorted(np.cumsum(lengths[order]), posting_budget, side='right')))]
+        gathered = np.concatenate([self.postings[self.posting_offsets[t]:self.posting_offsets[t + 1]]
+                                   for t in tids[take]])
+        keys, counts = np.unique(gathered, return_counts=True)
+        if len(keys) > max_candidates:
+            keys = keys[np.argpartition(-counts, max_candidates - 1)[:max_candidates]]
+        return keys
+
+    def search(self, queries, k=5, min_score=0.0, posting_budget=POSTING_BUDGET, max_candidates=MAX_CANDIDATES):
+        """
+        Find the k most similar keys for each query.
+        Returns a DataFrame with query (position in queries), key (position in the index),
+        match (the key text), score and rank (1 = best), sorted by query and rank.
+        Candidates come from at most posting_budget postings of each query's rarest trigrams,
+        and at most max_candidates of them are scored exactly.
+        """
+        queries = pd.Series(queries).fillna('').astype(str).to_numpy(dtype=object)
+        q_rows, q_codes = trigram_codes(queries)
+        q_tids = self.vocabulary.get_indexer(q_codes)
+        q_offsets = np.concatenate([[0], np.cumsum(np.bincount(q_rows, minlength=len(queries)))])
+
+        out_query, out_key, out_score = [], [], []
+        for q in range(len(queries)):
+            tids = q_tids[q_offsets[q]:q_offsets[q + 1]]
+            n_query = len(tids)
+            tids = tids[tids >= 0]
+            if len(tids) == 0 or len(self.keys) == 0:
+                continue
+            keys = self._candidates(tids, posting_budget, max_candidates)
+
+            # Exact Jaccard: count each candidate's trigrams that the query has
+            starts, ends = self.key_offsets[keys], self.key_offsets[keys + 1]
+            key_tids = np.concatenate([self.key_trigrams[s:e] for s, e in zip(starts, ends)])
+            # (every key has at least one trigram, so no segment is empty)
+            segments = np.concatenate([[0], np.cumsum(ends - starts)[:-1]])
+            shared = np.add.reduceat(np.isin(key_tids, tids).astype(np.int64), segments)
+            scores = shared / (n_query + (ends - starts) - shared)
+
+            best = np.argsort(-scores, kind='stable')[:k]
+            best = best[scores[best] >= min_score]
+            out_query.append(np.full(len(best), q))
+            out_key.append(keys[best])
+            out_score.append(scores[best])
+
+        if not out_query:
+            return pd.DataFrame({'query': pd.Series(dtype=np.int64), 'key': pd.Series(dtype=np.int64),
+                                 'match': pd.Series(dtype=object), 'score': pd.Series(dtype=float),
+                                 'rank': pd.Series(dtype=np.int64)})
+        result = pd.DataFrame({
+            'query': np.concatenate(out_query),
+            'key': np.concatenate(out_key),
+            'score': np.concatenate(out_score),
+        })
+        result.insert(2, 'match', self.keys[result['key'].to_numpy()])
+        result['rank'] = result.groupby('query').cumcount() + 1
+        return result